@@ -3,9 +3,24 @@ Music journal flask-based web application.
 """
 
 import os
+import csv
+import math
 import datetime
-from flask import Flask, render_template, request, flash, redirect, url_for, jsonify
-import pymongo
+import time
+from flask import (
+    Flask,
+    Response,
+    g,
+    render_template,
+    request,
+    flash,
+    redirect,
+    url_for,
+    jsonify,
+    stream_with_context,
+    before_render_template,
+    template_rendered,
+)
 import random
 from flask_login import (
     LoginManager,
@@ -15,17 +30,64 @@ from flask_login import (
     current_user,
     logout_user,
 )
-from flask_bcrypt import Bcrypt
-from dotenv import load_dotenv, dotenv_values
-import base64
-import json
-from requests import post, get
-import certifi
+from dotenv import dotenv_values
+import pymongo
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from requests import RequestException
 from bson import ObjectId
-from collections import Counter
+from bson.errors import InvalidId
 from datetime import datetime as dt
-
-load_dotenv()
+from spotify import AsyncSpotifyClient, CircuitBreaker, CircuitOpen, SpotifyClient
+from cache import AudioFeatureCache, LRUCache, QueryCache, normalize_query
+from mood_stats import (
+    dashboard_stats,
+    forget_entry,
+    mood_counts,
+    record_entry,
+    update_stats,
+)
+from journal import fetch_entries_page, format_entry
+from journal_io import (
+    FORMATS as ENTRY_FORMATS,
+    export_entries,
+    format_of,
+    import_entries,
+    read_rows,
+    register_commands as register_journal_commands,
+)
+from playlists import (
+    InvalidPlaylist,
+    build_playlist,
+    fetch_playlist_tracks,
+    fetch_playlists_page,
+    format_playlist,
+    hydrate,
+    posted_track_ids,
+    posted_tracks,
+    track_ids,
+    register_commands as register_playlist_commands,
+)
+from database import MongoDatabase
+from passwords import HasherBusy, PasswordHasher
+from metrics import AppMetrics, current_timing, end_request, start_request, timed
+from indexes import IndexBuilder, register_commands
+from catalog import TrackCatalog, slim_track, register_commands as register_catalog_commands
+from pools import MoodPools, register_commands as register_pool_commands
+from tracks import TrackStore, track_record
+from taste import (
+    TasteBackfill,
+    blend_targets,
+    entry_features,
+    forget_taste,
+    load_profile,
+    mood_taste,
+    record_taste,
+    register_commands as register_taste_commands,
+    update_taste,
+)
+from moods import MOODS, get_mood_features, get_mood_search_terms
+from scoring import feature_matrix, score_tracks
+from selection import cap_per_artist, lead_artist_id, select_diverse_tracks, unique_tracks
 
 
 class User(UserMixin):
@@ -33,23 +95,41 @@ class User(UserMixin):
         self.id = user_id
 
 
-def create_app():
+def create_app(async_mode=None):
+    """
+    ``async_mode`` (default: the ASYNC_MODE env var) serves the
+    Spotify-bound views as async views on an aiohttp client; every other
+    route, and every template, is the same in both modes.
+    """
+    # parse .env once: it fills in the environment without overriding it,
+    # as load_dotenv would, and becomes the flask config
+    config = dotenv_values()
+    for key, value in config.items():
+        if value is not None:
+            os.environ.setdefault(key, value)
+
+    if async_mode is None:
+        async_mode = os.getenv("ASYNC_MODE", "").lower() in ("1", "true", "yes")
     app = Flask(__name__)
-    bcrypt = Bcrypt(app)
+    metrics = AppMetrics()
+    app.extensions["metrics"] = metrics
+    passwords = PasswordHasher.from_env()
+    app.extensions["passwords"] = passwords
 
-    # load flask config from env variables
-    config = dotenv_values()
     app.config.from_mapping(config)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "default_secret_key")
 
-    cxn = pymongo.MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
-    db = cxn[os.getenv("MONGO_DBNAME")]
+    # connects lazily, once per process, so the app can be built before fork
+    db = MongoDatabase.from_env(event_listeners=[metrics.command_listener])
+    app.extensions["mongo"] = db
 
-    try:
-        cxn.admin.command("ping")
-        print(" *", "Connected to MongoDB!")
-    except Exception as e:
-        print(" * MongoDB connection error:", e)
+    # nothing here waits on MongoDB: indexes are built in the background from
+    # a process's first request, and /healthz reports whether it is reachable
+    index_builder = IndexBuilder(db)
+    app.extensions["indexes"] = index_builder
+    health_timeout = float(os.getenv("HEALTHZ_TIMEOUT", "2"))
+    register_commands(app, db)
+    register_journal_commands(app, db)
 
     cli_id = os.getenv("CLIENT_ID")
     cli_secret = os.getenv("CLIENT_SECRET")
@@ -58,351 +138,385 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = "login"
 
+    # ids of users known to exist, so authenticated requests don't each
+    # cost a users lookup; a deleted account is trusted for at most the TTL
+    # by workers other than the one that forgot it
+    known_users = LRUCache(
+        int(os.getenv("USER_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+    )
+
     @login_manager.user_loader
     def load_user(user_id):
-        user_data = db.users.find_one({"_id": ObjectId(user_id)})
+        if known_users.get(user_id):
+            return User(user_id)
+        try:
+            user_data = db.users.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
+        except InvalidId:
+            return None
         if user_data:
-            return User(str(user_data["_id"]))
+            known_users.set(user_id, True)
+            return User(user_id)
         return None
 
-    def get_token():
+    # one breaker per process, shared by the sync and async clients
+    breaker = CircuitBreaker.from_env()
+    app.extensions["spotify_breaker"] = breaker
+    spotify = SpotifyClient.from_env(cli_id, cli_secret)
+    spotify.on_response = metrics.observe_spotify
+    spotify.breaker = spotify.tokens.breaker = breaker
+    fanout_deadline = float(os.getenv("SPOTIFY_FANOUT_DEADLINE", "8"))
+    search_cache = QueryCache.from_env("search")
+    recommendation_cache = QueryCache.from_env("recommendations")
+    timeline_page_size = int(os.getenv("TIMELINE_PAGE_SIZE", "20"))
+    chart_days = int(os.getenv("MOOD_CHART_DAYS", "30"))
+    track_store = TrackStore(
+        db.tracks, maxsize=int(os.getenv("TRACK_STORE_CACHE_SIZE", "20000"))
+    )
+    playlists_page_size = int(os.getenv("PLAYLISTS_PAGE_SIZE", "10"))
+    playlist_preview_tracks = int(os.getenv("PLAYLIST_PREVIEW_TRACKS", "20"))
+    playlist_max_tracks = int(os.getenv("PLAYLIST_MAX_TRACKS", "500"))
+    recommendation_size = int(os.getenv("RECOMMENDATION_SIZE", "16"))
+    artist_cap = int(os.getenv("RECOMMENDATION_ARTIST_CAP", "2"))
+    audio_feature_cache = AudioFeatureCache(
+        db.audio_features,
+        maxsize=int(os.getenv("AUDIO_FEATURE_CACHE_SIZE", "20000")),
+    )
+    catalog = TrackCatalog(
+        db.catalog,
+        refresh_interval=int(os.getenv("CATALOG_REFRESH_SECONDS", "300")),
+        sync_window=int(os.getenv("CATALOG_SYNC_WINDOW_SECONDS", "600")),
+    )
+    catalog_neighbours = int(os.getenv("CATALOG_NEIGHBOURS", "300"))
+    # below this many scored local matches we fall back to searching Spotify
+    catalog_min_candidates = int(os.getenv("CATALOG_MIN_CANDIDATES", "64"))
+    register_catalog_commands(app, catalog)
+    # each worker's copy of taste profiles; a save or delete drops the user's
+    taste_cache = LRUCache(
+        int(os.getenv("TASTE_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("TASTE_CACHE_TTL", "60")),
+    )
+    taste_prior = float(os.getenv("TASTE_PRIOR_ENTRIES", "10"))
+    taste_max_blend = float(os.getenv("TASTE_MAX_BLEND", "0.5"))
+
+    @app.before_request
+    def start_timing():
+        g.timing, g.timing_token = start_request()
+        # started here rather than in create_app so they run post-fork
+        index_builder.start()
+        catalog.start()
+
+    @app.after_request
+    def record_timing(response):
+        timing = g.get("timing")
+        if timing is not None:
+            response.headers["Server-Timing"] = timing.header()
+            metrics.requests.observe(
+                time.perf_counter() - timing.started,
+                route=request.url_rule.rule if request.url_rule else "unmatched",
+                method=request.method,
+                status=response.status_code,
+            )
+        return response
+
+    @app.teardown_request
+    def stop_timing(exc):
+        token = g.pop("timing_token", None)
+        if token is not None:
+            end_request(token)
+
+    @before_render_template.connect_via(app)
+    def start_render(sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def end_render(sender, template, context, **extra):
+        started = g.pop("render_started", None)
+        timing = current_timing()
+        if started is not None and timing is not None:
+            timing.add("render", time.perf_counter() - started)
+
+    @metrics.registry.collector
+    def cache_and_pool_stats():
+        lookups = {}
+        for name, cache in (
+            ("search", search_cache),
+            ("recommendations", recommendation_cache),
+            ("audio_features", audio_feature_cache),
+            ("tracks", track_store),
+        ):
+            for result, count in cache.stats().items():
+                if result != "hit_rate":
+                    lookups[(("cache", name), ("result", result))] = count
+        pool = db.pool_stats()
+        circuit = breaker.snapshot()
+        return [
+            ("spotify_circuit_state", "gauge", "1 for the Spotify circuit breaker's state.", {
+                (("state", state),): int(circuit["state"] == state)
+                for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+            }),
+            ("spotify_circuit_opens_total", "counter", "Times the Spotify circuit opened.", {
+                (): circuit["opens"],
+            }),
+            ("spotify_circuit_rejections_total", "counter", "Spotify calls failed fast.", {
+                (): circuit["rejected"],
+            }),
+            ("cache_lookups_total", "counter", "Cache lookups by outcome.", lookups),
+            ("mongo_pool_connections", "gauge", "MongoDB connections in this worker's pool.", {
+                (("state", "open"),): pool["open"],
+                (("state", "checked_out"),): pool["checked_out"],
+            }),
+            ("mongo_pool_checkouts_total", "counter", "MongoDB connection checkouts.", {
+                (): pool["checkouts"],
+            }),
+            ("mongo_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", {
+                (): pool["wait_seconds"],
+            }),
+            ("mongo_pool_checkout_failures_total", "counter", "Failed checkouts by reason.", {
+                (("reason", reason),): n for reason, n in pool["failures"].items()
+            }),
+        ]
+
+    @app.route("/metrics")
+    def metrics_page():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/healthz")
+    def healthz():
+        """Readiness: 200 once MongoDB answers a ping, 503 while it does not."""
         try:
-            auth_string = cli_id + ":" + cli_secret
-            auth_bytes = auth_string.encode("utf-8")
-            auth_base64 = str(base64.b64encode(auth_bytes), "utf-8")
-
-            url = "https://accounts.spotify.com/api/token"
-            headers = {
-                "Authorization": "Basic " + auth_base64,
-                "Content-Type": "application/x-www-form-urlencoded",
-            }
-            data = {"grant_type": "client_credentials"}
-            res = post(url, headers=headers, data=data)
-            if res.status_code != 200:
-                print(f"Token error: {res.content}")
-                return None
-            token = json.loads(res.content)["access_token"]
-            return token
-        except Exception as e:
-            print(f"Get token error: {str(e)}")
-            return None
+            with pymongo.timeout(health_timeout):
+                db.ping()
+            mongo = "ok"
+        except PyMongoError as e:
+            print(" * Health check failed:", e)
+            mongo = "unavailable"
+        body = {
+            "status": "ok" if mongo == "ok" else "unavailable",
+            "mongo": mongo,
+            "indexes": index_builder.state,
+            # informational: cached results are still served while it is open
+            "spotify_circuit": breaker.state,
+        }
+        return jsonify(body), 200 if mongo == "ok" else 503
+
+    def get_token():
+        return spotify.get_token()
 
-    def get_auth_headers(token):
-        return {"Authorization": "Bearer " + token}
-
-    def search_for_song(token, song_name):
-        url = "https://api.spotify.com/v1/search"
-        headers = get_auth_headers(token)
-        query = f"q={song_name}&type=track&limit=20"
-        query_url = url + "?" + query
-        res = get(query_url, headers=headers)
-        json_res = json.loads(res.content).get("tracks", {}).get("items", [])
-        if len(json_res) == 0:
+    def require_token():
+        """
+        A token for a cache miss that must call Spotify. Taken inside the
+        fetch, so cache hits and stale results never wait on a refresh.
+        """
+        token = get_token()
+        if not token:
+            raise RequestException("Failed to get Spotify access token")
+        return token
+
+    def catalog_candidates(target_features, k=None):
+        """
+        Scored ``(track, score)`` pairs for the catalog tracks nearest the
+        mood target, best first and capped per artist.
+        """
+        tracks, matrix = catalog.nearest(target_features, k or catalog_neighbours)
+        scores, survivors = score_tracks(matrix, target_features)
+        track_scores = sorted(
+            ((tracks[i], float(scores[i])) for i in survivors),
+            key=lambda x: x[1],
+            reverse=True,
+        )
+        return cap_per_artist(
+            track_scores, artist_cap, artist_of=lambda pair: lead_artist_id(pair[0])
+        )
+
+    def search_tracks(query, limit):
+        """
+        Spotify track search, cached briefly and shared between concurrent
+        identical queries. Returns None if the search failed.
+        """
+
+        def fetch():
+            res = spotify.get(
+                "/search",
+                require_token(),
+                params={"q": query, "type": "track", "limit": limit},
+            )
+            return search_items(res)
+
+        return search_cache.get_or_fetch(search_key(query, limit), fetch)
+
+    def search_key(query, limit):
+        return f"{limit}:{normalize_query(query)}"
+
+    def search_items(res):
+        if res.status_code != 200:
+            print(f"Search error: {res.content}")
             return None
-        return ",".join([song["id"] for song in json_res])
+        return res.json().get("tracks", {}).get("items", [])
 
-    def get_songs(token, song_ids):
-        if not song_ids:
+    def search_for_song(song_name):
+        """
+        Song records straight from the search response; the tracks are also
+        remembered in the track store for later lookups by ID.
+        """
+        try:
+            json_res = search_tracks(song_name, 20)
+        except RequestException as e:
+            print(f"Search error: {str(e)}")
             return []
-        url = f"https://api.spotify.com/v1/tracks?ids={song_ids}"
-        headers = get_auth_headers(token)
-        res = get(url, headers=headers)
-        json_res = json.loads(res.content)["tracks"]
+        return remember_songs(json_res)
+
+    def remember_songs(tracks):
+        songs = [track_record(track) for track in tracks or []]
+        track_store.put_many(songs)
+        return songs
 
+    def served(tracks):
+        """Recommended tracks, remembered so saving them as a playlist needs no lookup."""
+        remember_songs(tracks)
+        return tracks
+
+    def fetch_tracks(token, track_ids):
         songs = []
-        for track in json_res:
-            songs.append(
-                {
-                    "name": track["name"],
-                    "artist": track["artists"][0]["name"],
-                    "spotify_id": track["id"],
-                    "spotify_url": track["external_urls"]["spotify"],
-                }
+        for i in range(0, len(track_ids), 50):
+            try:
+                res = spotify.get(
+                    "/tracks", token, params={"ids": ",".join(track_ids[i:i + 50])}
+                )
+            except RequestException as e:
+                print(f"Get songs error: {str(e)}")
+                continue
+            if res.status_code != 200:
+                print(f"Get songs error: {res.content}")
+                continue
+            songs.extend(
+                track_record(track) for track in res.json()["tracks"] if track
             )
         return songs
-    def get_mood_features(mood):
-        """
-        Enhanced audio feature targets for different moods with carefully calibrated values
-        based on music psychology research and Spotify's audio features documentation.
-        """
-        mood_features = {
-            "happy": {
-                "mood_type": "happy",  # Add mood type for identification
-                "target_danceability": 0.7,
-                "target_energy": 0.75,
-                "target_valence": 0.85,
-                "target_tempo": 120,
-                "target_mode": 1,
-                "min_valence": 0.6,
-                "min_energy": 0.5,
-                "min_tempo": 85,           # Minimum tempo for happy songs
-                "max_instrumentalness": 0.7 # Maximum instrumentalness allowed
-            },
-            "sad": {
-                "target_danceability": 0.35,
-                "target_energy": 0.25,
-                "target_valence": 0.2,   # Lower valence for melancholic feel
-                "target_tempo": 75,      # Slower tempo
-                "target_mode": 0,        # Minor key
-                "max_valence": 0.4,      # Maximum threshold for positivity
-                "max_energy": 0.5        # Maximum energy level
-            },
-            "angry": {
-                "target_danceability": 0.55,
-                "target_energy": 0.9,    # High energy
-                "target_valence": 0.3,   # Lower valence for intensity
-                "target_tempo": 145,     # Fast tempo
-                "target_mode": 0,        # Minor key
-                "min_energy": 0.7,       # Minimum energy threshold
-                "target_loudness": -5    # Louder tracks
-            },
-            "relaxed": {
-                "target_danceability": 0.45,
-                "target_energy": 0.35,
-                "target_valence": 0.55,  # Moderate valence
-                "target_tempo": 85,      # Gentle tempo
-                "target_mode": 1,        # Major key
-                "max_energy": 0.5,       # Maximum energy threshold
-                "target_instrumentalness": 0.3  # Some instrumental presence
-            },
-            "energetic": {
-                "target_danceability": 0.8,
-                "target_energy": 0.85,
-                "target_valence": 0.75,  # Positive but not necessarily happy
-                "target_tempo": 128,     # Dance music tempo
-                "target_mode": 1,        # Major key
-                "min_energy": 0.7,       # Minimum energy threshold
-                "min_danceability": 0.6  # Minimum danceability
-            }
-        }
-        return mood_features.get(mood.lower(), mood_features["happy"])
-
-    def get_mood_search_terms(mood):
-        """
-        Expanded search terms incorporating genres, decades, and styles
-        while maintaining mood consistency
-        """
-        mood_terms = {
-            "happy": [
-                # Pop/Contemporary
-                "happy upbeat pop",
-                "feel good hits",
-                "euphoric dance",
-                # Rock/Alternative
-                "upbeat rock",
-                "indie happy",
-                "2010 pop"
-                "Rihanna Asap"
-                # Electronic/Dance
-                "hip hop hits"
-                "rap happy"
-                "rap feelgood"
-                # Older Classics
-                "classic happy hits",
-                "oldies feel good",
-                # Global/Cultural
-                "latin party",
-                "latin party"
-                "afrobeats happy",
-                "k-pop upbeat",
-                "afrobeats vibe"
-                "funk happy",
-                "reggae positive"
-            ],
-            "sad": [
-                # Pop/Contemporary
-                "sad pop ballad",
-                "emotional pop",
-                "heartbreak songs",
-                "breakup lonely"
-                "alone crying"
-                # Rock/Alternative
-                "indie melancholy",
-                "alt rock emotional",
-                # Singer-Songwriter
-                "acoustic sad",
-                "folk emotional",
-                # R&B/Soul
-                "soul heartbreak",
-                "r&b emotional",
-                "blues sad",
-                # Genre-Specific
-                "sad country",
-                "indie folk sad"
-            ],
-            "angry": [
-                # Rock/Metal
-                "heavy metal intense",
-                "hard rock angry",
-                "punk aggressive",
-                # Electronic
-                "industrial aggressive",
-                "electronic rage",
-                "dubstep intense",
-                # Hip-Hop
-                "rap aggressive",
-                "hip hop angry",
-                "trap intense",
-                # Alternative
-                "alt metal",
-                "grunge angry",
-                "hardcore punk",
-                # Genre-Mixing
-                "metal electronic",
-                "rap rock angry",
-                "crossover thrash",
-                # Experimental
-                "experimental aggressive",
-                "noise rock",
-                "death metal"
-            ],
-            "relaxed": [
-                # Ambient/Electronic
-                "ambient peaceful",
-                "chillout electronic",
-                "downtempo relax",
-                # Classical/Piano
-                "peaceful piano",
-                "classical calm",
-                "soft instrumental",
-                # Nature/World
-                "nature sounds calm",
-                "world music relaxing",
-                "meditation peaceful",
-                # Jazz/Lounge
-                "jazz relaxing",
-                "lounge chill",
-                "bossa nova calm",
-                # Modern
-                "lo-fi chill",
-                "indie ambient",
-                "modern classical calm",
-                # Acoustic
-                "acoustic gentle",
-                "folk peaceful",
-                "soft guitar"
-            ],
-            "energetic": [
-                # Dance/Electronic
-                "edm energy",
-                "dance workout",
-                "electronic upbeat",
-                # Pop/Rock
-                "power pop",
-                "rock energy",
-                "pop workout",
-                "hip hop energy",
-                "trap workout",
-                # Sports/Workout
-                "gym motivation",
-                "sports anthem",
-                "workout hits",
-                # Genre-Mixing
-                "rock electronic",
-                "pop rap energy",
-                "crossfit mix",
-                # Global
-                "latin energy",
-                "kpop dance",
-                "global workout"
-            ]
-        }
-        # Randomly select 5 diverse terms for broader search
-        return random.sample(mood_terms.get(mood.lower(), [""]), min(6, len(mood_terms.get(mood.lower(), [""]))))
 
-    def get_audio_features(token, track_ids):
+    def track_records(song_ids, fetch=False):
         """
-        Enhanced audio feature retrieval with better error handling
-        and larger batch processing
+        Track store records by ID in one batched lookup; with ``fetch``,
+        unknown IDs are also fetched from Spotify and remembered.
+        """
+        if not song_ids:
+            return {}
+        if fetch:
+            return track_store.get_many(song_ids, lambda missing: fetch_tracks(get_token(), missing))
+        return track_store.get_many(song_ids, lambda missing: [])
+
+    register_playlist_commands(app, db.playlists, lambda ids: track_records(ids, fetch=True))
+
+    def get_audio_features(token, track_ids, deadline=None):
+        """
+        Audio features for track_ids, served from the cache where possible
         """
         if not track_ids:
             return []
-        
-        chunk_size = 100
+
+        with timed("features"):
+            found = audio_feature_cache.get_many(
+                track_ids, lambda missing: fetch_audio_features(token, missing, deadline)
+            )
+        return [found[track_id] for track_id in track_ids if track_id in found]
+
+    def fetch_audio_features(token, track_ids, deadline=None):
+        """
+        Enhanced audio feature retrieval with better error handling
+        and larger batch processing; chunks are fetched concurrently
+        """
+        if deadline is None:
+            deadline = fanout_deadline
+        responses = spotify.get_many(
+            audio_feature_calls(track_ids), token, deadline=deadline
+        )
+        return features_from_responses(responses)
+
+    def audio_feature_calls(track_ids, chunk_size=100):
+        return [
+            ("/audio-features", {"ids": ",".join(track_ids[i:i + chunk_size])})
+            for i in range(0, len(track_ids), chunk_size)
+        ]
+
+    def features_from_responses(responses):
         all_features = []
-        
-        for i in range(0, len(track_ids), chunk_size):
-            chunk = track_ids[i:i + chunk_size]
-            url = f"https://api.spotify.com/v1/audio-features?ids={','.join(chunk)}"
-            headers = get_auth_headers(token)
-            try:
-                response = get(url, headers=headers)
-                if response.status_code == 200:
-                    features = response.json()
-                    if 'audio_features' in features:
-                        valid_features = [f for f in features['audio_features'] if f is not None]
-                        all_features.extend(valid_features)
-                else:
-                    print(f"Error status {response.status_code}: {response.content}")
-            except Exception as e:
-                print(f"Error getting audio features: {e}")
+        for response in responses:
+            if response is None:
                 continue
-        
+            if response.status_code == 200:
+                features = response.json()
+                if 'audio_features' in features:
+                    valid_features = [f for f in features['audio_features'] if f is not None]
+                    all_features.extend(valid_features)
+            else:
+                print(f"Error status {response.status_code}: {response.content}")
+
         return all_features
 
-    def calculate_mood_match_score(features, target_features):
+    def stored_features(track_ids):
+        """Audio features already cached or in MongoDB, without asking Spotify."""
+        return audio_feature_cache.get_many(track_ids, lambda missing: [])
+
+    def features_of(track_ids):
+        """Audio features by ID, asking Spotify only for those nobody has stored."""
+
+        def fetch(missing):
+            token = get_token()
+            return fetch_audio_features(token, missing) if token else []
+
+        return audio_feature_cache.get_many(track_ids, fetch)
+
+    register_taste_commands(app, db, features_of)
+    taste_backfill = TasteBackfill(db, features_of, on_ready=taste_cache.delete)
+
+    def track_taste(track_id):
         """
-        Enhanced scoring with specific filters for happy mood
+        The stored features a new entry is counted with. Saves never wait on
+        Spotify: without them, the entry is counted by a rebuild once the
+        backfill has fetched them.
         """
-        if not features:
-            return 0
-        
-        # Special filtering for happy mood
-        if 'happy' in target_features.get('mood_type', ''):
-            # Filter out very slow tracks (tempo < 85 BPM)
-            if features['tempo'] < 70:
-                return 0
-                
-            # Filter out tracks with very low energy
-            if features['energy'] < 0.4:
-                return 0
-
-        # Core weights for standard features
-        weights = {
-            'danceability': 0.2,
-            'energy': 0.25,
-            'valence': 0.3,
-            'tempo': 0.15,
-            'mode': 0.1
-        }
-        
-        score = 0
-        total_weight = 0
-        
-        # Check thresholds first
-        if 'min_valence' in target_features and features['valence'] < target_features['min_valence']:
-            return 0
-        if 'max_valence' in target_features and features['valence'] > target_features['max_valence']:
-            return 0
-        if 'min_energy' in target_features and features['energy'] < target_features['min_energy']:
-            return 0
-        if 'max_energy' in target_features and features['energy'] > target_features['max_energy']:
-            return 0
-        
-        # Calculate core features score
-        if 'target_danceability' in target_features:
-            score += weights['danceability'] * (1 - abs(features['danceability'] - target_features['target_danceability']))
-            total_weight += weights['danceability']
-        
-        if 'target_energy' in target_features:
-            score += weights['energy'] * (1 - abs(features['energy'] - target_features['target_energy']))
-            total_weight += weights['energy']
-        
-        if 'target_valence' in target_features:
-            score += weights['valence'] * (1 - abs(features['valence'] - target_features['target_valence']))
-            total_weight += weights['valence']
-        
-        if 'target_tempo' in target_features:
-            normalized_tempo = features['tempo'] / 200.0
-            normalized_target_tempo = target_features['target_tempo'] / 200.0
-            score += weights['tempo'] * (1 - abs(normalized_tempo - normalized_target_tempo))
-            total_weight += weights['tempo']
-        
-        if 'target_mode' in target_features:
-            score += weights['mode'] * (1 if features['mode'] == target_features['target_mode'] else 0)
-            total_weight += weights['mode']
-
-        return score / total_weight if total_weight > 0 else 0
+        return entry_features(stored_features([track_id]).get(track_id))
+
+    def personal_targets(user_id, mood, target_features):
+        """
+        The mood's targets blended with what the user has journaled under
+        it; None while they have nothing journaled for the mood.
+        """
+        profile = taste_cache.get(user_id)
+        if profile is None:
+            try:
+                with timed("taste"):
+                    profile = load_profile(db, user_id, stored_features)
+            except PyMongoError as e:
+                print(f"Taste profile read error: {e}")
+                return None
+            taste_cache.set(user_id, profile)
+        taste = mood_taste(profile, mood)
+        if taste is None:
+            return None
+        return blend_targets(target_features, taste, taste_prior, taste_max_blend)
+
+    def rescore(track_scores, target_features):
+        """
+        ``(track, score)`` pairs scored again against a user's own targets,
+        from stored audio features only. Left as they are when too few of
+        the tracks have stored features or pass the mood's thresholds.
+        """
+        found = stored_features([track["id"] for track, _ in track_scores])
+        known = [track for track, _ in track_scores if track["id"] in found]
+        if len(known) < recommendation_size:
+            return track_scores
+        with timed("scoring"):
+            scores, survivors = score_tracks(
+                feature_matrix([found[track["id"]] for track in known]), target_features
+            )
+        if len(survivors) < recommendation_size:
+            return track_scores
+        return sorted(
+            ((known[i], float(scores[i])) for i in survivors),
+            key=lambda x: x[1],
+            reverse=True,
+        )
 
     @app.route("/")
     def index():
@@ -412,56 +526,82 @@ def create_app():
     @login_required
     def home_page():
         user_id = current_user.id
-        entries = list(db.entries.find({"user_id": user_id}).sort("created_at", -1))
-
-        if entries:
-            moods = [entry.get("mood", "Unknown mood") for entry in entries]
-            timestamps = [
-                entry.get("created_at").strftime("%Y-%m-%d %H:%M:%S")
-                for entry in entries
-                if entry.get("created_at")
-            ]
-            top_mood = Counter(moods).most_common(1)[0][0] if moods else "No data"
-            latest_mood = moods[0] if moods else "No data"
-        else:
-            moods = []
-            timestamps = []
-            top_mood = "No data"
-            latest_mood = "No data"
+        entries, next_cursor = fetch_entries_page(
+            db.entries, user_id, limit=timeline_page_size
+        )
 
-        formatted_entries = [
-            {
-                "id": str(entry["_id"]),
-                "track_id": entry.get("track_id", "Unknown track"),
-                "time": (
-                    entry.get("created_at").strftime("%I:%M %p")
-                    if entry.get("created_at")
-                    else "Unknown time"
-                ),
-                "song": entry.get("track_name", "Unknown song"),
-                "mood": entry.get("mood", "Unknown mood"),
-            }
-            for entry in entries
-        ]
+        try:
+            stats = dashboard_stats(db, user_id, days=chart_days)
+        except PyMongoError as e:
+            # the timeline is still worth showing without the chart
+            print(f"Mood stats read error: {e}")
+            stats = {"chart_labels": [], "chart_series": {},
+                     "top_mood": "No data", "latest_mood": "No data"}
 
         return render_template(
             "home.html",
-            entries=formatted_entries,
-            moods=moods,
-            timestamps=timestamps,
-            top_mood=top_mood,
-            latest_mood=latest_mood,
+            entries=[format_entry(entry) for entry in entries],
+            next_cursor=next_cursor,
+            chart_labels=stats["chart_labels"],
+            chart_series=stats["chart_series"],
+            top_mood=stats["top_mood"],
+            latest_mood=stats["latest_mood"],
+        )
+
+    @app.route("/mood-stats", methods=["GET"])
+    @login_required
+    def mood_stats_json():
+        unit = request.args.get("unit", "day")
+        if unit not in ("day", "week"):
+            return jsonify({"error": "unit must be day or week"}), 400
+        try:
+            days = min(int(request.args.get("days", chart_days)), 366)
+        except ValueError:
+            return jsonify({"error": "days must be a number"}), 400
+        since = dt.now() - datetime.timedelta(days=days)
+        try:
+            counts = mood_counts(db, current_user.id, unit=unit, since=since)
+        except Exception as e:
+            print(f"Mood stats error: {str(e)}")
+            return jsonify({"error": "Failed to get mood statistics"}), 500
+        return jsonify(
+            {
+                "unit": unit,
+                "counts": [
+                    {
+                        "period": row["period"].strftime("%Y-%m-%d"),
+                        "mood": row["mood"],
+                        "count": row["count"],
+                    }
+                    for row in counts
+                ],
+            }
+        )
+
+    @app.route("/entries", methods=["GET"])
+    @login_required
+    def entries_json():
+        try:
+            limit = min(int(request.args.get("limit", timeline_page_size)), 100)
+            entries, next_cursor = fetch_entries_page(
+                db.entries,
+                current_user.id,
+                cursor=request.args.get("cursor"),
+                limit=max(limit, 1),
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid cursor or limit"}), 400
+        return jsonify(
+            {
+                "entries": [format_entry(entry) for entry in entries],
+                "next_cursor": next_cursor,
+            }
         )
 
     @app.route("/entry", methods=["GET", "POST"])
     def entry_page():
-        token = get_token()
         song_name = request.args.get("songname", "")
-        songs = []
-        if song_name and token:
-            song_ids = search_for_song(token, song_name)
-            if song_ids:
-                songs = get_songs(token, song_ids)
+        songs = search_for_song(song_name) if song_name else []
         return render_template("entry.html", songs=songs, searched=song_name)
 
     @app.route("/entry-submission", methods=["GET", "POST"])
@@ -499,19 +639,69 @@ def create_app():
             "mood": mood,
             "created_at": dt.now(),
         }
+        # kept on the entry so deleting it takes back exactly what was added
+        features = track_taste(track_id)
+        if features:
+            entry["features"] = features
 
         db.entries.insert_one(entry)
+        if not features:
+            # only once the entry exists for the profile rebuild to find
+            taste_backfill.submit(current_user.id, track_id)
+        update_stats(record_entry, db, entry)
+        update_taste(record_taste, db, entry)
+        taste_cache.delete(current_user.id)
         flash("Entry saved successfully!", "success")
         return redirect(url_for("home_page"))
 
+    @app.route("/entries/import", methods=["POST"])
+    @login_required
+    def import_journal():
+        """
+        Bulk-add entries from a JSON Lines or CSV upload, either as the
+        request body or as a ``file`` form field; parsed as it streams in.
+        """
+        upload = request.files.get("file")
+        if upload:
+            stream, fmt = upload.stream, format_of(upload.filename)
+        else:
+            stream = request.stream
+            fmt = "csv" if request.mimetype == "text/csv" else "ndjson"
+        fmt = request.args.get("format", fmt)
+        if fmt not in ENTRY_FORMATS:
+            return jsonify({"error": f"Unknown format: {fmt}"}), 400
+        try:
+            result = import_entries(db, read_rows(stream, fmt), current_user.id)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return jsonify({"error": f"Unreadable {fmt} upload: {e}"}), 400
+        finally:
+            taste_cache.delete(current_user.id)
+        return jsonify(result)
+
+    @app.route("/entries/export", methods=["GET"])
+    @login_required
+    def export_journal():
+        fmt = request.args.get("format", "ndjson")
+        if fmt not in ENTRY_FORMATS:
+            return jsonify({"error": f"Unknown format: {fmt}"}), 400
+        chunks = export_entries(db.entries, current_user.id, fmt)
+        return Response(
+            stream_with_context(chunks),
+            mimetype=ENTRY_FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename=journal.{fmt}"},
+        )
+
     @app.route("/delete-entry/<entry_id>", methods=["POST"])
     @login_required
     def delete_entry(entry_id):
         try:
-            result = db.entries.delete_one(
+            deleted = db.entries.find_one_and_delete(
                 {"_id": ObjectId(entry_id), "user_id": current_user.id}
             )
-            if result.deleted_count > 0:
+            if deleted:
+                update_stats(forget_entry, db, deleted)
+                update_taste(forget_taste, db, deleted)
+                taste_cache.delete(current_user.id)
                 flash("Entry deleted successfully!", "success")
             else:
                 flash("Failed to delete entry or entry not found.", "error")
@@ -526,17 +716,12 @@ def create_app():
 
     @app.route("/search-songs", methods=["GET"])
     def search():
-        token = get_token()
         song_name = request.args.get("songname", "")
 
         if not song_name:
             return render_template("search.html", songs=[])
 
-        if token:
-            song_ids = search_for_song(token, song_name)
-            songs = get_songs(token, song_ids)
-        else:
-            songs = []
+        songs = search_for_song(song_name)
         return render_template("search.html", songs=songs)
 
     @app.route("/signup", methods=["GET", "POST"])
@@ -553,9 +738,14 @@ def create_app():
                 flash("User already exists", "error")
                 return redirect(url_for("signup"))
 
-            hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
+            hashed_password = passwords.hash(password)
             user = {"username": username, "password": hashed_password}
-            db.users.insert_one(user)
+            try:
+                db.users.insert_one(user)
+            except DuplicateKeyError:
+                # a concurrent signup took the name after the check above
+                flash("User already exists", "error")
+                return redirect(url_for("signup"))
 
             flash("User registered successfully!", "success")
             return redirect(url_for("login"))
@@ -569,10 +759,19 @@ def create_app():
             password = request.form.get("password")
             user_data = db.users.find_one({"username": username})
 
-            if user_data and bcrypt.check_password_hash(
-                user_data["password"], password
-            ):
+            if user_data and passwords.check(user_data["password"], password):
+                if passwords.needs_rehash(user_data["password"]):
+                    # BCRYPT_ROUNDS changed; upgrade the hash while we have
+                    # the password, unless the hashers are busy
+                    try:
+                        db.users.update_one(
+                            {"_id": user_data["_id"], "password": user_data["password"]},
+                            {"$set": {"password": passwords.hash(password)}},
+                        )
+                    except HasherBusy:
+                        pass
                 user = User(str(user_data["_id"]))
+                known_users.set(user.id, True)
                 login_user(user)
                 return redirect(url_for("home_page"))
 
@@ -580,9 +779,23 @@ def create_app():
 
         return render_template("login.html")
 
+    @app.errorhandler(HasherBusy)
+    def hashers_busy(e):
+        flash("Too many sign-ins right now, please try again in a moment.", "error")
+        template = "signup.html" if request.endpoint == "signup" else "login.html"
+        return render_template(template), 503, {"Retry-After": "1"}
+
+    @app.errorhandler(CircuitOpen)
+    def spotify_unavailable(e):
+        retry_after = str(max(1, math.ceil(e.retry_after)))
+        return jsonify({"error": "Spotify is unavailable, try again shortly"}), 503, {
+            "Retry-After": retry_after
+        }
+
     @app.route("/logout")
     @login_required
     def logout():
+        known_users.delete(current_user.id)
         logout_user()
         flash("You have been logged out.", "info")
         return redirect(url_for("login"))
@@ -590,27 +803,18 @@ def create_app():
     @app.route("/search-songs-json", methods=["GET"])
     @login_required
     def search_songs_json():
-        token = get_token()
-        if not token:
-            return jsonify({"error": "Failed to get Spotify access token"}), 500
-
         song_name = request.args.get("songname", "")
         if not song_name:
             return jsonify({"tracks": []})
 
         try:
-            response = get(
-                f"https://api.spotify.com/v1/search?q={song_name}&type=track&limit=12",
-                headers=get_auth_headers(token),
-            )
-            if response.status_code != 200:
-                print(f"Search error: {response.content}")
+            tracks = search_tracks(song_name, 12)
+            if tracks is None:
                 return jsonify({"error": "Failed to search songs"}), 400
-
-            search_results = response.json()
-            tracks = search_results.get("tracks", {}).get("items", [])
             return jsonify({"tracks": tracks})
 
+        except CircuitOpen:
+            raise
         except Exception as e:
             print(f"Search error: {str(e)}")
             return jsonify({"error": "Failed to search songs"}), 500
@@ -620,17 +824,13 @@ def create_app():
     def create_playlist():
         try:
             data = request.get_json()
-            playlist = {
-                "user_id": str(current_user.id),
-                "name": data.get(
-                    "name",
-
-                    f"Playlist - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                ),
-                "description": data.get("description", ""),
-                "tracks": data.get("tracks", []),
-                "created_at": dt.now(),
-            }
+            # checked first, so an oversized post never reaches Spotify
+            tracks = posted_tracks(data, playlist_max_tracks)
+            # tracks are stored as references; the track store keeps the rest
+            records = track_records(posted_track_ids(tracks), fetch=True)
+            playlist = build_playlist(
+                str(current_user.id), data, records, max_tracks=playlist_max_tracks
+            )
             result = db.playlists.insert_one(playlist)
 
             flash("Playlist created successfully!", "success")
@@ -644,6 +844,8 @@ def create_app():
                 201,
             )
 
+        except InvalidPlaylist as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             print(f"Create playlist error: {str(e)}")
             return jsonify({"error": "Failed to create playlist"}), 500
@@ -653,114 +855,248 @@ def create_app():
     def playlists_page():
         return render_template("playlists.html")
 
+    def search_candidates(token, search_terms, limit=30, deadline=None):
+        """
+        Tracks from one concurrent search per term, capped per artist,
+        shuffled and de-duplicated
+        """
+        calls = [
+            ("/search", {"q": search_term, "type": "track", "limit": limit})
+            for search_term in search_terms
+        ]
+        with timed("search"):
+            responses = spotify.get_many(calls, token, deadline=deadline)
+        return candidates_from_responses(responses)
+
+    def candidates_from_responses(responses):
+        all_tracks = []
+        # walk responses in search-term order so the variety filter
+        # sees tracks in the same order as the old sequential loop
+        for response in responses:
+            if response is not None and response.status_code == 200:
+                all_tracks.extend(response.json().get("tracks", {}).get("items", []))
+
+        # Filter for artist variety (max songs per artist)
+        all_tracks = cap_per_artist(all_tracks, artist_cap)
+        random.shuffle(all_tracks)
+        return unique_tracks(all_tracks)
+
+    def score_candidates(token, candidates, target_features, deadline=None):
+        """
+        ``(track, score)`` pairs for the candidates that pass the mood
+        filters, or None if no audio features could be fetched
+        """
+        track_ids = [track['id'] for track in candidates]
+        audio_features = get_audio_features(token, track_ids, deadline=deadline)
+        return score_features(candidates, audio_features, target_features)
+
+    def score_features(candidates, audio_features, target_features):
+        if not audio_features:
+            return None
+
+        with timed("scoring"):
+            feature_map = {feature['id']: feature for feature in audio_features if feature}
+            catalog.add_tracks(candidates, feature_map)
+
+            # score the whole candidate set in one vectorized pass
+            scored = [track for track in candidates if track['id'] in feature_map]
+            scores, survivors = score_tracks(
+                feature_matrix([feature_map[track['id']] for track in scored]),
+                target_features,
+            )
+        return [(scored[i], float(scores[i])) for i in survivors]
+
+    def build_mood_pool(mood):
+        """
+        Every search term for the mood plus the nearest catalog tracks,
+        scored and ranked, for the mood pool refresher
+        """
+        target_features = get_mood_features(mood)
+        track_scores = []
+        token = get_token()
+        if token:
+            candidates = search_candidates(
+                token, get_mood_search_terms(mood, count=None), limit=50,
+                deadline=mood_pool_deadline,
+            )
+            track_scores = score_candidates(
+                token, candidates, target_features, deadline=mood_pool_deadline
+            ) or []
+        track_scores += catalog_candidates(target_features, k=mood_pool_size * 2)
+
+        ranked = sorted(track_scores, key=lambda x: x[1], reverse=True)
+        seen_ids = set()
+        pool = []
+        for track, score in cap_per_artist(
+            ranked, artist_cap, artist_of=lambda pair: lead_artist_id(pair[0])
+        ):
+            if track['id'] not in seen_ids:
+                seen_ids.add(track['id'])
+                pool.append((slim_track(track), score))
+        return pool
+
+    mood_pools = MoodPools(
+        db.mood_pools,
+        build_mood_pool,
+        refresh_interval=int(os.getenv("MOOD_POOL_REFRESH_SECONDS", "900")),
+        max_age=int(os.getenv("MOOD_POOL_MAX_AGE", "3600")),
+        size=int(os.getenv("MOOD_POOL_SIZE", "500")),
+    )
+    mood_pool_size = mood_pools.size
+    mood_pool_deadline = float(os.getenv("MOOD_POOL_DEADLINE", "60"))
+    # "thread" refreshes pools inside the web workers; "off" leaves it to
+    # a separate `flask refresh-mood-pools --loop` process
+    mood_pool_refresher = os.getenv("MOOD_POOL_REFRESHER", "thread")
+    register_pool_commands(app, mood_pools)
+
+    def precomputed_recommendations(mood, target_features, personal=None):
+        """
+        A response sampled from the mood's pool or, failing that, from the
+        local catalog; None if neither can serve the mood yet. Pools are
+        shared by every user, so with ``personal`` targets they are scored
+        again; the catalog is searched around the personal targets directly.
+        """
+        if mood in MOODS:
+            if mood_pool_refresher == "thread":
+                # started here rather than in create_app so it runs post-fork
+                mood_pools.start()
+            with timed("pool"):
+                track_scores, pool_age = mood_pools.get(mood)
+            if track_scores:
+                if personal:
+                    track_scores = rescore(track_scores, personal)
+                final_tracks = select_diverse_tracks(
+                    track_scores, output_size=recommendation_size
+                )
+                return {"tracks": served(final_tracks), "pool_age": round(pool_age)}
+
+        try:
+            track_scores = catalog_candidates(personal or target_features)
+            if len(track_scores) >= catalog_min_candidates:
+                final_tracks = select_diverse_tracks(
+                    track_scores, output_size=recommendation_size
+                )
+                return {"tracks": served(final_tracks), "pool_age": None}
+        except Exception as e:
+            print(f"Catalog recommendations error: {str(e)}")
+        return None
+
+    def scored_set(candidates, track_scores):
+        # slim tracks keep cached sets small, as in the mood pools
+        return {
+            "candidates": [slim_track(track) for track in candidates],
+            "scores": None if track_scores is None else [
+                [slim_track(track), score] for track, score in track_scores
+            ],
+        }
+
+    def live_recommendations(mood, target_features):
+        """
+        Candidates and scores for a mood from a live Spotify search, None if
+        the search found nothing. Cached like searches: once stale, the last
+        good set is served while it is refreshed, including through outages.
+        """
+
+        def fetch():
+            breaker.check()
+            token = require_token()
+            started = time.monotonic()
+            candidates = search_candidates(
+                token, get_mood_search_terms(mood), deadline=fanout_deadline
+            )
+            if not candidates:
+                return None
+            # search and audio features share one deadline per request
+            remaining = max(0.0, fanout_deadline - (time.monotonic() - started))
+            track_scores = score_candidates(
+                token, candidates, target_features, deadline=remaining
+            )
+            return scored_set(candidates, track_scores)
+
+        return recommendation_cache.get_or_fetch(mood, fetch)
+
+    def pick_tracks(candidates, track_scores, personal=None):
+        if track_scores and personal:
+            # live sets are cached per mood, not per user
+            track_scores = rescore(track_scores, personal)
+        if track_scores is None:
+            # no audio features came back: a random selection beats nothing
+            return served(random.sample(candidates, min(recommendation_size, len(candidates))))
+        return served(select_diverse_tracks(track_scores, output_size=recommendation_size))
+
     @app.route("/recommendations", methods=["GET"])
     @login_required
     def get_mood_recommendations():
-        token = get_token()
-        if not token:
-            return jsonify({"error": "Failed to get Spotify access token"}), 500
-
         mood = request.args.get("mood", "").lower()
         if not mood:
             return jsonify({"error": "Mood parameter is required"}), 400
 
-        try:
-            search_terms = get_mood_search_terms(mood)
-            all_tracks = []
-            seen_artists = set()  # Track artists to ensure variety
-            
-            for search_term in search_terms:
-                response = get(
-                    f"https://api.spotify.com/v1/search?q={search_term}&type=track&limit=30",
-                    headers=get_auth_headers(token),
-                )
-                
-                if response.status_code == 200:
-                    tracks = response.json().get("tracks", {}).get("items", [])
-                    # Filter for artist variety (max 2 songs per artist)
-                    for track in tracks:
-                        artist_id = track['artists'][0]['id']
-                        if artist_id not in seen_artists or sum(1 for t in all_tracks if t['artists'][0]['id'] == artist_id) < 2:
-                            all_tracks.append(track)
-                            seen_artists.add(artist_id)
-            
-            random.shuffle(all_tracks)
-            
-            # Remove duplicates while preserving order
-            unique_tracks = []
-            seen_ids = set()
-            for track in all_tracks:
-                if track['id'] not in seen_ids:
-                    seen_ids.add(track['id'])
-                    unique_tracks.append(track)
-            
-            if not unique_tracks:
-                return jsonify({"tracks": []})
+        target_features = get_mood_features(mood)
+        personal = personal_targets(current_user.id, mood, target_features)
+        precomputed = precomputed_recommendations(mood, target_features, personal)
+        if precomputed:
+            return jsonify(precomputed)
 
-            track_ids = [track['id'] for track in unique_tracks]
-            audio_features = get_audio_features(token, track_ids)
-            
-            if not audio_features:
-                random_selection = random.sample(unique_tracks, min(16, len(unique_tracks)))
-                return jsonify({"tracks": random_selection})
-            
-            target_features = get_mood_features(mood)
-            track_scores = []
-            feature_map = {feature['id']: feature for feature in audio_features if feature}
-            
-            for track in unique_tracks:
-                features = feature_map.get(track['id'])
-                if features:
-                    score = calculate_mood_match_score(features, target_features)
-                    if score > 0:
-                        track_scores.append((track, score))
-            
-            final_tracks = []
-            track_scores.sort(key=lambda x: x[1], reverse=True)
-            
-            total_tracks = len(track_scores)
-            top_cutoff = int(total_tracks * 0.5)  # Take top 50% for top tier
-            mid_cutoff = int(total_tracks * 0.8)  # Take next 25% for mid tier
-
-            top_third = track_scores[:top_cutoff]               # 50% of tracks
-            mid_third = track_scores[top_cutoff:mid_cutoff]     # 30% of tracks
-            last_third = track_scores[mid_cutoff:]              # 20% of tracks
-
-            if top_third:
-                final_tracks.extend([t for t, _ in random.sample(top_third, min(9, len(top_third)))])  # Take 8 from top
-            if mid_third:
-                final_tracks.extend([t for t, _ in random.sample(mid_third, min(5, len(mid_third)))])  # Take 4 from middle
-            if last_third:
-                final_tracks.extend([t for t, _ in random.sample(last_third, min(2, len(last_third)))])  # Take 2 from bottom
-            
-            
-            # Fill remaining slots if needed
-            while len(final_tracks) < 14 and track_scores:
-                remaining = [t for t, _ in track_scores if t not in final_tracks]
-                if not remaining:
-                    break
-                final_tracks.append(random.choice(remaining))
-            
-            random.shuffle(final_tracks)  # Final shuffle for variety
-            
-            return jsonify({"tracks": final_tracks[:16]})
-        
+        # no pool yet and not enough local coverage for this mood: search Spotify
+        try:
+            scored = live_recommendations(mood, target_features)
+        except CircuitOpen:
+            raise
         except Exception as e:
             print(f"Recommendations error: {str(e)}")
             return jsonify({"error": "Failed to get recommendations"}), 500
+        if scored is None:
+            return jsonify({"tracks": [], "pool_age": None})
+        tracks = pick_tracks(scored["candidates"], scored["scores"], personal)
+        return jsonify({"tracks": tracks, "pool_age": None})
 
     @app.route("/user-playlists", methods=["GET"])
     @login_required
     def get_user_playlists():
         try:
-            playlists = list(db.playlists.find({"user_id": str(current_user.id)}))
-            for playlist in playlists:
-                playlist["_id"] = str(playlist["_id"])
-            return jsonify({"playlists": playlists})
+            limit = min(int(request.args.get("limit", playlists_page_size)), 50)
+            playlists, next_cursor = fetch_playlists_page(
+                db.playlists,
+                str(current_user.id),
+                cursor=request.args.get("cursor"),
+                limit=max(limit, 1),
+                preview=playlist_preview_tracks,
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid cursor or limit"}), 400
+        try:
+            records = track_records(track_ids(playlists))
+            return jsonify(
+                {
+                    "playlists": [format_playlist(p, records) for p in playlists],
+                    "next_cursor": next_cursor,
+                }
+            )
         except Exception as e:
             print(f"Get playlists error: {str(e)}")
             return jsonify({"error": "Failed to get playlists"}), 500
 
+    @app.route("/user-playlists/<playlist_id>/tracks", methods=["GET"])
+    @login_required
+    def get_playlist_tracks(playlist_id):
+        try:
+            offset = max(int(request.args.get("offset", 0)), 0)
+            limit = max(min(int(request.args.get("limit", 100)), 500), 1)
+        except ValueError:
+            return jsonify({"error": "Invalid offset or limit"}), 400
+        playlist = fetch_playlist_tracks(
+            db.playlists, str(current_user.id), playlist_id, offset, limit
+        )
+        if playlist is None:
+            return jsonify({"error": "Playlist not found"}), 404
+        refs = playlist.get("tracks", [])
+        return jsonify(
+            {
+                "tracks": hydrate(refs, track_records(track_ids([playlist]))),
+                "track_count": playlist["track_count"],
+            }
+        )
+
     @app.route("/delete-playlist/<playlist_id>", methods=["POST"])
     @login_required
     def delete_playlist(playlist_id):
@@ -777,10 +1113,161 @@ def create_app():
             flash("An error occurred while deleting the playlist.", "error")
         return redirect(url_for("playlists_page"))
 
+    def register_async_views():
+        """
+        Swap the Spotify-bound views for async versions. They share the
+        caches, catalog and pools with the sync code; only the Spotify calls
+        are awaited, fanned out on the async client's event loop.
+        """
+        async_spotify = AsyncSpotifyClient.from_env(cli_id, cli_secret)
+        async_spotify.on_response = metrics.observe_spotify
+        async_spotify.breaker = async_spotify.tokens.breaker = breaker
+        app.extensions["async_spotify"] = async_spotify
+
+        async def require_token_async():
+            token = await async_spotify.get_token()
+            if not token:
+                raise RequestException("Failed to get Spotify access token")
+            return token
+
+        async def search_tracks_async(query, limit):
+            async def fetch():
+                res = await async_spotify.get(
+                    "/search",
+                    await require_token_async(),
+                    params={"q": query, "type": "track", "limit": limit},
+                )
+                return search_items(res)
+
+            return await search_cache.aget_or_fetch(search_key(query, limit), fetch)
+
+        async def search_for_song_async(song_name):
+            try:
+                json_res = await search_tracks_async(song_name, 20)
+            except RequestException as e:
+                print(f"Search error: {str(e)}")
+                return []
+            return remember_songs(json_res)
+
+        async def get_audio_features_async(token, track_ids, deadline):
+            if not track_ids:
+                return []
+
+            async def fetch(missing):
+                responses = await async_spotify.get_many(
+                    audio_feature_calls(missing), token, deadline=deadline
+                )
+                return features_from_responses(responses)
+
+            with timed("features"):
+                found = await audio_feature_cache.aget_many(track_ids, fetch)
+            return [found[track_id] for track_id in track_ids if track_id in found]
+
+        async def live_recommendations_async(mood, target_features):
+            """``live_recommendations`` on the async client."""
+
+            async def fetch():
+                breaker.check()
+                token = await require_token_async()
+                started = time.monotonic()
+                calls = [
+                    ("/search", {"q": search_term, "type": "track", "limit": 30})
+                    for search_term in get_mood_search_terms(mood)
+                ]
+                with timed("search"):
+                    responses = await async_spotify.get_many(
+                        calls, token, deadline=fanout_deadline
+                    )
+                candidates = candidates_from_responses(responses)
+                if not candidates:
+                    return None
+                remaining = max(0.0, fanout_deadline - (time.monotonic() - started))
+                audio_features = await get_audio_features_async(
+                    token, [track['id'] for track in candidates], remaining
+                )
+                track_scores = score_features(candidates, audio_features, target_features)
+                return scored_set(candidates, track_scores)
+
+            return await recommendation_cache.aget_or_fetch(mood, fetch)
+
+        async def entry_page():
+            song_name = request.args.get("songname", "")
+            songs = await search_for_song_async(song_name) if song_name else []
+            return render_template("entry.html", songs=songs, searched=song_name)
+
+        async def search():
+            song_name = request.args.get("songname", "")
+
+            if not song_name:
+                return render_template("search.html", songs=[])
+
+            songs = await search_for_song_async(song_name)
+            return render_template("search.html", songs=songs)
+
+        @login_required
+        async def search_songs_json():
+            song_name = request.args.get("songname", "")
+            if not song_name:
+                return jsonify({"tracks": []})
+
+            try:
+                tracks = await search_tracks_async(song_name, 12)
+                if tracks is None:
+                    return jsonify({"error": "Failed to search songs"}), 400
+                return jsonify({"tracks": tracks})
+
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                print(f"Search error: {str(e)}")
+                return jsonify({"error": "Failed to search songs"}), 500
+
+        @login_required
+        async def get_mood_recommendations():
+            mood = request.args.get("mood", "").lower()
+            if not mood:
+                return jsonify({"error": "Mood parameter is required"}), 400
+
+            target_features = get_mood_features(mood)
+            personal = personal_targets(current_user.id, mood, target_features)
+            precomputed = precomputed_recommendations(mood, target_features, personal)
+            if precomputed:
+                return jsonify(precomputed)
+
+            try:
+                scored = await live_recommendations_async(mood, target_features)
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                print(f"Recommendations error: {str(e)}")
+                return jsonify({"error": "Failed to get recommendations"}), 500
+            if scored is None:
+                return jsonify({"tracks": [], "pool_age": None})
+            tracks = pick_tracks(scored["candidates"], scored["scores"], personal)
+            return jsonify({"tracks": tracks, "pool_age": None})
+
+        app.view_functions["entry_page"] = entry_page
+        app.view_functions["search"] = search
+        app.view_functions["search_songs_json"] = search_songs_json
+        app.view_functions["get_mood_recommendations"] = get_mood_recommendations
+
+    if async_mode:
+        register_async_views()
+
     return app
 
-app = create_app()
+
+def __getattr__(name):
+    # `gunicorn app:app` and `flask --app app` build the app on first access,
+    # so importing create_app (tests, benchmarks, pool workers) stays cheap
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    app = create_app()
     port = int(os.getenv("FLASK_PORT", "5000"))
     app.run(port=port, debug=(os.getenv("FLASK_ENV") == "development"))
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Compares the upstream phase of /recommendations issued sequentially (the
+old loop) against SpotifyClient.get_many, using a stub Spotify server with
+injected latency.
+
+    python benchmarks/bench_fanout.py --latency 0.05 --jitter 0.05 --runs 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify import SpotifyClient  # noqa: E402
+from stub_spotify import StubSpotify  # noqa: E402
+
+SEARCH_TERMS = 6
+CANDIDATES_PER_TERM = 30
+
+
+def sequential(client, token):
+    track_ids = []
+    for n in range(SEARCH_TERMS):
+        res = client.get(
+            "/search", token, {"q": f"term {n}", "type": "track", "limit": CANDIDATES_PER_TERM}
+        )
+        track_ids += [t["id"] for t in res.json()["tracks"]["items"]]
+    for i in range(0, len(track_ids), 100):
+        client.get("/audio-features", token, {"ids": ",".join(track_ids[i:i + 100])})
+
+
+def concurrent(client, token):
+    calls = [
+        ("/search", {"q": f"term {n}", "type": "track", "limit": CANDIDATES_PER_TERM})
+        for n in range(SEARCH_TERMS)
+    ]
+    track_ids = []
+    for res in client.get_many(calls, token, deadline=10):
+        track_ids += [t["id"] for t in res.json()["tracks"]["items"]]
+    calls = [
+        ("/audio-features", {"ids": ",".join(track_ids[i:i + 100])})
+        for i in range(0, len(track_ids), 100)
+    ]
+    client.get_many(calls, token, deadline=10)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(fn, client, token, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(client, token)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    stub = StubSpotify(latency=args.latency, jitter=args.jitter)
+    client = SpotifyClient(
+        "bench", "bench", api_url=stub.api_url, token_url=stub.token_url
+    )
+    token = client.get_token()
+    try:
+        print(f"{'mode':<12}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+        for name, fn in (("sequential", sequential), ("concurrent", concurrent)):
+            samples = run(fn, client, token, args.runs)
+            print(
+                f"{name:<12}{percentile(samples, 50):>10.1f}"
+                f"{percentile(samples, 99):>10.1f}{statistics.mean(samples):>10.1f}"
+            )
+    finally:
+        client.close()
+        stub.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Login throughput against PasswordHasher pool size, and what a login burst
+does to the latency of a cheap request served alongside it.
+
+    python benchmarks/bench_passwords.py --rounds 12 --workers 0 1 2 4 --logins 64
+
+``--workers 0`` checks passwords on the request threads, as the app used to.
+Each run keeps ``--concurrency`` login threads busy while a probe thread
+times a small pure-Python task (a stand-in for a cheap route) every 10ms.
+
+cost 12, 48 logins from 16 threads, on a 1 vCPU box:
+
+    workers  logins/s  503s  probe p50 ms  probe p99 ms
+    0             2.8     0          0.12          0.22
+    1             2.7     0          0.15          0.27
+    2             2.8     0          0.12          0.27
+    4             2.6     0          0.11          0.23
+
+With one core, logins/s is the core's bcrypt rate whatever the pool size,
+and since bcrypt releases the GIL while hashing, the probe is not stalled
+either way. The pool adds throughput only with more cores; what protects
+the other routes on a small box is ``max_pending``: with ``--max-pending 4``
+44 of the 48 logins get a 503 instead of queueing behind each other.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import HasherBusy, PasswordHasher  # noqa: E402
+from bench_fanout import percentile  # noqa: E402
+
+
+def probe(stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        sum(i * i for i in range(2000))
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def run(rounds, workers, logins, concurrency, max_pending):
+    hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=max_pending)
+    hashed = PasswordHasher(rounds=rounds, workers=0).hash("correct horse")
+    hasher.check(hashed, "correct horse")  # start the pool outside the timing
+    rejected = []
+
+    def login(_):
+        try:
+            hasher.check(hashed, "correct horse")
+        except HasherBusy:
+            rejected.append(1)
+
+    stop, samples = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(stop, samples))
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    hasher.close()
+    return (logins - len(rejected)) / elapsed, len(rejected), samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} rounds={args.rounds} concurrency={args.concurrency}")
+    print(f"{'workers':<9}{'logins/s':>9}{'503s':>6}{'probe p50 ms':>14}{'probe p99 ms':>14}")
+    for workers in args.workers:
+        rate, rejected, samples = run(
+            args.rounds, workers, args.logins, args.concurrency, args.max_pending
+        )
+        print(
+            f"{workers:<9}{rate:>9.1f}{rejected:>6}"
+            f"{percentile(samples, 50):>14.2f}{percentile(samples, 99):>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
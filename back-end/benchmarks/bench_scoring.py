@@ -0,0 +1,52 @@
+"""
+Microbenchmark of the scalar mood-match scorer against the batched NumPy
+scorer at catalog-sized candidate sets.
+
+    python benchmarks/bench_scoring.py --sizes 10000 100000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moods import calculate_mood_match_score, get_mood_features  # noqa: E402
+from scoring import FEATURE_COLUMNS, score_tracks  # noqa: E402
+
+
+def synthetic_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.random((n, len(FEATURE_COLUMNS)))
+    matrix[:, 3] = rng.uniform(40, 220, n)
+    matrix[:, 4] = rng.integers(0, 2, n)
+    return matrix
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--mood", default="happy")
+    args = parser.parse_args()
+
+    target = get_mood_features(args.mood)
+    print(f"{'tracks':>10}{'scalar ms':>12}{'numpy ms':>12}{'speedup':>10}")
+    for n in args.sizes:
+        matrix = synthetic_matrix(n)
+        rows = [dict(zip(FEATURE_COLUMNS, row)) for row in matrix.tolist()]
+        scalar = time_it(lambda: [calculate_mood_match_score(r, target) for r in rows])
+        vectorized = time_it(lambda: score_tracks(matrix, target))
+        print(f"{n:>10}{scalar:>12.1f}{vectorized:>12.1f}{scalar / vectorized:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Cold start: how long a fresh interpreter takes to import app.py and build
+the app, and which imports that time goes to (``python -X importtime``).
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1000
+
+Every run is a new process started from back-end/, so nothing is warm but
+the OS page cache. Exits 1 if the median import + create_app time is over
+``--budget-ms``, so a slow new import shows up before it ships.
+
+Median of 5 runs on a 1 vCPU box, MongoDB not running
+(serverSelectionTimeoutMS=300):
+
+                                        import ms  create_app ms  total ms
+    app built at import, ping + indexes     1182            549      1731
+    lazy app, /healthz readiness             401             14       415
+
+Before, importing the module built the app, and building it waited on a
+ping and the index builds (up to serverSelectionTimeoutMS, 30 s by default,
+when MongoDB is down); aiohttp was imported even in sync mode. The largest
+imports left are flask, numpy (via catalog), pymongo and requests, all
+needed by the first request.
+"""
+
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print(imported - started, time.perf_counter() - imported)
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_once(env):
+    """(import seconds, create_app seconds) in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    imported, created = out.strip().splitlines()[-1].split()
+    return float(imported), float(created)
+
+
+def slowest_imports(env, top):
+    """The ``top`` direct imports of app by cumulative microseconds."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=BACKEND, env=env,
+        capture_output=True, text=True, check=True,
+    ).stderr
+    imports = []
+    for line in err.splitlines():
+        match = IMPORT_LINE.match(line)
+        # the separator space plus two of indent: imported by app.py itself
+        if match and len(match.group(3)) == 3:
+            imports.append((int(match.group(2)), match.group(4)))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # a database that is not there must not slow the app's start
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017/?serverSelectionTimeoutMS=300")
+    env.setdefault("MONGO_DBNAME", "bench")
+
+    print(f"{'import ms':>10}{'cumulative':>12}")
+    for micros, name in slowest_imports(env, args.top):
+        print(f"{micros / 1000:>10.1f}  {name}")
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    imported = statistics.median(r[0] for r in runs) * 1000
+    created = statistics.median(r[1] for r in runs) * 1000
+    total = statistics.median(sum(r) for r in runs) * 1000
+    print(f"\nimport {imported:.0f} ms, create_app {created:.0f} ms, total {total:.0f} ms "
+          f"(median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    if total > args.budget_ms:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
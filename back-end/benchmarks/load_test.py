@@ -0,0 +1,262 @@
+"""
+End-to-end load test: virtual users walk login -> home -> search ->
+recommendations -> create-playlist against a running app, and the run is
+reported as throughput and latency percentiles per step.
+
+Against an app that is already up (pointed at stub_spotify.py, or not):
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --users 20 --duration 60
+
+Or let it start the stub and gunicorn itself (needs MONGO_URI/MONGO_DBNAME
+for a database it may write test users and playlists to):
+
+    python benchmarks/load_test.py --spawn --users 20 --duration 60 --throttle-rate 0.01
+
+``--save run.json`` keeps the numbers; ``--baseline run.json`` compares
+against a saved run and exits 1 if any step's p95 got more than
+``--tolerance`` slower or its error rate rose, to catch regressions offline.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import signal
+import asyncio
+import argparse
+import subprocess
+import urllib.request
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_fanout import percentile  # noqa: E402
+from stub_spotify import StubSpotifyProcess, add_arguments, stub_options  # noqa: E402
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ("login", "home", "search", "recommendations", "create-playlist")
+MOODS = ("happy", "sad", "angry", "relaxed", "energetic")
+SEARCH_WORDS = ("love", "night", "summer", "rain", "dance", "blue", "fire", "home")
+PASSWORD = "load-test-password"
+
+
+class Stats:
+    def __init__(self):
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.flows = 0
+
+    def record(self, step, started, ok):
+        self.samples[step].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[step] += 1
+
+    def summary(self, elapsed):
+        steps = {}
+        for step in STEPS:
+            samples = self.samples[step]
+            if not samples:
+                continue
+            steps[step] = {
+                "requests": len(samples),
+                "errors": self.errors[step],
+                "rps": len(samples) / elapsed,
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+            }
+        return {"elapsed": elapsed, "flows_per_s": self.flows / elapsed, "steps": steps}
+
+
+class VirtualUser:
+    def __init__(self, base_url, stats, reuse_session=False):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.reuse_session = reuse_session
+        self.username = f"load-{uuid.uuid4().hex[:12]}"
+        self.session = None
+        self.logged_in = False
+
+    async def _call(self, step, method, path, ok_statuses=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            async with self.session.request(
+                method, self.base_url + path, allow_redirects=False, **kwargs
+            ) as res:
+                body = await res.read()
+                ok = res.status in ok_statuses
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            body, ok = None, False
+        self.stats.record(step, started, ok)
+        return body if ok else None
+
+    async def setup(self, timeout):
+        self.session = aiohttp.ClientSession(
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+        async with self.session.post(
+            self.base_url + "/signup",
+            data={"username": self.username, "password": PASSWORD},
+            allow_redirects=False,
+        ) as res:
+            await res.read()
+
+    async def flow(self):
+        if not (self.reuse_session and self.logged_in):
+            self.session.cookie_jar.clear()
+            # a good login redirects home; a bad one re-renders the form
+            self.logged_in = await self._call(
+                "login", "POST", "/login", ok_statuses=(302,),
+                data={"username": self.username, "password": PASSWORD},
+            ) is not None
+            if not self.logged_in:
+                return
+        await self._call("home", "GET", "/home")
+        body = await self._call(
+            "search", "GET", "/search-songs-json",
+            params={"songname": random.choice(SEARCH_WORDS)},
+        )
+        tracks = json.loads(body).get("tracks", []) if body else []
+        body = await self._call(
+            "recommendations", "GET", "/recommendations", params={"mood": random.choice(MOODS)}
+        )
+        tracks = (json.loads(body).get("tracks") or tracks) if body else tracks
+        await self._call(
+            "create-playlist", "POST", "/create-playlist", ok_statuses=(201,),
+            json={
+                "name": "Load test",
+                "tracks": [
+                    {"uri": t.get("uri"), "name": t.get("name")} for t in tracks[:10]
+                ],
+            },
+        )
+        self.stats.flows += 1
+
+    async def close(self):
+        await self.session.close()
+
+
+async def run(base_url, users, duration, ramp_up, think, timeout, reuse_session):
+    stats = Stats()
+    vusers = [VirtualUser(base_url, stats, reuse_session) for _ in range(users)]
+    await asyncio.gather(*(u.setup(timeout) for u in vusers))
+    deadline = time.perf_counter() + duration
+
+    async def drive(n, user):
+        await asyncio.sleep(ramp_up * n / max(1, users))
+        while time.perf_counter() < deadline:
+            await user.flow()
+            if think:
+                await asyncio.sleep(random.expovariate(1 / think))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(drive(n, u) for n, u in enumerate(vusers)))
+    finally:
+        await asyncio.gather(*(u.close() for u in vusers))
+    return stats.summary(time.perf_counter() - started)
+
+
+def spawn_app(port, stub):
+    env = dict(
+        os.environ,
+        SPOTIFY_API_URL=stub.api_url,
+        SPOTIFY_TOKEN_URL=stub.token_url,
+        CLIENT_ID=os.getenv("CLIENT_ID", "load-test"),
+        CLIENT_SECRET=os.getenv("CLIENT_SECRET", "load-test"),
+        SPOTIFY_TOKEN_CACHE="",
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_ACCESS_LOG="",
+    )
+    process = subprocess.Popen(
+        ["gunicorn", "app:app"], cwd=BACKEND, env=env, start_new_session=True
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            urllib.request.urlopen(url + "/login", timeout=1).read()
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    os.killpg(process.pid, signal.SIGTERM)
+    raise RuntimeError("the app did not come up")
+
+
+def report(summary):
+    print(f"{summary['flows_per_s']:.2f} flows/s over {summary['elapsed']:.0f}s")
+    print(f"{'step':<17}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for step, s in summary["steps"].items():
+        print(
+            f"{step:<17}{s['requests']:>9}{s['errors']:>8}{s['rps']:>8.1f}"
+            f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+        )
+
+
+def regressions(summary, baseline, tolerance):
+    found = []
+    for step, before in baseline["steps"].items():
+        after = summary["steps"].get(step)
+        if after is None:
+            found.append(f"{step}: no requests")
+            continue
+        if after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found.append(f"{step}: p95 {before['p95_ms']:.1f} -> {after['p95_ms']:.1f} ms")
+        if after["errors"] / after["requests"] > before["errors"] / before["requests"] + 0.01:
+            found.append(f"{step}: errors {before['errors']} -> {after['errors']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn", action="store_true", help="start the stub and gunicorn")
+    parser.add_argument("--port", type=int, default=5098, help="port for --spawn")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds to start all users")
+    parser.add_argument("--think", type=float, default=0, help="mean seconds between flows")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds per request")
+    parser.add_argument("--reuse-session", action="store_true", help="log in once per user")
+    parser.add_argument("--save", help="write the summary to this JSON file")
+    parser.add_argument("--baseline", help="compare against a saved summary")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    stub = process = None
+    url = args.url
+    if args.spawn:
+        stub = StubSpotifyProcess(**stub_options(args))
+        process, url = spawn_app(args.port, stub)
+    try:
+        summary = asyncio.run(run(
+            url, args.users, args.duration, args.ramp_up, args.think, args.timeout,
+            args.reuse_session,
+        ))
+    finally:
+        if process is not None:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=30)
+        if stub is not None:
+            stub.close()
+
+    report(summary)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(summary, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Local stand-in for the Spotify Web API, for benchmarks and load tests.
+
+Serves ``POST /api/token``, ``/v1/search``, ``/v1/tracks`` (and
+``/v1/tracks/<id>``) and ``/v1/audio-features`` from a synthetic catalog of
+``catalog_size`` tracks, after an injected delay, failing a share of calls
+with a 500 or a 429. Responses are deterministic: the same query always
+finds the same tracks, and a track always has the same features.
+
+Run it on its own and point the app at it:
+
+    python benchmarks/stub_spotify.py --port 8900 --latency 0.05 --throttle-rate 0.01
+    SPOTIFY_API_URL=http://127.0.0.1:8900/v1 \\
+    SPOTIFY_TOKEN_URL=http://127.0.0.1:8900/api/token gunicorn app:app
+"""
+
+import json
+import asyncio
+import random
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+
+
+def _seeded(value):
+    return random.Random(int(hashlib.md5(value.encode("utf-8")).hexdigest(), 16))
+
+
+@lru_cache(maxsize=None)
+def fake_track(track_id):
+    rng = _seeded(track_id)
+    artist_id = f"artist{rng.randrange(400)}"
+    return {
+        "id": track_id,
+        "name": f"Track {track_id}",
+        "uri": f"spotify:track:{track_id}",
+        "artists": [{"id": artist_id, "name": f"Artist {artist_id}"}],
+        "album": {"name": "Stub Album", "images": []},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+    }
+
+
+@lru_cache(maxsize=None)
+def fake_audio_features(track_id):
+    rng = _seeded(track_id + ":features")
+    return {
+        "id": track_id,
+        "danceability": rng.random(),
+        "energy": rng.random(),
+        "valence": rng.random(),
+        "tempo": rng.uniform(60, 190),
+        "mode": rng.randint(0, 1),
+    }
+
+
+class FakeCatalog:
+    """``size`` tracks with ids ``t0`` .. ``t<size-1>``."""
+
+    def __init__(self, size=10000):
+        self.size = size
+
+    def __contains__(self, track_id):
+        return (
+            track_id.startswith("t")
+            and track_id[1:].isdigit()
+            and int(track_id[1:]) < self.size
+        )
+
+    def search(self, q, limit=20, offset=0):
+        # a fixed, query-specific ordering of the catalog, paged
+        rng = _seeded("search:" + q.lower())
+        count = min(self.size, offset + limit)
+        ids = rng.sample(range(self.size), count)[offset:]
+        return [fake_track(f"t{n}") for n in ids]
+
+    def tracks(self, ids):
+        return [fake_track(i) if i in self else None for i in ids]
+
+    def audio_features(self, ids):
+        return [fake_audio_features(i) if i in self else None for i in ids]
+
+
+def respond(method, target, catalog=None):
+    """``(status, payload)`` for one request to the stub."""
+    catalog = catalog or FakeCatalog()
+    if method == "POST":
+        return 200, {"access_token": "stub", "token_type": "Bearer", "expires_in": 3600}
+    url = urlparse(target)
+    query = parse_qs(url.query)
+    ids = [i for i in query.get("ids", [""])[0].split(",") if i]
+    if url.path == "/v1/search":
+        q = query.get("q", [""])[0]
+        limit = min(int(query.get("limit", ["20"])[0]), 50)
+        offset = int(query.get("offset", ["0"])[0])
+        return 200, {"tracks": {"items": catalog.search(q, limit, offset)}}
+    if url.path == "/v1/tracks":
+        return 200, {"tracks": catalog.tracks(ids)}
+    if url.path.startswith("/v1/tracks/"):
+        track_id = url.path.rsplit("/", 1)[1]
+        if track_id not in catalog:
+            return 404, {"error": {"status": 404, "message": "non existing id"}}
+        return 200, fake_track(track_id)
+    if url.path == "/v1/audio-features":
+        return 200, {"audio_features": catalog.audio_features(ids)}
+    return 404, {"error": {"status": 404, "message": "Service not found"}}
+
+
+REASONS = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class StubSpotify:
+    """
+    Keep-alive HTTP/1.1 stub on its own asyncio loop thread. A thread per
+    connection would not do here: under load the handler threads contend
+    for the GIL and the stub, not the client under test, sets the pace.
+
+    ``error_rate`` and ``throttle_rate`` are the shares of API calls answered
+    with a 500 and with a 429 asking to retry after ``retry_after`` seconds;
+    ``requests`` counts calls by ``(path, status)``.
+    """
+
+    def __init__(
+        self,
+        latency=0.05,
+        jitter=0.0,
+        catalog_size=10000,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.catalog = FakeCatalog(catalog_size)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = {}
+        self._writers = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, host, port, backlog=1024), self._loop
+        ).result()
+        port = self._server.sockets[0].getsockname()[1]
+        base = f"http://{host}:{port}"
+        self.token_url = base + "/api/token"
+        self.api_url = base + "/v1"
+
+    def _respond(self, method, target):
+        headers = {}
+        roll = random.random()
+        if method == "POST":
+            status, payload = respond(method, target, self.catalog)
+        elif roll < self.error_rate:
+            status, payload = 500, {"error": {"status": 500, "message": "injected error"}}
+        elif roll < self.error_rate + self.throttle_rate:
+            status, payload = 429, {"error": {"status": 429, "message": "injected rate limit"}}
+            headers["Retry-After"] = str(self.retry_after)
+        else:
+            status, payload = respond(method, target, self.catalog)
+        key = (urlparse(target).path, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        return status, payload, headers
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {
+                    k.lower(): v
+                    for k, v in (line.split(": ", 1) for line in lines[1:] if ": " in line)
+                }
+                length = int(headers.get("content-length", 0))
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(self.latency + random.random() * self.jitter)
+                status, payload, extra = self._respond(method, target)
+                body = json.dumps(payload).encode()
+                head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                head += "Content-Type: application/json\r\n"
+                head += "".join(f"{k}: {v}\r\n" for k, v in extra.items())
+                head += f"Content-Length: {len(body)}\r\n\r\n"
+                writer.write(head.encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _shutdown(self):
+        self._server.close()
+        handlers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        # closing the connections ends each handler's read loop
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+def _serve(options, urls, stop):
+    stub = StubSpotify(**options)
+    urls.put((stub.token_url, stub.api_url))
+    stop.wait()
+    stub.close()
+
+
+class StubSpotifyProcess:
+    """
+    StubSpotify in a child process, so load tests do not share the GIL
+    between the stub's handler threads and the client under test. Takes
+    the same options as StubSpotify.
+    """
+
+    def __init__(self, **options):
+        urls = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(options, urls, self._stop), daemon=True
+        )
+        self._process.start()
+        self.token_url, self.api_url = urls.get(timeout=10)
+
+    def close(self):
+        self._stop.set()
+        self._process.join(timeout=5)
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.05, help="extra random seconds")
+    parser.add_argument("--catalog-size", type=int, default=10000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429s")
+    parser.add_argument("--retry-after", type=int, default=1)
+
+
+def stub_options(args):
+    return {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "catalog_size": args.catalog_size,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "retry_after": args.retry_after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    stub = StubSpotify(host=args.host, port=args.port, **stub_options(args))
+    print(f"SPOTIFY_API_URL={stub.api_url}")
+    print(f"SPOTIFY_TOKEN_URL={stub.token_url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.close()
+        for (path, status), count in sorted(stub.requests.items()):
+            print(f"{count:>8} {status} {path}")
+
+
+if __name__ == "__main__":
+    main()
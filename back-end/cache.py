@@ -0,0 +1,411 @@
+"""
+In-process and MongoDB-backed caches for data that is expensive to fetch.
+"""
+
+import os
+import asyncio
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pymongo.errors import BulkWriteError, PyMongoError
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded mapping that evicts the least recently used key.
+    Entries can optionally expire ``ttl`` seconds after they were set.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Query-cache backend on a Redis-compatible store, shared by every worker.
+    Values are stored as JSON with a per-key TTL; bound the size with the
+    server's ``maxmemory`` and an ``allkeys-lru`` eviction policy.
+    """
+
+    def __init__(self, client, prefix="moodify:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, prefix="moodify:"):
+        import redis
+
+        return cls(redis.Redis.from_url(url), prefix=prefix)
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache read error: {e}")
+            return default
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            if ttl is None:
+                self.client.set(self.prefix + key, json.dumps(value))
+            else:
+                self.client.setex(
+                    self.prefix + key, max(1, int(round(ttl))), json.dumps(value)
+                )
+        except Exception as e:
+            print(f"Redis cache write error: {e}")
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache delete error: {e}")
+
+
+class QueryCache:
+    """
+    Short-TTL cache of upstream query results. Concurrent misses for the same
+    key are collapsed: one caller fetches and the others wait for its result.
+    ``fetch`` returning None (a failed call) is passed through but not cached.
+
+    With ``stale_ttl``, a result older than ``ttl`` is kept that much longer
+    and served as is while one background refresh replaces it
+    (stale-while-revalidate). A refresh that fails leaves it in place, so
+    during an upstream outage callers keep getting the last good result.
+    """
+
+    def __init__(self, backend=None, ttl=60, stale_ttl=0, refresh_workers=2):
+        self.backend = backend if backend is not None else LRUCache(1024)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_workers = refresh_workers
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.stale = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls, prefix):
+        """In-process by default; ``QUERY_CACHE_URL=redis://...`` shares it."""
+        ttl = float(os.getenv("QUERY_CACHE_TTL", "60"))
+        stale_ttl = float(os.getenv("QUERY_CACHE_STALE_TTL", "3600"))
+        url = os.getenv("QUERY_CACHE_URL")
+        backend = None
+        if url:
+            try:
+                backend = RedisBackend.from_url(url, prefix=f"moodify:{prefix}:")
+            except ImportError:
+                print(" * QUERY_CACHE_URL is set but redis is not installed")
+        if backend is None:
+            backend = LRUCache(int(os.getenv("QUERY_CACHE_SIZE", "1024")))
+        return cls(backend, ttl=ttl, stale_ttl=stale_ttl)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "collapsed": self.collapsed,
+                "stale": self.stale,
+            }
+
+    def _read(self, key):
+        """The cached value and whether it is past ``ttl``, or (None, False)."""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None, False
+        # stored with the wall-clock fetch time, as workers may share the backend
+        fetched_at, value = entry
+        return value, time.time() - fetched_at > self.ttl
+
+    def _claim(self, key):
+        """
+        ``("hit", value)``, ``("stale", value)`` if the value is due for a
+        refresh, or ``("lead", future)`` if this caller must fetch, or
+        ``("follow", future)`` if another caller is already fetching.
+        """
+        value, stale = self._read(key)
+        if value is not None:
+            with self._lock:
+                if stale:
+                    self.stale += 1
+                else:
+                    self.hits += 1
+            return ("stale" if stale else "hit"), value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.collapsed += 1
+                return "follow", future
+            future = Future()
+            self._inflight[key] = future
+            return "lead", future
+
+    def _recheck(self, key):
+        # the previous leader may have filled the cache just before we won
+        value, _ = self._read(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    def _settle(self, key, future, value=None, error=None):
+        if value is not None and error is None:
+            self.backend.set(key, [time.time(), value], self.ttl + self.stale_ttl)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _get_executor(self):
+        # created on first use, per process, so forked workers get their own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.refresh_workers, thread_name_prefix="cache-refresh"
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _refresh(self, key, fetch):
+        """Replace a stale value in the background, once per key at a time."""
+        with self._lock:
+            if key in self._inflight:
+                return
+            future = self._inflight[key] = Future()
+
+        def run():
+            try:
+                value = fetch()
+            except Exception as e:
+                print(f"Cache refresh error for {key!r}: {e}")
+                self._settle(key, future, error=e)
+                return
+            self._settle(key, future, value)
+
+        self._get_executor().submit(run)
+
+    def get_or_fetch(self, key, fetch):
+        role, result = self._claim(key)
+        if role == "stale":
+            self._refresh(key, fetch)
+            return result
+        if role == "hit":
+            return result
+        if role == "follow":
+            return result.result()
+
+        try:
+            value = self._recheck(key)
+            if value is None:
+                value = fetch()
+        except BaseException as e:
+            self._settle(key, result, error=e)
+            raise
+        self._settle(key, result, value)
+        return value
+
+    async def aget_or_fetch(self, key, fetch):
+        """``get_or_fetch`` for a coroutine ``fetch``; collapses with sync callers too."""
+        role, result = self._claim(key)
+        if role == "stale":
+            # the request's loop may be gone before a refresh finishes
+            self._refresh(key, lambda: asyncio.run(fetch()))
+            return result
+        if role == "hit":
+            return result
+        if role == "follow":
+            # shielded so a cancelled follower cannot cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(result))
+
+        try:
+            value = self._recheck(key)
+            if value is None:
+                value = await fetch()
+        except BaseException as e:
+            self._settle(key, result, error=e)
+            raise
+        self._settle(key, result, value)
+        return value
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive cache key for a search query."""
+    return " ".join(query.lower().split())
+
+
+class DocumentCache:
+    """
+    Read-through cache for per-track documents that do not change once
+    fetched. Lookups try the in-process LRU, then one bulk ``$in`` query
+    against ``collection``, and only pass the remaining IDs to ``fetch``.
+    Documents are keyed by their ``key`` field, stored as ``_id`` in MongoDB.
+    """
+
+    key = "id"
+    name = "Document"
+
+    def __init__(self, collection=None, maxsize=20000):
+        self.collection = collection
+        self.memory = LRUCache(maxsize)
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hits=0, db_hits=0, misses=0):
+        with self._lock:
+            self.hits += hits
+            self.db_hits += db_hits
+            self.misses += misses
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.db_hits) / lookups if lookups else 0.0,
+            }
+
+    def _load(self, track_ids):
+        if self.collection is None or not track_ids:
+            return {}
+        try:
+            docs = self.collection.find({"_id": {"$in": track_ids}})
+            found = {}
+            for doc in docs:
+                doc[self.key] = doc.pop("_id")
+                found[doc[self.key]] = doc
+            return found
+        except PyMongoError as e:
+            print(f"{self.name} cache read error: {e}")
+            return {}
+
+    def _store(self, docs):
+        if self.collection is None or not docs:
+            return
+        rows = []
+        for doc in docs:
+            row = {k: v for k, v in doc.items() if k != self.key}
+            row["_id"] = doc[self.key]
+            rows.append(row)
+        try:
+            self.collection.insert_many(rows, ordered=False)
+        except BulkWriteError as e:
+            # documents never change, so a concurrent worker winning the insert is fine
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                print(f"{self.name} cache write error: {e}")
+        except PyMongoError as e:
+            print(f"{self.name} cache write error: {e}")
+
+    def _lookup(self, track_ids):
+        """Documents found in memory or MongoDB, the IDs found in neither, and hit counts."""
+        result = {}
+        pending = []
+        for track_id in dict.fromkeys(track_ids):
+            cached = self.memory.get(track_id, _MISSING)
+            if cached is _MISSING:
+                pending.append(track_id)
+            else:
+                result[track_id] = cached
+        memory_hits = len(result)
+
+        stored = self._load(pending)
+        for track_id, doc in stored.items():
+            self.memory.set(track_id, doc)
+        result.update(stored)
+
+        missing = [track_id for track_id in pending if track_id not in stored]
+        return result, missing, (memory_hits, len(stored))
+
+    def _remember(self, result, missing, fetched, hits):
+        fetched = [f for f in fetched if f and f.get(self.key)]
+        self._store(fetched)
+        for doc in fetched:
+            self.memory.set(doc[self.key], doc)
+            result[doc[self.key]] = doc
+
+        self._count(hits=hits[0], db_hits=hits[1], misses=len(missing))
+        return result
+
+    def get_many(self, track_ids, fetch):
+        """
+        Return ``{track_id: document}`` for ``track_ids``. ``fetch`` is called
+        once with the list of IDs found in neither tier and must return a list
+        of documents.
+        """
+        result, missing, hits = self._lookup(track_ids)
+        fetched = fetch(missing) if missing else []
+        return self._remember(result, missing, fetched, hits)
+
+    async def aget_many(self, track_ids, fetch):
+        """``get_many`` for a coroutine ``fetch``."""
+        result, missing, hits = self._lookup(track_ids)
+        fetched = await fetch(missing) if missing else []
+        return self._remember(result, missing, fetched, hits)
+
+    def put_many(self, docs):
+        """Remember documents we already have, writing only ones new to this worker."""
+        new_docs = [doc for doc in docs if doc[self.key] not in self.memory]
+        for doc in new_docs:
+            self.memory.set(doc[self.key], doc)
+        self._store(new_docs)
+
+
+class AudioFeatureCache(DocumentCache):
+    """Spotify audio features, which never change for a given track."""
+
+    name = "Audio features"
@@ -0,0 +1,263 @@
+"""
+Local track catalog: every track the app has seen with its audio features,
+plus bulk-imported dumps, served from an in-memory nearest-neighbour index
+so mood recommendations can be answered without calling Spotify.
+
+    flask --app app import-catalog tracks.csv
+"""
+
+import os
+import csv
+import time
+import threading
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from pymongo.errors import BulkWriteError, PyMongoError
+from scoring import FEATURE_COLUMNS, WEIGHTS
+
+# tempo is scaled the way the scorer scales it, and every axis is weighted by
+# the scorer's weight, so L1 distance ranks like the unfiltered mood-match score
+SCALE = np.array(
+    [WEIGHTS[c] * (1 / 200.0 if c == "tempo" else 1) for c in FEATURE_COLUMNS]
+)
+
+# columns of an import file; artist_id, album, album_cover and uri may be blank
+CSV_COLUMNS = ("id", "name", "artist", "artist_id", "album", "album_cover", "uri") + FEATURE_COLUMNS
+
+
+def slim_track(track):
+    """The subset of a Spotify track object the recommendation page renders."""
+    album = track.get("album") or {}
+    return {
+        "id": track["id"],
+        "name": track["name"],
+        "uri": track.get("uri") or f"spotify:track:{track['id']}",
+        "artists": [
+            {"id": a.get("id"), "name": a.get("name")} for a in track["artists"][:1]
+        ],
+        "album": {
+            "name": album.get("name"),
+            "images": [{"url": i["url"]} for i in (album.get("images") or [])[:1]],
+        },
+    }
+
+
+def target_vector(target_features):
+    return np.array(
+        [target_features.get(f"target_{c}", 0.5) for c in FEATURE_COLUMNS],
+        dtype=np.float64,
+    )
+
+
+class VectorIndex:
+    """
+    Brute-force k-NN over pre-scaled feature vectors. New rows are buffered
+    and copied into the matrix on the next query; the matrix grows by
+    doubling, so adding rows is amortised O(1) rather than a full copy.
+    """
+
+    def __init__(self):
+        self.tracks = []
+        self._size = 0
+        self._raw = np.empty((0, len(FEATURE_COLUMNS)))
+        self._scaled = np.empty((0, len(FEATURE_COLUMNS)))
+        self._pending_tracks = []
+        self._pending_rows = []
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tracks) + len(self._pending_tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._known
+
+    def add(self, track, features):
+        with self._lock:
+            if track["id"] in self._known:
+                return
+            self._known.add(track["id"])
+            self._pending_tracks.append(track)
+            self._pending_rows.append([float(features[c]) for c in FEATURE_COLUMNS])
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self._raw), 1024)
+        for name in ("_raw", "_scaled"):
+            grown = np.empty((capacity, len(FEATURE_COLUMNS)))
+            grown[: self._size] = getattr(self, name)[: self._size]
+            setattr(self, name, grown)
+
+    def _consolidate(self):
+        if not self._pending_rows:
+            return
+        rows = np.array(self._pending_rows, dtype=np.float64)
+        end = self._size + len(rows)
+        if end > len(self._raw):
+            self._grow(end)
+        # rows past _size are unused, so views handed out earlier are unchanged
+        self._raw[self._size:end] = rows
+        self._scaled[self._size:end] = rows * SCALE
+        self.tracks.extend(self._pending_tracks)
+        self._size = end
+        self._pending_tracks = []
+        self._pending_rows = []
+
+    def nearest(self, target, k):
+        """The ``k`` tracks closest to ``target`` and their raw feature rows."""
+        with self._lock:
+            self._consolidate()
+            size = self._size
+            tracks, raw, scaled = self.tracks, self._raw[:size], self._scaled[:size]
+        if not size:
+            return [], raw
+        distances = np.abs(scaled - target * SCALE).sum(axis=1)
+        k = min(k, size)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return [tracks[i] for i in nearest], raw[nearest]
+
+
+class TrackCatalog:
+    """
+    Tracks and feature vectors persisted in the ``catalog`` collection and
+    mirrored in a VectorIndex. Each worker loads the collection once, on a
+    background thread started by ``start()``, and then only pulls documents
+    added since its last refresh.
+
+    ``added_at`` comes from the clock of the worker that wrote the document,
+    so one written by a worker whose clock runs behind, or committed late,
+    can sort before rows already read. Each refresh re-reads the last
+    ``sync_window`` seconds to pick those up; the index skips known tracks.
+    """
+
+    def __init__(self, collection=None, refresh_interval=300, sync_window=600):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.sync_window = timedelta(seconds=sync_window)
+        self.index = VectorIndex()
+        self._loaded_until = None
+        self._refreshed_at = None
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread_pid = None
+
+    def refresh(self, force=False):
+        if self.collection is None:
+            return
+        now = datetime.now()
+        if (
+            not force
+            and self._refreshed_at is not None
+            and (now - self._refreshed_at).total_seconds() < self.refresh_interval
+        ):
+            return
+        with self._refresh_lock:
+            query = {}
+            if self._loaded_until is not None:
+                query["added_at"] = {"$gte": self._loaded_until - self.sync_window}
+            try:
+                for doc in self.collection.find(query).sort("added_at", 1):
+                    self.index.add(doc["track"], doc["features"])
+                    self._loaded_until = doc["added_at"]
+            except PyMongoError as e:
+                print(f"Catalog load error: {e}")
+            self._refreshed_at = now
+
+    def _insert(self, docs):
+        if self.collection is None or not docs:
+            return
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                print(f"Catalog write error: {e}")
+        except PyMongoError as e:
+            print(f"Catalog write error: {e}")
+
+    def add_tracks(self, tracks, features_by_id):
+        """Remember Spotify tracks we have audio features for."""
+        docs = []
+        now = datetime.now()
+        for track in tracks:
+            features = features_by_id.get(track["id"])
+            if not features or track["id"] in self.index:
+                continue
+            slim = slim_track(track)
+            row = {c: features[c] for c in FEATURE_COLUMNS}
+            self.index.add(slim, row)
+            docs.append({"_id": slim["id"], "track": slim, "features": row, "added_at": now})
+        self._insert(docs)
+        return len(docs)
+
+    def import_rows(self, rows, batch_size=1000):
+        """Bulk-load rows shaped like CSV_COLUMNS; returns how many were read."""
+        count = 0
+        batch = []
+        for row in rows:
+            track = {
+                "id": row["id"],
+                "name": row["name"],
+                "uri": row.get("uri") or None,
+                "artists": [{"id": row.get("artist_id") or row["artist"], "name": row["artist"]}],
+                "album": {
+                    "name": row.get("album"),
+                    "images": [{"url": row["album_cover"]}] if row.get("album_cover") else [],
+                },
+            }
+            batch.append((track, {row["id"]: {c: float(row[c]) for c in FEATURE_COLUMNS}}))
+            count += 1
+            if len(batch) >= batch_size:
+                self._import_batch(batch)
+                batch = []
+        self._import_batch(batch)
+        return count
+
+    def _import_batch(self, batch):
+        features = {}
+        for _, row in batch:
+            features.update(row)
+        self.add_tracks([track for track, _ in batch], features)
+
+    def start(self):
+        """Load and keep refreshing on a daemon thread, once per process."""
+        if self.collection is None or self._thread_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name="catalog-refresh", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.refresh(force=True)
+            time.sleep(self.refresh_interval)
+
+    def nearest(self, target_features, k=300):
+        # without the refresher thread (CLI commands, tests) refresh inline
+        if self._thread_pid != os.getpid():
+            self.refresh()
+        return self.index.nearest(target_vector(target_features), k)
+
+
+def read_rows(path):
+    """Stream rows from a CSV file, or a Parquet file if pyarrow is installed."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def register_commands(app, catalog):
+    @app.cli.command("import-catalog")
+    @click.argument("path")
+    def import_catalog_command(path):
+        """Bulk-load tracks and audio features from a CSV or Parquet dump."""
+        count = catalog.import_rows(read_rows(path))
+        print(f" * imported {count} catalog rows from {path}")
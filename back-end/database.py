@@ -0,0 +1,249 @@
+"""
+Fork-safe access to the app's MongoDB database.
+
+pymongo clients must not be shared across ``fork()``: pooled sockets and
+monitor threads do not survive it. ``MongoDatabase`` creates its client on
+first use in each process, so an app built in the gunicorn master with
+``preload_app`` hands every worker its own client. Collections are handed
+out as ``CollectionProxy`` objects, which resolve against the current
+process's client on every call and can be safely captured at startup.
+
+Pool size, timeouts and wire compression come from the environment (see
+``client_options_from_env``), and each client reports its pool's usage
+through ``PoolMetrics``.
+"""
+
+import os
+import threading
+import importlib.util
+import certifi
+import pymongo
+from pymongo import monitoring
+
+# env var -> MongoClient option; unset ones fall back to the URI / pymongo
+INT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+}
+
+# compressor -> modules pymongo imports for it, any one will do
+# (pip install "pymongo[zstd,snappy]"; zstd is in the stdlib from 3.14)
+COMPRESSOR_MODULES = {
+    "zstd": ("compression.zstd", "backports.zstd"),
+    "snappy": ("snappy",),
+    "zlib": ("zlib",),
+}
+
+
+def _installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        # a dotted name whose parent package is missing
+        return False
+
+
+def available_compressors(names):
+    """The compressors in ``names`` whose module is installed, in order."""
+    available = []
+    for name in names:
+        modules = COMPRESSOR_MODULES.get(name, ())
+        if not any(_installed(module) for module in modules):
+            print(f" * MongoDB compressor {name!r} is not available, skipping it")
+            continue
+        available.append(name)
+    return available
+
+
+def client_options_from_env():
+    options = {}
+    for env, option in INT_OPTIONS.items():
+        value = os.getenv(env)
+        if value:
+            options[option] = int(value)
+    names = [c.strip() for c in os.getenv("MONGO_COMPRESSORS", "").split(",") if c.strip()]
+    compressors = available_compressors(names)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+        if os.getenv("MONGO_ZLIB_LEVEL"):
+            options["zlibCompressionLevel"] = int(os.getenv("MONGO_ZLIB_LEVEL"))
+    return options
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool usage of one client, summed over the servers it talks
+    to: connections open and checked out (with the high-water mark), how
+    long checkouts waited and why they failed. A checkout that waits, or
+    fails with ``timeout``, means the pool is too small for the load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.failures = {}
+        self.cleared = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "wait_seconds": self.wait_seconds,
+                "avg_wait_ms": self.wait_seconds * 1000 / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "failures": dict(self.failures),
+                "cleared": self.cleared,
+            }
+
+    def _waited(self, event):
+        duration = getattr(event, "duration", None) or 0.0
+        self.wait_seconds += duration
+        self.max_wait_seconds = max(self.max_wait_seconds, duration)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checkouts += 1
+            self._waited(event)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures[event.reason] = self.failures.get(event.reason, 0) + 1
+            self._waited(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+class CollectionProxy:
+    """A collection name bound to a MongoDatabase rather than to one client."""
+
+    def __init__(self, database, name):
+        self._database = database
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._database.database[self.name], attr)
+
+    def __getitem__(self, name):
+        return CollectionProxy(self._database, f"{self.name}.{name}")
+
+    def __repr__(self):
+        return f"CollectionProxy({self.name!r})"
+
+
+class MongoDatabase:
+    """
+    Lazily connected, per-process handle on one MongoDB database. Supports
+    the ``db.entries`` / ``db["entries"]`` access the app uses.
+    """
+
+    def __init__(self, uri, name, event_listeners=(), **client_options):
+        self.uri = uri
+        self.name = name
+        self.event_listeners = list(event_listeners)
+        self.client_options = client_options
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pool_metrics = PoolMetrics()
+
+    @classmethod
+    def from_env(cls, event_listeners=()):
+        return cls(
+            os.getenv("MONGO_URI"),
+            os.getenv("MONGO_DBNAME"),
+            event_listeners=event_listeners,
+            tlsCAFile=certifi.where(),
+            **client_options_from_env(),
+        )
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    # a client inherited across fork is abandoned, not closed:
+                    # closing it would end the parent's sessions
+                    self.pool_metrics = PoolMetrics()
+                    self._client = pymongo.MongoClient(
+                        self.uri,
+                        event_listeners=[self.pool_metrics] + self.event_listeners,
+                        **self.client_options,
+                    )
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def database(self):
+        return self.client[self.name]
+
+    def reset(self):
+        """Forget this process's client; the next use connects afresh."""
+        with self._lock:
+            self._client = None
+            self._pid = None
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def pool_stats(self):
+        """This process's pool usage; see PoolMetrics."""
+        return self.pool_metrics.snapshot()
+
+    def ping(self):
+        return self.client.admin.command("ping")
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return CollectionProxy(self, name)
+
+    def __getitem__(self, name):
+        return CollectionProxy(self, name)
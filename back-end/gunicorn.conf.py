@@ -0,0 +1,84 @@
+"""
+gunicorn settings for production, read from the environment. gunicorn
+picks this file up from the working directory:
+
+    gunicorn app:app
+
+With ``preload_app`` (the default) the master imports the app and runs
+create_app once, and workers are forked from it: they boot faster and
+share the imported modules' memory. Every worker then opens its own MongoDB
+client on first use (see database.py); the hooks below make sure the
+master's client is closed before forking.
+"""
+
+import os
+import time
+import multiprocessing
+
+_loaded_at = time.perf_counter()
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('FLASK_PORT', '5000')}")
+# sync: one request per worker; gthread: `threads` requests per worker;
+# gevent: cooperative, needs `pip install gevent`
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+
+if worker_class == "gevent":
+    # patch before the app (and requests/pymongo) is imported in the master
+    from gevent import monkey
+
+    monkey.patch_all()
+
+
+def _mongo(server):
+    # only look at the app if the master already loaded it; otherwise
+    # asking for it here would import it in the master
+    if not server.cfg.preload_app:
+        return None
+    return server.app.wsgi().extensions.get("mongo")
+
+
+def when_ready(server):
+    server.log.info(
+        "Master ready in %.0f ms (preload_app=%s)",
+        (time.perf_counter() - _loaded_at) * 1000,
+        server.cfg.preload_app,
+    )
+
+
+def pre_fork(server, worker):
+    mongo = _mongo(server)
+    if mongo is not None:
+        mongo.close()
+    worker.forked_at = time.perf_counter()
+
+
+def post_fork(server, worker):
+    mongo = _mongo(server)
+    if mongo is not None:
+        mongo.reset()
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        "Worker %s ready %.0f ms after fork",
+        worker.pid,
+        (time.perf_counter() - worker.forked_at) * 1000,
+    )
+
+
+def worker_exit(server, worker):
+    # what this worker's MongoDB pool went through, for sizing
+    # MONGO_MAX_POOL_SIZE against the threads per worker
+    mongo = getattr(getattr(worker, "wsgi", None), "extensions", {}).get("mongo")
+    if mongo is not None:
+        worker.log.info("Worker %s MongoDB pool: %s", worker.pid, mongo.pool_stats())
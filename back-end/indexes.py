@@ -0,0 +1,150 @@
+"""
+MongoDB index definitions for the app's hot queries, plus a self-check that
+explains each of those queries and reports any that still scan a collection.
+
+    flask --app app ensure-indexes
+    flask --app app check-indexes
+"""
+
+import threading
+from datetime import datetime
+import pymongo
+from pymongo.errors import OperationFailure, PyMongoError
+
+INDEXES = {
+    "entries": [
+        {"keys": [("user_id", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING),
+                  ("_id", pymongo.DESCENDING)],
+         "name": "user_id_created_at_id"},
+    ],
+    "users": [
+        {"keys": [("username", pymongo.ASCENDING)], "name": "username_unique",
+         "unique": True},
+    ],
+    "playlists": [
+        {"keys": [("user_id", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING),
+                  ("_id", pymongo.DESCENDING)],
+         "name": "user_id_created_at_id"},
+    ],
+    "mood_daily": [
+        {"keys": [("user_id", pymongo.ASCENDING), ("day", pymongo.ASCENDING)],
+         "name": "user_id_day"},
+    ],
+    "catalog": [
+        {"keys": [("added_at", pymongo.ASCENDING)], "name": "added_at"},
+    ],
+}
+
+# (name, collection, filter, sort) for each query on a request hot path
+HOT_QUERIES = [
+    ("home timeline", "entries", {"user_id": "probe"},
+     [("created_at", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]),
+    ("user playlists", "playlists", {"user_id": "probe"},
+     [("created_at", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]),
+    ("login/signup", "users", {"username": "probe"}, None),
+    ("mood chart", "mood_daily", {"user_id": "probe", "day": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("catalog refresh", "catalog", {"added_at": {"$gt": datetime(2000, 1, 1)}},
+     [("added_at", pymongo.ASCENDING)]),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every index in INDEXES. create_index is a no-op for an index that
+    already exists, so this is safe to run on every startup.
+    """
+    created = []
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                created.append(db[collection].create_index(spec["keys"], **options))
+            except OperationFailure as e:
+                # e.g. duplicate usernames already stored block the unique index
+                print(f" * Could not create index {collection}.{spec['name']}: {e}")
+    return created
+
+
+class IndexBuilder:
+    """
+    Runs ensure_indexes on a daemon thread, so neither building the app nor
+    serving a request waits on MongoDB. ``state`` is "pending", "running",
+    "ready" or "failed"; a failed build is retried on the next start().
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.state = "pending"
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.state in ("running", "ready"):
+            return
+        with self._lock:
+            if self.state in ("pending", "failed"):
+                self.state = "running"
+                threading.Thread(target=self._run, name="ensure-indexes", daemon=True).start()
+
+    def _run(self):
+        try:
+            ensure_indexes(self.db)
+        except PyMongoError as e:
+            print(" * MongoDB connection error:", e)
+            self.state = "failed"
+        except Exception as e:
+            # anything else must not leave the state stuck at "running"
+            print(" * Index build error:", e)
+            self.state = "failed"
+        else:
+            print(" *", "Connected to MongoDB!")
+            self.state = "ready"
+
+
+def plan_stages(plan):
+    """Every ``stage`` name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def uses_collscan(explain):
+    return "COLLSCAN" in plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+
+
+def check_query_plans(db):
+    """Names of hot queries whose winning plan still contains a COLLSCAN."""
+    failures = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = cursor.explain()
+        except PyMongoError as e:
+            print(f" * Could not explain {name} query: {e}")
+            failures.append(name)
+            continue
+        status = "COLLSCAN" if uses_collscan(explain) else "ok"
+        print(f" * {name} ({collection}): {status}")
+        if status != "ok":
+            failures.append(name)
+    return failures
+
+
+def register_commands(app, db):
+    @app.cli.command("ensure-indexes")
+    def ensure_indexes_command():
+        """Create the indexes the hot queries rely on."""
+        for name in ensure_indexes(db):
+            print(f" * index ready: {name}")
+
+    @app.cli.command("check-indexes")
+    def check_indexes_command():
+        """Fail if any hot query still does a collection scan."""
+        if check_query_plans(db):
+            raise SystemExit(1)
@@ -0,0 +1,64 @@
+"""
+Journal timeline queries: keyset pagination over a user's entries, newest
+first, reading only the fields the timeline renders.
+"""
+
+import base64
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+ENTRY_PROJECTION = {"track_id": 1, "track_name": 1, "mood": 1, "created_at": 1}
+TIMELINE_SORT = [("created_at", -1), ("_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(entry):
+    raw = f"{entry['created_at'].isoformat()}|{entry['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, entry_id = raw.split("|")
+        return datetime.fromisoformat(created_at), ObjectId(entry_id)
+    except (ValueError, InvalidId, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def fetch_entries_page(collection, user_id, cursor=None, limit=20):
+    """
+    Up to ``limit`` of the user's entries older than ``cursor``, plus the
+    cursor for the next page (None on the last page). Ties on created_at are
+    broken by _id so no entry is skipped or repeated between pages.
+    """
+    query = {"user_id": user_id}
+    if cursor:
+        created_at, entry_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": entry_id}},
+        ]
+    docs = list(
+        collection.find(query, ENTRY_PROJECTION).sort(TIMELINE_SORT).limit(limit + 1)
+    )
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def format_entry(entry):
+    return {
+        "id": str(entry["_id"]),
+        "track_id": entry.get("track_id", "Unknown track"),
+        "time": (
+            entry.get("created_at").strftime("%I:%M %p")
+            if entry.get("created_at")
+            else "Unknown time"
+        ),
+        "song": entry.get("track_name", "Unknown song"),
+        "mood": entry.get("mood", "Unknown mood"),
+    }
@@ -0,0 +1,209 @@
+"""
+Bulk import and export of journal entries as JSON Lines or CSV.
+
+Both directions stream: imports parse one row at a time and write in
+``insert_many(ordered=False)`` batches, exports walk a cursor in
+``batch_size`` chunks, so memory stays flat however long the journal is.
+
+    flask --app app import-entries history.ndjson --user alice
+    flask --app app export-entries --user alice --format csv > journal.csv
+"""
+
+import io
+import csv
+import codecs
+import json
+from datetime import datetime
+import click
+from pymongo.errors import BulkWriteError
+from journal import TIMELINE_SORT
+
+# the fields save_entry requires, plus when the entry was written
+ENTRY_FIELDS = ("track_name", "track_artist", "track_id", "mood")
+EXPORT_FIELDS = ENTRY_FIELDS + ("created_at",)
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+MAX_REPORTED_ERRORS = 100
+
+
+class InvalidEntry(ValueError):
+    pass
+
+
+def validate_entry(row, user_id, now=None):
+    """An entry document from an imported row, as save_entry would build it."""
+    if not isinstance(row, dict):
+        raise InvalidEntry("not an object")
+    entry = {"user_id": user_id}
+    for field in ENTRY_FIELDS:
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise InvalidEntry(f"missing {field}")
+        entry[field] = value
+    created_at = row.get("created_at")
+    if created_at:
+        try:
+            entry["created_at"] = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise InvalidEntry(f"bad created_at: {created_at!r}")
+    else:
+        entry["created_at"] = now or datetime.now()
+    return entry
+
+
+def read_ndjson(lines):
+    """``(line_number, row)`` per non-blank line; bad JSON yields the error."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, InvalidEntry(f"bad JSON: {e}")
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_rows(stream, fmt):
+    """
+    Rows from a binary or text stream, parsed as they are read. Binary
+    streams are decoded line by line rather than wrapped in TextIOWrapper,
+    which needs readable(): Werkzeug spools large uploads to a
+    SpooledTemporaryFile, which lacks it before Python 3.11.
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = codecs.iterdecode(stream, "utf-8")
+    return read_csv(text) if fmt == "csv" else read_ndjson(text)
+
+
+def format_of(filename, default="ndjson"):
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    if filename and filename.lower().endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return default
+
+
+def _insert(collection, docs):
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        print(f"Entry import write errors: {len(e.details.get('writeErrors', []))}")
+        return e.details.get("nInserted", 0)
+
+
+def import_entries(db, rows, user_id, batch_size=1000):
+    """
+    Validate and insert ``rows`` for ``user_id`` in batches. The user's mood
+    rollup and taste profile are flagged incomplete rather than updated per
+    entry, so each is rebuilt once on its next read. Returns counts and the first bad rows.
+    """
+    inserted, rejected, errors, batch = 0, 0, [], []
+    now = datetime.now()
+    try:
+        for number, row in rows:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                batch.append(validate_entry(row, user_id, now))
+            except InvalidEntry as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": number, "error": str(e)})
+                continue
+            if len(batch) >= batch_size:
+                inserted += _insert(db.entries, batch)
+                batch = []
+    finally:
+        # an unreadable stream still keeps, and counts, what came before it
+        if batch:
+            inserted += _insert(db.entries, batch)
+        if inserted:
+            for rollup in (db.mood_rollups, db.taste_profiles):
+                # gen: a rebuild already under way must not mark it complete
+                rollup.update_one(
+                    {"_id": user_id},
+                    {"$set": {"complete": False}, "$inc": {"gen": 1}},
+                    upsert=True,
+                )
+    return {"inserted": inserted, "rejected": rejected, "errors": errors}
+
+
+def _export_row(entry):
+    row = {field: entry.get(field) for field in EXPORT_FIELDS}
+    if entry.get("created_at"):
+        row["created_at"] = entry["created_at"].isoformat()
+    return row
+
+
+def _lines(cursor, fmt):
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for entry in cursor:
+            writer.writerow(_export_row(entry))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for entry in cursor:
+            yield json.dumps(_export_row(entry)) + "\n"
+
+
+def export_entries(collection, user_id, fmt="ndjson", batch_size=1000):
+    """
+    The user's entries, newest first, as NDJSON or CSV text; one chunk per
+    ``batch_size`` entries so a response is not written a line at a time.
+    """
+    projection = {field: 1 for field in EXPORT_FIELDS}
+    cursor = (
+        collection.find({"user_id": user_id}, projection)
+        .sort(TIMELINE_SORT)
+        .batch_size(batch_size)
+    )
+    chunk = []
+    for line in _lines(cursor, fmt):
+        chunk.append(line)
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def register_commands(app, db):
+    def user_id_of(username):
+        user = db.users.find_one({"username": username}, {"_id": 1})
+        if not user:
+            raise click.ClickException(f"No user named {username!r}")
+        return str(user["_id"])
+
+    @app.cli.command("import-entries")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--user", "username", required=True, help="Username the entries belong to.")
+    @click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default=None)
+    @click.option("--batch-size", default=1000, show_default=True)
+    def import_entries_command(path, username, fmt, batch_size):
+        """Import journal entries from a JSON Lines or CSV file."""
+        user_id = user_id_of(username)
+        with open(path, encoding="utf-8", newline="") as f:
+            result = import_entries(db, read_rows(f, fmt or format_of(path)), user_id, batch_size)
+        print(f" * imported {result['inserted']} entries, rejected {result['rejected']}")
+        for error in result["errors"]:
+            print(f"   line {error['line']}: {error['error']}")
+
+    @app.cli.command("export-entries")
+    @click.option("--user", "username", required=True, help="Username to export.")
+    @click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="ndjson")
+    @click.option("--output", type=click.File("w", encoding="utf-8"), default="-")
+    def export_entries_command(username, fmt, output):
+        """Write a user's journal as JSON Lines or CSV."""
+        for chunk in export_entries(db.entries, user_id_of(username), fmt):
+            output.write(chunk)
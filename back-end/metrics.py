@@ -0,0 +1,257 @@
+"""
+Request-level instrumentation: Prometheus-style counters and histograms,
+served as text at ``/metrics``, and a per-request phase breakdown sent back
+in a ``Server-Timing`` header.
+
+Metrics live in the worker process that recorded them; under gunicorn each
+worker answers ``/metrics`` with its own numbers.
+
+Phases are timed with ``timed(name)``. Only the outermost phase counts
+towards a request's breakdown, so the six concurrent searches inside a
+``search`` phase add their wall time once rather than six times. MongoDB
+time is collected separately, as ``db``, from pymongo command events.
+"""
+
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from time import perf_counter
+from pymongo import monitoring
+
+# seconds; Spotify calls and whole requests land in the upper half
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_timing = contextvars.ContextVar("request_timing", default=None)
+_in_phase = contextvars.ContextVar("in_phase", default=False)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[n]) for n in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += n
+                    labels = _labels(self.labelnames, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    The app's metrics. ``collectors`` are callables returning
+    ``(name, type, help, {labels: value})`` tuples, read at scrape time, for
+    numbers other components already keep (cache and pool stats); labels
+    are tuples of ``(name, value)`` pairs.
+    """
+
+    def __init__(self, prefix="moodify_"):
+        self.prefix = prefix
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(self.prefix + name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self.prefix + name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collect in self.collectors:
+            try:
+                gauges = collect()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+                continue
+            for name, kind, help, samples in gauges:
+                name = self.prefix + name
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples.items():
+                    lines.append(f"{name}{_labels((), (), labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTiming:
+    """Seconds spent per phase while serving one request."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def header(self):
+        """The ``Server-Timing`` value, phases in milliseconds plus the total."""
+        with self._lock:
+            parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={(perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def start_request():
+    timing = RequestTiming()
+    return timing, _timing.set(timing)
+
+
+def end_request(token):
+    _timing.reset(token)
+
+
+def current_timing():
+    return _timing.get()
+
+
+@contextmanager
+def timed(phase):
+    """Add the wall time of the block to the current request, unless nested."""
+    timing = _timing.get()
+    if timing is None or _in_phase.get():
+        yield
+        return
+    token = _in_phase.set(True)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, perf_counter() - started)
+        _in_phase.reset(token)
+
+
+def spotify_endpoint(path):
+    """``/search`` for ``/search``, ``/tracks`` for ``/tracks/abc``: bounded labels."""
+    return "/" + path.strip("/").split("/")[0]
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """MongoDB command durations by command name, and each request's ``db`` time."""
+
+    def __init__(self, histogram, failures):
+        self.histogram = histogram
+        self.failures = failures
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self.failures.inc(command=event.command_name)
+        self._record(event)
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        self.histogram.observe(seconds, command=event.command_name)
+        timing = _timing.get()
+        if timing is not None:
+            timing.add("db", seconds)
+
+
+class AppMetrics:
+    """The metrics the app records, on one registry."""
+
+    def __init__(self):
+        self.registry = Registry()
+        r = self.registry
+        self.requests = r.histogram(
+            "request_duration_seconds", "Time to serve a request.", ("route", "method", "status")
+        )
+        self.spotify_requests = r.counter(
+            "spotify_requests_total", "Spotify Web API calls.", ("endpoint", "status")
+        )
+        self.spotify_latency = r.histogram(
+            "spotify_request_duration_seconds", "Spotify Web API call latency.", ("endpoint",)
+        )
+        self.mongo_commands = r.histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency.", ("command",)
+        )
+        self.mongo_failures = r.counter(
+            "mongo_command_failures_total", "MongoDB commands that failed.", ("command",)
+        )
+        self.command_listener = CommandMetrics(self.mongo_commands, self.mongo_failures)
+
+    def observe_spotify(self, path, status, seconds):
+        endpoint = spotify_endpoint(path)
+        self.spotify_requests.inc(endpoint=endpoint, status=status)
+        self.spotify_latency.observe(seconds, endpoint=endpoint)
+
+    def render(self):
+        return self.registry.render()
@@ -0,0 +1,253 @@
+"""
+Mood statistics for the home dashboard.
+
+Each user has a rollup document in ``mood_rollups`` (mood counts and the
+latest entry) and one ``mood_daily`` bucket per day they journaled. Both are
+kept current with ``$inc`` as entries are saved and deleted, so the dashboard
+reads a constant amount of data however long the journal gets. The
+aggregation pipelines over ``entries`` rebuild them for users who journaled
+before rollups existed and serve ad-hoc per-day/per-week breakdowns.
+
+Every save and delete also bumps the rollup's ``gen``; a rebuild only marks
+the rollup complete if ``gen`` is unchanged since it started, so a rebuild
+that raced a write is redone on the next read instead of freezing a miscount.
+"""
+
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+
+def mood_key(mood):
+    """Mood names are used as field names, which may not contain '.' or '$'."""
+    return mood.replace(".", "_").replace("$", "_")
+
+
+def day_of(created_at):
+    return datetime(created_at.year, created_at.month, created_at.day)
+
+
+def bucket_id(user_id, day):
+    return f"{user_id}:{day.date().isoformat()}"
+
+
+def mood_counts_pipeline(user_id, unit="day", since=None):
+    """Entry counts per (day or week, mood), oldest period first."""
+    match = {"user_id": user_id}
+    if since is not None:
+        match["created_at"] = {"$gte": since}
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "period": {"$dateTrunc": {"date": "$created_at", "unit": unit}},
+                    "mood": "$mood",
+                },
+                "count": {"$sum": 1},
+            }
+        },
+        {"$sort": {"_id.period": 1, "_id.mood": 1}},
+    ]
+
+
+def mood_summary_pipeline(user_id):
+    """Per-mood totals with the newest entry of each mood."""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {
+            "$group": {
+                "_id": "$mood",
+                "count": {"$sum": 1},
+                "latest_at": {"$first": "$created_at"},
+                "latest_id": {"$first": "$_id"},
+            }
+        },
+    ]
+
+
+def mood_counts(db, user_id, unit="day", since=None):
+    return [
+        {"period": row["_id"]["period"], "mood": row["_id"]["mood"], "count": row["count"]}
+        for row in db.entries.aggregate(mood_counts_pipeline(user_id, unit, since))
+    ]
+
+
+def rebuild_rollup(db, user_id):
+    """
+    Recompute a user's rollup and daily buckets from their entries. If an
+    entry is saved or deleted meanwhile, the result is returned but the
+    rollup is left incomplete.
+    """
+    gen = (db.mood_rollups.find_one({"_id": user_id}, {"gen": 1}) or {}).get("gen")
+    moods = {}
+    latest = None
+    for row in db.entries.aggregate(mood_summary_pipeline(user_id)):
+        if row["_id"] is None:
+            continue
+        moods[mood_key(row["_id"])] = row["count"]
+        if latest is None or row["latest_at"] > latest["created_at"]:
+            latest = {
+                "mood": row["_id"],
+                "created_at": row["latest_at"],
+                "entry_id": row["latest_id"],
+            }
+
+    buckets = {}
+    for row in mood_counts(db, user_id, unit="day"):
+        if row["mood"] is None:
+            continue
+        day = day_of(row["period"])
+        bucket = buckets.setdefault(
+            bucket_id(user_id, day), {"user_id": user_id, "day": day, "counts": {}}
+        )
+        bucket["counts"][mood_key(row["mood"])] = row["count"]
+
+    # upserted, as a concurrent save may create the same bucket
+    for _id, bucket in buckets.items():
+        db.mood_daily.update_one({"_id": _id}, {"$set": bucket}, upsert=True)
+    db.mood_daily.delete_many({"user_id": user_id, "_id": {"$nin": list(buckets)}})
+    rollup = {
+        "moods": moods,
+        "total": sum(moods.values()),
+        "latest": latest,
+        "complete": True,
+    }
+    try:
+        # gen None also matches a rollup without one, or none at all
+        db.mood_rollups.update_one(
+            {"_id": user_id, "gen": gen}, {"$set": rollup}, upsert=True
+        )
+    except DuplicateKeyError:
+        # a write bumped gen: the upsert missed and collided with the rollup
+        print(f"Mood rollup for {user_id} changed during rebuild, leaving it incomplete")
+    return dict(rollup, _id=user_id)
+
+
+def record_entry(db, entry):
+    """Count a newly saved entry in its user's rollup and daily bucket."""
+    user_id = entry["user_id"]
+    key = mood_key(entry["mood"])
+    day = day_of(entry["created_at"])
+    db.mood_rollups.update_one(
+        {"_id": user_id},
+        {"$inc": {f"moods.{key}": 1, "total": 1, "gen": 1}},
+        upsert=True,
+    )
+    db.mood_rollups.update_one(
+        {
+            "_id": user_id,
+            "$or": [
+                {"latest": None},
+                {"latest.created_at": {"$lte": entry["created_at"]}},
+            ],
+        },
+        {
+            "$set": {
+                "latest": {
+                    "mood": entry["mood"],
+                    "created_at": entry["created_at"],
+                    "entry_id": entry["_id"],
+                }
+            }
+        },
+    )
+    db.mood_daily.update_one(
+        {"_id": bucket_id(user_id, day)},
+        {
+            "$inc": {f"counts.{key}": 1},
+            "$setOnInsert": {"user_id": user_id, "day": day},
+        },
+        upsert=True,
+    )
+
+
+def forget_entry(db, entry):
+    """Undo ``record_entry`` for a deleted entry."""
+    user_id = entry["user_id"]
+    key = mood_key(entry["mood"])
+    rollup = db.mood_rollups.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {f"moods.{key}": -1, "total": -1, "gen": 1}},
+    )
+    if entry.get("created_at"):
+        db.mood_daily.update_one(
+            {"_id": bucket_id(user_id, day_of(entry["created_at"]))},
+            {"$inc": {f"counts.{key}": -1}},
+        )
+    latest = (rollup or {}).get("latest") or {}
+    if latest.get("entry_id") == entry["_id"]:
+        # the newest remaining entry comes straight off the timeline index
+        newest = db.entries.find_one(
+            {"user_id": user_id},
+            {"mood": 1, "created_at": 1},
+            sort=[("created_at", -1), ("_id", -1)],
+        )
+        db.mood_rollups.update_one(
+            {"_id": user_id},
+            {
+                "$set": {
+                    "latest": {
+                        "mood": newest["mood"],
+                        "created_at": newest["created_at"],
+                        "entry_id": newest["_id"],
+                    }
+                    if newest
+                    else None
+                }
+            },
+        )
+
+
+def update_stats(update, db, entry):
+    """
+    Apply ``record_entry``/``forget_entry`` without ever failing the journal
+    write; if it fails the rollup is flagged so the next read rebuilds it.
+    """
+    try:
+        update(db, entry)
+    except PyMongoError as e:
+        print(f"Mood stats update error: {e}")
+        try:
+            db.mood_rollups.update_one(
+                {"_id": entry["user_id"]},
+                {"$set": {"complete": False}, "$inc": {"gen": 1}},
+            )
+        except PyMongoError:
+            pass
+
+
+def dashboard_stats(db, user_id, days=30, today=None):
+    """
+    Top mood, latest mood and per-day counts for the last ``days`` days, read
+    from the rollup (rebuilt first if it is missing or incomplete).
+    """
+    rollup = db.mood_rollups.find_one({"_id": user_id})
+    if not rollup or not rollup.get("complete"):
+        rollup = rebuild_rollup(db, user_id)
+
+    counts = {mood: n for mood, n in (rollup.get("moods") or {}).items() if n > 0}
+    top_mood = max(counts, key=counts.get) if counts else "No data"
+    latest = rollup.get("latest")
+    latest_mood = latest["mood"] if latest else "No data"
+
+    today = day_of(today or datetime.now())
+    first_day = today - timedelta(days=days - 1)
+    buckets = {
+        bucket["day"]: bucket.get("counts", {})
+        for bucket in db.mood_daily.find(
+            {"user_id": user_id, "day": {"$gte": first_day}}
+        )
+    }
+    labels = [first_day + timedelta(days=i) for i in range(days)]
+    moods = sorted({m for c in buckets.values() for m, n in c.items() if n > 0})
+    series = {
+        mood: [buckets.get(day, {}).get(mood, 0) for day in labels] for mood in moods
+    }
+    return {
+        "top_mood": top_mood,
+        "latest_mood": latest_mood,
+        "total": rollup.get("total", 0),
+        "chart_labels": [day.strftime("%Y-%m-%d") for day in labels],
+        "chart_series": series,
+    }
@@ -0,0 +1,269 @@
+"""
+Mood definitions: audio-feature targets, search terms and the per-track
+mood-match score used by the recommender.
+"""
+
+import random
+
+
+MOODS = ("happy", "sad", "angry", "relaxed", "energetic")
+
+
+def get_mood_features(mood):
+    """
+    Enhanced audio feature targets for different moods with carefully calibrated values
+    based on music psychology research and Spotify's audio features documentation.
+    """
+    mood_features = {
+        "happy": {
+            "mood_type": "happy",  # Add mood type for identification
+            "target_danceability": 0.7,
+            "target_energy": 0.75,
+            "target_valence": 0.85,
+            "target_tempo": 120,
+            "target_mode": 1,
+            "min_valence": 0.6,
+            "min_energy": 0.5,
+            "min_tempo": 85,           # Minimum tempo for happy songs
+            "max_instrumentalness": 0.7 # Maximum instrumentalness allowed
+        },
+        "sad": {
+            "target_danceability": 0.35,
+            "target_energy": 0.25,
+            "target_valence": 0.2,   # Lower valence for melancholic feel
+            "target_tempo": 75,      # Slower tempo
+            "target_mode": 0,        # Minor key
+            "max_valence": 0.4,      # Maximum threshold for positivity
+            "max_energy": 0.5        # Maximum energy level
+        },
+        "angry": {
+            "target_danceability": 0.55,
+            "target_energy": 0.9,    # High energy
+            "target_valence": 0.3,   # Lower valence for intensity
+            "target_tempo": 145,     # Fast tempo
+            "target_mode": 0,        # Minor key
+            "min_energy": 0.7,       # Minimum energy threshold
+            "target_loudness": -5    # Louder tracks
+        },
+        "relaxed": {
+            "target_danceability": 0.45,
+            "target_energy": 0.35,
+            "target_valence": 0.55,  # Moderate valence
+            "target_tempo": 85,      # Gentle tempo
+            "target_mode": 1,        # Major key
+            "max_energy": 0.5,       # Maximum energy threshold
+            "target_instrumentalness": 0.3  # Some instrumental presence
+        },
+        "energetic": {
+            "target_danceability": 0.8,
+            "target_energy": 0.85,
+            "target_valence": 0.75,  # Positive but not necessarily happy
+            "target_tempo": 128,     # Dance music tempo
+            "target_mode": 1,        # Major key
+            "min_energy": 0.7,       # Minimum energy threshold
+            "min_danceability": 0.6  # Minimum danceability
+        }
+    }
+    return mood_features.get(mood.lower(), mood_features["happy"])
+
+
+def get_mood_search_terms(mood, count=6):
+    """
+    Expanded search terms incorporating genres, decades, and styles
+    while maintaining mood consistency; ``count=None`` returns every term
+    """
+    mood_terms = {
+        "happy": [
+            # Pop/Contemporary
+            "happy upbeat pop",
+            "feel good hits",
+            "euphoric dance",
+            # Rock/Alternative
+            "upbeat rock",
+            "indie happy",
+            "2010 pop"
+            "Rihanna Asap"
+            # Electronic/Dance
+            "hip hop hits"
+            "rap happy"
+            "rap feelgood"
+            # Older Classics
+            "classic happy hits",
+            "oldies feel good",
+            # Global/Cultural
+            "latin party",
+            "latin party"
+            "afrobeats happy",
+            "k-pop upbeat",
+            "afrobeats vibe"
+            "funk happy",
+            "reggae positive"
+        ],
+        "sad": [
+            # Pop/Contemporary
+            "sad pop ballad",
+            "emotional pop",
+            "heartbreak songs",
+            "breakup lonely"
+            "alone crying"
+            # Rock/Alternative
+            "indie melancholy",
+            "alt rock emotional",
+            # Singer-Songwriter
+            "acoustic sad",
+            "folk emotional",
+            # R&B/Soul
+            "soul heartbreak",
+            "r&b emotional",
+            "blues sad",
+            # Genre-Specific
+            "sad country",
+            "indie folk sad"
+        ],
+        "angry": [
+            # Rock/Metal
+            "heavy metal intense",
+            "hard rock angry",
+            "punk aggressive",
+            # Electronic
+            "industrial aggressive",
+            "electronic rage",
+            "dubstep intense",
+            # Hip-Hop
+            "rap aggressive",
+            "hip hop angry",
+            "trap intense",
+            # Alternative
+            "alt metal",
+            "grunge angry",
+            "hardcore punk",
+            # Genre-Mixing
+            "metal electronic",
+            "rap rock angry",
+            "crossover thrash",
+            # Experimental
+            "experimental aggressive",
+            "noise rock",
+            "death metal"
+        ],
+        "relaxed": [
+            # Ambient/Electronic
+            "ambient peaceful",
+            "chillout electronic",
+            "downtempo relax",
+            # Classical/Piano
+            "peaceful piano",
+            "classical calm",
+            "soft instrumental",
+            # Nature/World
+            "nature sounds calm",
+            "world music relaxing",
+            "meditation peaceful",
+            # Jazz/Lounge
+            "jazz relaxing",
+            "lounge chill",
+            "bossa nova calm",
+            # Modern
+            "lo-fi chill",
+            "indie ambient",
+            "modern classical calm",
+            # Acoustic
+            "acoustic gentle",
+            "folk peaceful",
+            "soft guitar"
+        ],
+        "energetic": [
+            # Dance/Electronic
+            "edm energy",
+            "dance workout",
+            "electronic upbeat",
+            # Pop/Rock
+            "power pop",
+            "rock energy",
+            "pop workout",
+            "hip hop energy",
+            "trap workout",
+            # Sports/Workout
+            "gym motivation",
+            "sports anthem",
+            "workout hits",
+            # Genre-Mixing
+            "rock electronic",
+            "pop rap energy",
+            "crossfit mix",
+            # Global
+            "latin energy",
+            "kpop dance",
+            "global workout"
+        ]
+    }
+    terms = mood_terms.get(mood.lower(), [""])
+    if count is None:
+        return list(terms)
+    # Randomly select 5 diverse terms for broader search
+    return random.sample(terms, min(count, len(terms)))
+
+
+def calculate_mood_match_score(features, target_features):
+    """
+    Enhanced scoring with specific filters for happy mood
+    """
+    if not features:
+        return 0
+
+    # Special filtering for happy mood
+    if 'happy' in target_features.get('mood_type', ''):
+        # Filter out very slow tracks (tempo < 85 BPM)
+        if features['tempo'] < 70:
+            return 0
+
+        # Filter out tracks with very low energy
+        if features['energy'] < 0.4:
+            return 0
+
+    # Core weights for standard features
+    weights = {
+        'danceability': 0.2,
+        'energy': 0.25,
+        'valence': 0.3,
+        'tempo': 0.15,
+        'mode': 0.1
+    }
+
+    score = 0
+    total_weight = 0
+
+    # Check thresholds first
+    if 'min_valence' in target_features and features['valence'] < target_features['min_valence']:
+        return 0
+    if 'max_valence' in target_features and features['valence'] > target_features['max_valence']:
+        return 0
+    if 'min_energy' in target_features and features['energy'] < target_features['min_energy']:
+        return 0
+    if 'max_energy' in target_features and features['energy'] > target_features['max_energy']:
+        return 0
+
+    # Calculate core features score
+    if 'target_danceability' in target_features:
+        score += weights['danceability'] * (1 - abs(features['danceability'] - target_features['target_danceability']))
+        total_weight += weights['danceability']
+
+    if 'target_energy' in target_features:
+        score += weights['energy'] * (1 - abs(features['energy'] - target_features['target_energy']))
+        total_weight += weights['energy']
+
+    if 'target_valence' in target_features:
+        score += weights['valence'] * (1 - abs(features['valence'] - target_features['target_valence']))
+        total_weight += weights['valence']
+
+    if 'target_tempo' in target_features:
+        normalized_tempo = features['tempo'] / 200.0
+        normalized_target_tempo = target_features['target_tempo'] / 200.0
+        score += weights['tempo'] * (1 - abs(normalized_tempo - normalized_target_tempo))
+        total_weight += weights['tempo']
+
+    if 'target_mode' in target_features:
+        score += weights['mode'] * (1 if features['mode'] == target_features['target_mode'] else 0)
+        total_weight += weights['mode']
+
+    return score / total_weight if total_weight > 0 else 0
@@ -0,0 +1,123 @@
+"""
+bcrypt hashing off the request threads.
+
+A bcrypt hash at cost 12 is a few hundred milliseconds of CPU, so a burst
+of logins on the request threads eats the CPU every other request in the
+worker needs. ``PasswordHasher`` runs hashes in a small process pool and
+admits at most ``max_pending`` of them at a time; beyond that it raises
+``HasherBusy`` and the app answers 503.
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+# bcrypt only reads the first 72 bytes of a password; bcrypt 5 raises on
+# longer ones where earlier versions (and the hashes we store) truncated
+MAX_PASSWORD_BYTES = 72
+
+
+class HasherBusy(Exception):
+    """Every hashing slot is taken; the caller should retry later."""
+
+
+def _encode(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def check_password(hashed, password):
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode("utf-8"))
+    except ValueError:
+        # not a bcrypt hash
+        return False
+
+
+def hash_rounds(hashed):
+    """The cost a bcrypt hash was made with (``$2b$12$...`` -> 12)."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def default_workers():
+    """
+    Hashing processes per web worker: the CPUs shared out between the
+    WEB_CONCURRENCY gunicorn workers, at least one. Every worker has its own
+    pool, so CPUs per worker would start workers x CPUs processes.
+    """
+    web_workers = int(os.getenv("WEB_CONCURRENCY") or 0)
+    if web_workers <= 0:
+        return 1
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords in ``workers`` processes (0 hashes on the
+    calling thread). ``rounds`` is the bcrypt cost for new hashes; hashes
+    made with another cost report ``needs_rehash``.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=16):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+            workers=int(os.getenv("BCRYPT_WORKERS") or default_workers()),
+            max_pending=int(os.getenv("BCRYPT_MAX_PENDING", "16")),
+        )
+
+    def _get_executor(self):
+        # one pool per process, started on first use so gunicorn workers
+        # don't inherit the master's; spawned, as forking a threaded
+        # worker is unsafe
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.rounds)
+
+    def check(self, hashed, password):
+        if not hashed or not password:
+            return False
+        return self._run(check_password, hashed, password)
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
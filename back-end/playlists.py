@@ -0,0 +1,207 @@
+"""
+Playlists store compact track references (id, name, artist, duration);
+album art and links come from the shared track store, looked up for a whole
+page of playlists in one batch. Pages are keyset-paginated like the journal
+timeline and carry only the first few tracks of each playlist.
+
+    flask --app app compact-playlists
+"""
+
+from datetime import datetime
+import click
+from bson import ObjectId
+from bson.errors import InvalidId
+from journal import TIMELINE_SORT, decode_cursor, encode_cursor
+
+PLAYLIST_FIELDS = {"name": 1, "description": 1, "created_at": 1, "track_count": 1}
+
+
+class InvalidPlaylist(ValueError):
+    pass
+
+
+def track_id_of(track):
+    """The Spotify ID of a posted track, from its ``id`` or its ``uri``."""
+    if not isinstance(track, dict):
+        return None
+    track_id = track.get("id") or track.get("spotify_id")
+    uri = track.get("uri")
+    if not track_id and isinstance(uri, str) and uri.startswith("spotify:track:"):
+        track_id = uri.rsplit(":", 1)[1]
+    return track_id if isinstance(track_id, str) and track_id else None
+
+
+def posted_track_ids(tracks):
+    if not isinstance(tracks, list):
+        return []
+    return [i for i in map(track_id_of, tracks) if i]
+
+
+def posted_tracks(data, max_tracks=500):
+    """The tracks of a create request, checked before any of them is looked up."""
+    tracks = data.get("tracks", [])
+    if not isinstance(tracks, list):
+        raise InvalidPlaylist("tracks must be a list")
+    if len(tracks) > max_tracks:
+        raise InvalidPlaylist(f"A playlist can hold at most {max_tracks} tracks")
+    return tracks
+
+
+def track_ref(track, record=None):
+    """
+    The reference a playlist stores for ``track``: a Spotify track object, a
+    track record, or the ``{uri, name, artist}`` the pages post. Names come
+    from the track store's ``record`` when there is one. None without an ID.
+    """
+    track_id = track_id_of(track)
+    if track_id is None:
+        return None
+    record = record or {}
+    artist = track.get("artist")
+    artists = track.get("artists")
+    if not artist and isinstance(artists, list) and artists and isinstance(artists[0], dict):
+        artist = artists[0].get("name")
+    return {
+        "id": track_id,
+        "name": record.get("name") or str(track.get("name") or ""),
+        "artist": record.get("artist") or str(artist or ""),
+        "duration_ms": record.get("duration_ms") or track.get("duration_ms"),
+    }
+
+
+def build_playlist(user_id, data, records, max_tracks=500, now=None):
+    """
+    The playlist document for a create request. ``records`` are track store
+    records by ID; tracks without a Spotify ID are dropped.
+    """
+    tracks = posted_tracks(data, max_tracks)
+    refs = [track_ref(t, records.get(track_id_of(t))) for t in tracks]
+    refs = [ref for ref in refs if ref is not None]
+    now = now or datetime.now()
+    return {
+        "user_id": user_id,
+        "name": data.get("name") or f"Playlist - {now.strftime('%Y-%m-%d %H:%M')}",
+        "description": data.get("description", ""),
+        "tracks": refs,
+        "track_count": len(refs),
+        "created_at": now,
+    }
+
+
+def fetch_playlists_page(collection, user_id, cursor=None, limit=10, preview=20):
+    """
+    Up to ``limit`` of the user's playlists older than ``cursor``, newest
+    first, each with its first ``preview`` track references, plus the cursor
+    for the next page (None on the last page).
+    """
+    query = {"user_id": user_id}
+    if cursor:
+        created_at, playlist_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": playlist_id}},
+        ]
+    projection = dict(PLAYLIST_FIELDS, tracks={"$slice": preview})
+    docs = list(collection.find(query, projection).sort(TIMELINE_SORT).limit(limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return count_legacy_tracks(collection, docs[:limit]), next_cursor
+
+
+def count_legacy_tracks(collection, playlists):
+    """
+    Fill in ``track_count`` for playlists saved before it was stored, counted
+    by MongoDB: the ``$slice`` of tracks they were read with is only a preview.
+    """
+    legacy = [p["_id"] for p in playlists if "track_count" not in p]
+    if legacy:
+        counts = {
+            doc["_id"]: doc["track_count"]
+            for doc in collection.aggregate([
+                {"$match": {"_id": {"$in": legacy}}},
+                {"$project": {"track_count": {"$size": {"$ifNull": ["$tracks", []]}}}},
+            ])
+        }
+        for playlist in playlists:
+            playlist.setdefault("track_count", counts.get(playlist["_id"], 0))
+    return playlists
+
+
+def fetch_playlist_tracks(collection, user_id, playlist_id, offset=0, limit=100):
+    """``limit`` track references from ``offset``, or None if there is no such playlist."""
+    try:
+        playlist_id = ObjectId(playlist_id)
+    except (InvalidId, TypeError):
+        return None
+    playlist = collection.find_one(
+        {"_id": playlist_id, "user_id": user_id},
+        {"tracks": {"$slice": [offset, limit]}, "track_count": 1},
+    )
+    return playlist and count_legacy_tracks(collection, [playlist])[0]
+
+
+def track_ids(playlists):
+    return [ref["id"] for p in playlists for ref in p.get("tracks", []) if ref.get("id")]
+
+
+def hydrate(refs, records):
+    """
+    Display tracks from references and track store records. Playlists saved
+    before references were compact keep what the browser posted, so their
+    camelCase album fields are the fallback.
+    """
+    tracks = []
+    for ref in refs:
+        record = records.get(ref.get("id")) or {}
+        tracks.append({
+            "id": ref.get("id"),
+            "name": ref.get("name") or record.get("name"),
+            "artist": ref.get("artist") or record.get("artist"),
+            "duration_ms": ref.get("duration_ms") or record.get("duration_ms"),
+            "album": record.get("album") or ref.get("albumName"),
+            "album_cover": record.get("album_cover") or ref.get("albumCover"),
+            "uri": record.get("uri") or ref.get("uri"),
+            "spotify_url": record.get("spotify_url"),
+        })
+    return tracks
+
+
+def format_playlist(playlist, records):
+    tracks = playlist.get("tracks", [])
+    return {
+        "_id": str(playlist["_id"]),
+        "name": playlist.get("name"),
+        "description": playlist.get("description", ""),
+        "created_at": playlist.get("created_at"),
+        # pages fill it in for legacy playlists; a full document counts itself
+        "track_count": playlist.get("track_count", len(tracks)),
+        "tracks": hydrate(tracks, records),
+    }
+
+
+def compact_playlists(collection, get_records=None, batch_size=100):
+    """
+    Rewrite playlists saved with full track JSON as compact references.
+    ``get_records`` maps IDs to track store records, fetching unknown tracks,
+    so album art survives dropping the inline copies. Returns how many
+    playlists were rewritten.
+    """
+    rewritten = 0
+    cursor = collection.find({"track_count": {"$exists": False}}, {"tracks": 1})
+    for playlist in cursor.batch_size(batch_size):
+        tracks = playlist.get("tracks", [])
+        records = get_records(posted_track_ids(tracks)) if get_records else {}
+        refs = [track_ref(t, records.get(track_id_of(t))) for t in tracks]
+        refs = [ref for ref in refs if ref is not None]
+        rewritten += collection.update_one(
+            {"_id": playlist["_id"]}, {"$set": {"tracks": refs, "track_count": len(refs)}}
+        ).modified_count
+    return rewritten
+
+
+def register_commands(app, collection, get_records):
+    @app.cli.command("compact-playlists")
+    @click.option("--no-fetch", is_flag=True, help="Don't ask Spotify for unknown tracks.")
+    def compact_playlists_command(no_fetch):
+        """Store playlist tracks as compact references."""
+        count = compact_playlists(collection, None if no_fetch else get_records)
+        print(f" * compacted {count} playlists")
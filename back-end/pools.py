@@ -0,0 +1,168 @@
+"""
+Precomputed, ranked candidate pools per mood.
+
+The five moods are fixed and their pools are the same for every user, so
+they are built off the request path, by a refresher thread in the web
+workers or by a separate worker process:
+
+    flask --app app refresh-mood-pools --loop
+
+Pools live in the ``mood_pools`` collection. A lease on the pool document
+makes sure only one worker rebuilds a given mood at a time.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from moods import MOODS
+
+
+class MoodPools:
+    """
+    ``build(mood)`` returns ``(track, score)`` pairs for a mood, or None if
+    it could not be built; pools are rebuilt every ``refresh_interval``
+    seconds and stop being served once older than ``max_age``.
+    """
+
+    def __init__(
+        self,
+        collection,
+        build,
+        refresh_interval=900,
+        max_age=3600,
+        size=500,
+        lease=300,
+        check_interval=30,
+    ):
+        self.collection = collection
+        self.build = build
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.size = size
+        self.lease = lease
+        self.check_interval = check_interval
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _load(self, mood):
+        try:
+            doc = self.collection.find_one({"_id": mood}, {"built_at": 1, "tracks": 1})
+        except PyMongoError as e:
+            print(f"Mood pool read error: {e}")
+            return None
+        if not doc or not doc.get("built_at"):
+            return None
+        return doc["built_at"], [(t["track"], t["score"]) for t in doc.get("tracks", [])]
+
+    def get(self, mood, now=None):
+        """
+        ``(track_scores, age_seconds)`` for a mood's pool, or ``(None, None)``
+        if there is none young enough to serve. Each worker keeps the pool in
+        memory and re-reads it at most every ``check_interval`` seconds.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            cached = self._pools.get(mood)
+        if cached is None or (now - cached[0]).total_seconds() >= self.check_interval:
+            pool = self._load(mood)
+            cached = (now, pool)
+            with self._lock:
+                self._pools[mood] = cached
+        pool = cached[1]
+        if pool is None:
+            return None, None
+        built_at, track_scores = pool
+        age = (now - built_at).total_seconds()
+        if age > self.max_age or not track_scores:
+            return None, None
+        return track_scores, age
+
+    def _acquire(self, mood, now):
+        try:
+            self.collection.find_one_and_update(
+                {
+                    "_id": mood,
+                    "$or": [
+                        {"lease_until": {"$exists": False}},
+                        {"lease_until": {"$lt": now}},
+                    ],
+                },
+                {"$set": {"lease_until": now + timedelta(seconds=self.lease)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # the document exists and another worker holds the lease
+            return False
+
+    def _is_due(self, mood, now):
+        doc = self.collection.find_one({"_id": mood}, {"built_at": 1})
+        built_at = (doc or {}).get("built_at")
+        return built_at is None or (now - built_at).total_seconds() >= self.refresh_interval
+
+    def refresh(self, mood, force=False):
+        """Rebuild one mood's pool if it is due; True if it was rebuilt."""
+        now = datetime.now()
+        try:
+            if not force and not self._is_due(mood, now):
+                return False
+            if not self._acquire(mood, now):
+                return False
+        except PyMongoError as e:
+            print(f"Mood pool lease error: {e}")
+            return False
+
+        track_scores = None
+        try:
+            track_scores = self.build(mood)
+        except Exception as e:
+            print(f"Mood pool build error ({mood}): {e}")
+        update = {"$unset": {"lease_until": ""}}
+        if track_scores:
+            ranked = sorted(track_scores, key=lambda x: x[1], reverse=True)[: self.size]
+            update["$set"] = {
+                "built_at": datetime.now(),
+                "size": len(ranked),
+                "tracks": [{"track": t, "score": s} for t, s in ranked],
+            }
+        try:
+            self.collection.update_one({"_id": mood}, update)
+        except PyMongoError as e:
+            print(f"Mood pool write error: {e}")
+            return False
+        with self._lock:
+            self._pools.pop(mood, None)
+        return bool(track_scores)
+
+    def refresh_all(self, force=False):
+        return [mood for mood in MOODS if self.refresh(mood, force=force)]
+
+    def run_forever(self):
+        while True:
+            self.refresh_all()
+            # wake often enough to pick up a lease another worker abandoned
+            time.sleep(min(self.refresh_interval, self.lease) / 2)
+
+    def start(self):
+        """Start the refresher thread once per process."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.run_forever, name="mood-pools", daemon=True
+                )
+                self._thread.start()
+
+
+def register_commands(app, pools):
+    @app.cli.command("refresh-mood-pools")
+    @click.option("--loop", is_flag=True, help="Keep refreshing pools as they come due.")
+    @click.option("--force", is_flag=True, help="Rebuild every pool now.")
+    def refresh_mood_pools_command(loop, force):
+        """Build the ranked candidate pool for every mood."""
+        for mood in pools.refresh_all(force=force):
+            print(f" * rebuilt {mood} pool")
+        if loop:
+            pools.run_forever()
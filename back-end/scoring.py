@@ -0,0 +1,98 @@
+"""
+Batched mood-match scoring over a whole candidate set with NumPy.
+
+``score_tracks`` reproduces ``moods.calculate_mood_match_score`` exactly:
+the same filters, weights and order of floating point operations, applied
+to every row of a feature matrix at once.
+"""
+
+import numpy as np
+
+FEATURE_COLUMNS = ("danceability", "energy", "valence", "tempo", "mode")
+DANCEABILITY, ENERGY, VALENCE, TEMPO, MODE = range(len(FEATURE_COLUMNS))
+
+WEIGHTS = {
+    "danceability": 0.2,
+    "energy": 0.25,
+    "valence": 0.3,
+    "tempo": 0.15,
+    "mode": 0.1,
+}
+
+
+def feature_matrix(features):
+    """Stack Spotify audio-feature dicts into an ``(n, 5)`` float64 matrix."""
+    if not features:
+        return np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float64)
+    return np.array(
+        [[f[column] for column in FEATURE_COLUMNS] for f in features],
+        dtype=np.float64,
+    )
+
+
+def _closeness(weight, values, target):
+    return weight * (1 - np.abs(values - target))
+
+
+def score_tracks(matrix, target_features):
+    """
+    Score every row of ``matrix`` against a ``get_mood_features`` target.
+
+    Returns ``(scores, survivors)``: one score per row, 0 for rows rejected
+    by the thresholds, and the indices of rows with a positive score.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = matrix.shape[0]
+    keep = np.ones(n, dtype=bool)
+
+    # only the thresholds the scalar scorer enforces, so results match it
+    if "happy" in target_features.get("mood_type", ""):
+        keep &= matrix[:, TEMPO] >= 70
+        keep &= matrix[:, ENERGY] >= 0.4
+    if "min_valence" in target_features:
+        keep &= matrix[:, VALENCE] >= target_features["min_valence"]
+    if "max_valence" in target_features:
+        keep &= matrix[:, VALENCE] <= target_features["max_valence"]
+    if "min_energy" in target_features:
+        keep &= matrix[:, ENERGY] >= target_features["min_energy"]
+    if "max_energy" in target_features:
+        keep &= matrix[:, ENERGY] <= target_features["max_energy"]
+
+    score = np.zeros(n, dtype=np.float64)
+    total_weight = 0
+    if "target_danceability" in target_features:
+        score += _closeness(
+            WEIGHTS["danceability"],
+            matrix[:, DANCEABILITY],
+            target_features["target_danceability"],
+        )
+        total_weight += WEIGHTS["danceability"]
+    if "target_energy" in target_features:
+        score += _closeness(
+            WEIGHTS["energy"], matrix[:, ENERGY], target_features["target_energy"]
+        )
+        total_weight += WEIGHTS["energy"]
+    if "target_valence" in target_features:
+        score += _closeness(
+            WEIGHTS["valence"], matrix[:, VALENCE], target_features["target_valence"]
+        )
+        total_weight += WEIGHTS["valence"]
+    if "target_tempo" in target_features:
+        score += _closeness(
+            WEIGHTS["tempo"],
+            matrix[:, TEMPO] / 200.0,
+            target_features["target_tempo"] / 200.0,
+        )
+        total_weight += WEIGHTS["tempo"]
+    if "target_mode" in target_features:
+        score += WEIGHTS["mode"] * (
+            matrix[:, MODE] == target_features["target_mode"]
+        ).astype(np.float64)
+        total_weight += WEIGHTS["mode"]
+
+    if total_weight > 0:
+        score /= total_weight
+    else:
+        score[:] = 0
+    score[~keep] = 0
+    return score, np.flatnonzero(score > 0)
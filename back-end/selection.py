@@ -0,0 +1,80 @@
+"""
+Diversity-aware selection of recommended tracks from a scored candidate set.
+
+Everything here is linear in the number of candidates (apart from the one
+sort by score), so candidate pools can grow well beyond a few hundred tracks.
+"""
+
+import random
+from collections import Counter
+
+# (upper cutoff as a fraction of the ranked candidates, share of the output)
+TIERS = (
+    (0.5, 9 / 16),  # top 50% of candidates fill most of the playlist
+    (0.8, 5 / 16),  # next 30%
+    (1.0, 2 / 16),  # bottom 20% for a bit of surprise
+)
+
+
+def lead_artist_id(track):
+    return track["artists"][0]["id"]
+
+
+def cap_per_artist(tracks, per_artist_cap=2, artist_of=lead_artist_id):
+    """
+    Keep tracks in order, dropping any beyond ``per_artist_cap`` per lead
+    artist. ``artist_of`` maps an item to its artist, e.g. for score pairs.
+    """
+    counts = Counter()
+    kept = []
+    for track in tracks:
+        artist_id = artist_of(track)
+        if counts[artist_id] < per_artist_cap:
+            counts[artist_id] += 1
+            kept.append(track)
+    return kept
+
+
+def unique_tracks(tracks):
+    """Drop repeated track IDs, keeping the first occurrence."""
+    seen_ids = set()
+    unique = []
+    for track in tracks:
+        if track["id"] not in seen_ids:
+            seen_ids.add(track["id"])
+            unique.append(track)
+    return unique
+
+
+def select_diverse_tracks(track_scores, output_size=16, min_size=None, rng=random):
+    """
+    Pick up to ``output_size`` tracks from ``(track, score)`` pairs.
+
+    Candidates are ranked by score and split into top/mid/bottom tiers, each
+    contributing its share of the output at random. If the tiers are too thin
+    the rest is topped up from unused candidates until ``min_size`` tracks
+    (default ``output_size - 2``) are chosen. The result is shuffled.
+    """
+    if min_size is None:
+        min_size = max(0, output_size - 2)
+    ranked = sorted(track_scores, key=lambda x: x[1], reverse=True)
+    total = len(ranked)
+
+    final_tracks = []
+    start = 0
+    for cutoff, share in TIERS:
+        end = int(total * cutoff)
+        tier = ranked[start:end]
+        if tier:
+            quota = round(output_size * share)
+            final_tracks.extend(t for t, _ in rng.sample(tier, min(quota, len(tier))))
+        start = end
+
+    if len(final_tracks) < min_size:
+        chosen_ids = {track["id"] for track in final_tracks}
+        remaining = [t for t, _ in ranked if t["id"] not in chosen_ids]
+        needed = min(min_size - len(final_tracks), len(remaining))
+        final_tracks.extend(rng.sample(remaining, needed))
+
+    rng.shuffle(final_tracks)
+    return final_tracks[:output_size]
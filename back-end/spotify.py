@@ -0,0 +1,755 @@
+"""
+Spotify Web API helpers shared by the flask routes.
+"""
+
+import os
+import asyncio
+import base64
+import json
+import time
+import tempfile
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows dev machines
+    fcntl = None
+
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+API_URL = "https://api.spotify.com/v1"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# the monotonic time a fan-out call on this thread must be done by, if any
+_deadline = threading.local()
+
+
+class TokenManager:
+    """
+    Caches a client-credentials access token until shortly before it expires.
+
+    Refreshes are single-flight: a thread lock serialises refreshes inside a
+    process and an flock on ``cache_path`` serialises them across gunicorn
+    workers, which also read the token the winner wrote to that file. The
+    token POST goes through ``breaker`` like any API call, so callers queued
+    on the lock wait at most one ``timeout`` during an accounts outage.
+    """
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        token_url=TOKEN_URL,
+        refresh_margin=60,
+        cache_path=None,
+        session=None,
+        timeout=None,
+        breaker=None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self.cache_path = cache_path
+        self.session = session or requests
+        self.timeout = timeout
+        self.breaker = breaker
+        self._token = None
+        self._expires_at = 0
+        self._rejected = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, expires_at):
+        return time.time() < expires_at - self.refresh_margin
+
+    def _read_shared(self):
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("client_id") != self.client_id:
+            return None
+        return cached
+
+    def _write_shared(self, token, expires_at):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "client_id": self.client_id,
+                        "access_token": token,
+                        "expires_at": expires_at,
+                    },
+                    f,
+                )
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Token cache write error: {e}")
+
+    def _adopt_shared(self):
+        cached = self._read_shared()
+        if (
+            cached
+            and cached.get("access_token") != self._rejected
+            and self._is_fresh(cached.get("expires_at", 0))
+        ):
+            self._token = cached["access_token"]
+            self._expires_at = cached["expires_at"]
+            return True
+        return False
+
+    def _request_token(self):
+        auth_string = self.client_id + ":" + self.client_secret
+        auth_base64 = str(base64.b64encode(auth_string.encode("utf-8")), "utf-8")
+        headers = {
+            "Authorization": "Basic " + auth_base64,
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        data = {"grant_type": "client_credentials"}
+        if self.breaker is not None:
+            self.breaker.before_call()
+        res = None
+        try:
+            res = self.session.post(
+                self.token_url, headers=headers, data=data, timeout=self.timeout
+            )
+        finally:
+            if self.breaker is not None:
+                self.breaker.record(res is not None and _succeeded(res))
+        if res.status_code != 200:
+            print(f"Token error: {res.content}")
+            return None, 0
+        payload = json.loads(res.content)
+        expires_at = time.time() + payload.get("expires_in", 3600)
+        return payload["access_token"], expires_at
+
+    def _refresh(self):
+        token, expires_at = self._request_token()
+        if token:
+            self._token = token
+            self._expires_at = expires_at
+            self._write_shared(token, expires_at)
+        return token
+
+    def _refresh_across_processes(self):
+        if not self.cache_path or fcntl is None:
+            return self._refresh()
+        with open(f"{self.cache_path}.lock", "a", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # another worker may have refreshed while we waited
+                if self._adopt_shared():
+                    return self._token
+                return self._refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def cached_token(self):
+        """The in-memory token if it is still fresh, without blocking."""
+        token = self._token
+        return token if token and self._is_fresh(self._expires_at) else None
+
+    def get_token(self):
+        """Return a valid access token, or None if one cannot be obtained."""
+        if not self.client_id or not self.client_secret:
+            print("Get token error: Spotify client credentials are not set")
+            return None
+        if self._token and self._is_fresh(self._expires_at):
+            return self._token
+        try:
+            with self._lock:
+                if self._token and self._is_fresh(self._expires_at):
+                    return self._token
+                if self._adopt_shared():
+                    return self._token
+                return self._refresh_across_processes()
+        except Exception as e:
+            print(f"Get token error: {str(e)}")
+            return None
+
+    def invalidate(self):
+        """Drop the cached token, e.g. after Spotify rejects it with a 401."""
+        with self._lock:
+            self._rejected = self._token
+            self._token = None
+            self._expires_at = 0
+
+
+def default_token_cache_path(client_id):
+    """Per-client token file shared by every worker on this host."""
+    path = os.getenv("SPOTIFY_TOKEN_CACHE")
+    if path is not None:
+        return path or None
+    digest = hashlib.sha256((client_id or "").encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"moodify-spotify-token-{digest}.json")
+
+
+class SpotifyRetry(Retry):
+    """
+    urllib3 retry policy that honours ``Retry-After`` on 429s, but gives up
+    instead of sleeping when Spotify asks us to back off for longer than
+    ``max_retry_after`` seconds, so a worker is never parked for minutes.
+    """
+
+    def __init__(self, *args, max_retry_after=10, **kwargs):
+        self.max_retry_after = max_retry_after
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kwargs):
+        kwargs.setdefault("max_retry_after", self.max_retry_after)
+        return super().new(**kwargs)
+
+    def increment(self, method=None, url=None, response=None, *args, **kwargs):
+        until = getattr(_deadline, "until", None)
+        if until is not None and time.monotonic() >= until:
+            # nobody is waiting for this call any more; free the thread
+            raise MaxRetryError(kwargs.get("_pool"), url, ResponseError("deadline passed"))
+        if response is not None and response.status == 429:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > self.max_retry_after:
+                raise MaxRetryError(
+                    kwargs.get("_pool"),
+                    url,
+                    ResponseError(f"Retry-After of {retry_after}s is too long"),
+                )
+        return super().increment(method, url, response, *args, **kwargs)
+
+
+def build_session(pool_size=10, max_retries=3, backoff_factor=0.5, max_retry_after=10):
+    """
+    A keep-alive session whose connection pool is shared by every thread in
+    the worker; 429/5xx responses and connection errors are retried with
+    exponential backoff.
+    """
+    retry = SpotifyRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        max_retry_after=max_retry_after,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class CircuitOpen(requests.ConnectionError):
+    """Raised instead of calling Spotify while the circuit breaker is open."""
+
+    def __init__(self, message, retry_after=0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling Spotify after ``failure_threshold`` consecutive failed calls
+    (no response, a 5xx or a 429), so requests fail fast instead of queueing
+    on a dead upstream. ``reset_timeout`` seconds after opening, a single
+    probe call is let through (half-open): success closes the circuit, failure
+    opens it again. State is per process, shared by every client in it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.rejected = 0
+        self._opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            failure_threshold=int(os.getenv("SPOTIFY_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("SPOTIFY_BREAKER_RESET_SECONDS", "30")),
+        )
+
+    def _wait(self):
+        return max(self._opened_at + self.reset_timeout - self.clock(), 0)
+
+    def check(self):
+        """
+        Raise CircuitOpen while the circuit is open and no probe is due yet;
+        for callers about to fan out, before they commit to the work.
+        """
+        with self._lock:
+            wait = self._wait()
+            if self.state != self.OPEN or wait <= 0:
+                return
+            self.rejected += 1
+        raise CircuitOpen("Spotify circuit is open", retry_after=wait)
+
+    def before_call(self):
+        """Return if a call may go out now, or raise CircuitOpen."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            wait = self._wait()
+            if self.state == self.OPEN and wait <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpen(f"Spotify circuit is {self.state}", retry_after=wait)
+
+    def record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.failures = 0
+                self.state = self.CLOSED
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                self.opens += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "opens": self.opens,
+                "rejected": self.rejected,
+            }
+
+
+def _succeeded(res):
+    return res.status_code < 500 and res.status_code != 429
+
+
+class SpotifyClient:
+    """
+    Single entry point for Spotify Web API calls: one pooled session, bounded
+    connect/read timeouts and a cached access token.
+    """
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        api_url=API_URL,
+        token_url=TOKEN_URL,
+        session=None,
+        timeout=(3.05, 10),
+        token_cache_path=None,
+        refresh_margin=60,
+        token_timeout=3,
+        fanout_workers=8,
+        on_response=None,
+        breaker=None,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.session = session or build_session()
+        self.breaker = breaker
+        # on_response(path, status, seconds) after every API call; status is
+        # "error" when no response came back
+        self.on_response = on_response
+        self.timeout = timeout
+        self.fanout_workers = fanout_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # no retries: every request that needs a token waits on this one
+        self.tokens = TokenManager(
+            client_id,
+            client_secret,
+            token_url=token_url,
+            refresh_margin=refresh_margin,
+            cache_path=token_cache_path,
+            session=build_session(pool_size=1, max_retries=0),
+            timeout=token_timeout,
+            breaker=breaker,
+        )
+
+    @classmethod
+    def from_env(cls, client_id, client_secret):
+        session = build_session(
+            pool_size=int(os.getenv("SPOTIFY_POOL_SIZE", "10")),
+            max_retries=int(os.getenv("SPOTIFY_MAX_RETRIES", "3")),
+            backoff_factor=float(os.getenv("SPOTIFY_BACKOFF_FACTOR", "0.5")),
+            max_retry_after=float(os.getenv("SPOTIFY_MAX_RETRY_AFTER", "10")),
+        )
+        timeout = (
+            float(os.getenv("SPOTIFY_CONNECT_TIMEOUT", "3.05")),
+            float(os.getenv("SPOTIFY_READ_TIMEOUT", "10")),
+        )
+        return cls(
+            client_id,
+            client_secret,
+            api_url=os.getenv("SPOTIFY_API_URL", API_URL),
+            token_url=os.getenv("SPOTIFY_TOKEN_URL", TOKEN_URL),
+            session=session,
+            timeout=timeout,
+            token_cache_path=default_token_cache_path(client_id),
+            refresh_margin=int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", "60")),
+            token_timeout=float(os.getenv("SPOTIFY_TOKEN_TIMEOUT", "3")),
+            fanout_workers=int(os.getenv("SPOTIFY_FANOUT_WORKERS", "8")),
+        )
+
+    def get_token(self):
+        return self.tokens.get_token()
+
+    def get(self, path, token=None, params=None, until=None):
+        """
+        GET ``path`` relative to the API root. A 401 means the cached token
+        was revoked early, so it is dropped and the call is made once more.
+        Raises CircuitOpen without calling out while the breaker is open.
+        With ``until`` (a ``time.monotonic()`` deadline), timeouts shrink to
+        the time left and no retry starts after it.
+        """
+        with timed("spotify"):
+            if until is not None and time.monotonic() >= until:
+                raise requests.Timeout(f"Deadline passed before calling {path}")
+            # before the breaker: a token refresh is a call of its own
+            token = token or self.get_token()
+            if self.breaker is not None:
+                self.breaker.before_call()
+            res = None
+            try:
+                res = self._get(path, token, params, until)
+                if res.status_code == 401:
+                    self.tokens.invalidate()
+                    token = self.get_token()
+                    if token:
+                        res = self._get(path, token, params, until)
+                return res
+            finally:
+                if self.breaker is not None:
+                    self.breaker.record(res is not None and _succeeded(res))
+
+    def _timeout(self, until):
+        if until is None:
+            return self.timeout
+        remaining = max(until - time.monotonic(), 0.001)
+        if isinstance(self.timeout, tuple):
+            return tuple(min(t, remaining) for t in self.timeout)
+        return min(self.timeout, remaining) if self.timeout else remaining
+
+    def _get(self, path, token, params, until=None):
+        started = time.perf_counter()
+        status = "error"
+        _deadline.until = until
+        try:
+            res = self.session.get(
+                self.api_url + path,
+                headers={"Authorization": "Bearer " + (token or "")},
+                params=params,
+                timeout=self._timeout(until),
+            )
+            status = res.status_code
+            return res
+        finally:
+            _deadline.until = None
+            if self.on_response is not None:
+                self.on_response(path, status, time.perf_counter() - started)
+
+    def _get_executor(self):
+        # created on first use so gunicorn workers never inherit pool threads
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.fanout_workers, thread_name_prefix="spotify"
+                )
+            return self._executor
+
+    def get_many(self, calls, token=None, deadline=None):
+        """
+        Issue several GETs concurrently on the bounded fan-out pool.
+
+        ``calls`` is a list of ``(path, params)`` pairs. Responses come back in
+        the same order as ``calls`` so callers stay deterministic; a call that
+        raised or was still running after ``deadline`` seconds yields None.
+        Calls are bounded by the deadline too, so one that missed it does not
+        keep a pool thread waiting out the full read timeout.
+        """
+        with timed("spotify"):
+            until = time.monotonic() + deadline if deadline is not None else None
+            token = token or self.get_token()
+            executor = self._get_executor()
+            futures = [
+                executor.submit(self.get, path, token, params, until)
+                for path, params in calls
+            ]
+            done, _ = wait(futures, timeout=deadline)
+        responses = []
+        for (path, _), future in zip(calls, futures):
+            if future not in done:
+                future.cancel()
+                print(f"Spotify request to {path} missed the {deadline}s deadline")
+                responses.append(None)
+                continue
+            try:
+                responses.append(future.result())
+            except requests.RequestException as e:
+                print(f"Spotify request to {path} failed: {str(e)}")
+                responses.append(None)
+        return responses
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+class AsyncResponse:
+    """The parts of a ``requests.Response`` callers use, for async responses."""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncSpotifyClient:
+    """
+    aiohttp-based Spotify client for the async views. Calls run on one event
+    loop per process (a daemon thread started on first use), so every
+    request shares one connection pool and a request's fan-out is bounded
+    by connections instead of by a thread pool. Views running on any loop
+    await it through ``get`` and ``get_many``.
+
+    Transport failures raise the same ``requests`` exceptions as the sync
+    client, so callers handle both modes alike. aiohttp is imported on first
+    use, so sync deployments never load it.
+    """
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        api_url=API_URL,
+        token_url=TOKEN_URL,
+        timeout=(3.05, 10),
+        token_cache_path=None,
+        refresh_margin=60,
+        token_timeout=3,
+        max_connections=100,
+        max_retries=3,
+        backoff_factor=0.5,
+        max_retry_after=10,
+        on_response=None,
+        breaker=None,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.on_response = on_response
+        self.breaker = breaker
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_retry_after = max_retry_after
+        # token refreshes are rare, so they stay on the blocking client
+        self.tokens = TokenManager(
+            client_id,
+            client_secret,
+            token_url=token_url,
+            refresh_margin=refresh_margin,
+            cache_path=token_cache_path,
+            session=build_session(pool_size=1, max_retries=0),
+            timeout=token_timeout,
+            breaker=breaker,
+        )
+        self._loop = None
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, client_id, client_secret):
+        return cls(
+            client_id,
+            client_secret,
+            api_url=os.getenv("SPOTIFY_API_URL", API_URL),
+            token_url=os.getenv("SPOTIFY_TOKEN_URL", TOKEN_URL),
+            timeout=(
+                float(os.getenv("SPOTIFY_CONNECT_TIMEOUT", "3.05")),
+                float(os.getenv("SPOTIFY_READ_TIMEOUT", "10")),
+            ),
+            token_cache_path=default_token_cache_path(client_id),
+            refresh_margin=int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", "60")),
+            token_timeout=float(os.getenv("SPOTIFY_TOKEN_TIMEOUT", "3")),
+            max_connections=int(os.getenv("SPOTIFY_ASYNC_MAX_CONNECTIONS", "100")),
+            max_retries=int(os.getenv("SPOTIFY_MAX_RETRIES", "3")),
+            backoff_factor=float(os.getenv("SPOTIFY_BACKOFF_FACTOR", "0.5")),
+            max_retry_after=float(os.getenv("SPOTIFY_MAX_RETRY_AFTER", "10")),
+        )
+
+    def _get_loop(self):
+        # per process: a forked worker must not reuse its parent's loop thread
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="spotify-async", daemon=True
+                ).start()
+                self._loop = loop
+                self._session = None
+                self._pid = os.getpid()
+            return self._loop
+
+    def _run(self, coro):
+        """Run ``coro`` on the client loop and await it from the caller's loop."""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._get_loop()))
+
+    def _get_session(self):
+        # only ever called on the client loop, which the session is bound to
+        if self._session is None:
+            import aiohttp
+            connect, read = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            )
+        return self._session
+
+    async def get_token(self):
+        token = self.tokens.cached_token()
+        if token:
+            return token
+        return await asyncio.to_thread(self.tokens.get_token)
+
+    def _retry_delay(self, attempt, res):
+        """Seconds to wait before retrying ``res``, or None to give up."""
+        if attempt >= self.max_retries:
+            return None
+        if res is None:
+            return self.backoff_factor * (2 ** attempt)
+        if res.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = res.headers.get("Retry-After")
+        if res.status_code == 429 and retry_after is not None:
+            try:
+                retry_after = float(retry_after)
+            except ValueError:
+                retry_after = None
+            if retry_after is not None:
+                return retry_after if retry_after <= self.max_retry_after else None
+        return self.backoff_factor * (2 ** attempt)
+
+    async def _fetch(self, url, token, path):
+        import aiohttp
+
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with self._get_session().get(
+                url, headers={"Authorization": "Bearer " + (token or "")}
+            ) as r:
+                res = AsyncResponse(r.status, r.headers, await r.read())
+                status = res.status_code
+                return res
+        except asyncio.TimeoutError as e:
+            raise requests.Timeout(f"Spotify request timed out: {url}") from e
+        except aiohttp.ClientError as e:
+            raise requests.ConnectionError(str(e)) from e
+        finally:
+            if self.on_response is not None:
+                self.on_response(path, status, time.perf_counter() - started)
+
+    async def _send(self, path, token, params):
+        # same policy as SpotifyRetry: back off on connection errors, 429 and
+        # 5xx, but hand back a 429 that asks us to wait too long
+        from yarl import URL
+
+        url = self.api_url + path
+        if params:
+            url += "?" + urlencode(params)
+        url = URL(url, encoded=True)
+        attempt = 0
+        while True:
+            try:
+                res = await self._fetch(url, token, path)
+            except requests.RequestException:
+                if self._retry_delay(attempt, None) is None:
+                    raise
+                res = None
+            delay = self._retry_delay(attempt, res)
+            if res is not None and delay is None:
+                return res
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, path, token=None, params=None):
+        """Async ``SpotifyClient.get``, including the retry after a 401."""
+        with timed("spotify"):
+            # before the breaker: a token refresh is a call of its own
+            token = token or await self.get_token()
+            if self.breaker is not None:
+                self.breaker.before_call()
+            res = None
+            try:
+                res = await self._run(self._send(path, token, params))
+                if res.status_code == 401:
+                    self.tokens.invalidate()
+                    token = await self.get_token()
+                    if token:
+                        res = await self._run(self._send(path, token, params))
+                return res
+            finally:
+                if self.breaker is not None:
+                    self.breaker.record(res is not None and _succeeded(res))
+
+    async def get_many(self, calls, token=None, deadline=None):
+        """Async ``SpotifyClient.get_many``: same ordering and None semantics."""
+        if not calls:
+            return []
+        with timed("spotify"):
+            token = token or await self.get_token()
+            tasks = [
+                asyncio.ensure_future(self.get(path, token, params)) for path, params in calls
+            ]
+            done, pending = await asyncio.wait(tasks, timeout=deadline)
+        responses = []
+        for (path, _), task in zip(calls, tasks):
+            if task in pending:
+                task.cancel()
+                print(f"Spotify request to {path} missed the {deadline}s deadline")
+                responses.append(None)
+                continue
+            try:
+                responses.append(task.result())
+            except requests.RequestException as e:
+                print(f"Spotify request to {path} failed: {str(e)}")
+                responses.append(None)
+        return responses
+
+    def close(self):
+        if self._loop is not None and self._pid == os.getpid():
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self.tokens.session.close()
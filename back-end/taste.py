@@ -0,0 +1,228 @@
+"""
+Per-user taste profiles: for each mood a user journals, the running mean
+and variance of the audio features of the tracks they logged with it.
+
+A profile (one ``taste_profiles`` document per user) keeps, per mood, the
+entry count and the sum and sum of squares of every feature. Saving or
+deleting an entry is a single ``$inc`` of those totals, O(1) and atomic
+across workers; means and variances are derived when the profile is read.
+Entries carry the features they were counted with, so a delete subtracts
+exactly what its save added. As with mood rollups, every write bumps the
+profile's ``gen`` and a rebuild only marks it complete if ``gen`` held.
+
+    flask --app app rebuild-taste-profiles
+"""
+
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import click
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from mood_stats import mood_key
+from scoring import FEATURE_COLUMNS
+
+# features whose targets are blended; mode is a key, not a point on a scale
+BLENDED_FEATURES = ("danceability", "energy", "valence", "tempo")
+# a feature's full range, so spread is comparable between tempo and the rest
+FEATURE_RANGE = {"tempo": 200.0}
+
+
+def entry_features(features):
+    """The feature values an entry stores, or None if any is missing."""
+    if not features or any(features.get(c) is None for c in FEATURE_COLUMNS):
+        return None
+    return {c: float(features[c]) for c in FEATURE_COLUMNS}
+
+
+def taste_key(mood):
+    """Journal moods are capitalized, recommendation moods are not."""
+    return mood_key(mood.strip().lower())
+
+
+def _increments(entry, sign):
+    key = taste_key(entry["mood"])
+    inc = {f"moods.{key}.n": sign, "gen": 1}
+    for column, value in entry["features"].items():
+        inc[f"moods.{key}.sum.{column}"] = sign * value
+        inc[f"moods.{key}.sumsq.{column}"] = sign * value * value
+    return inc
+
+
+def record_taste(db, entry):
+    """Add a saved entry's features to its user's profile for its mood."""
+    if entry.get("features"):
+        db.taste_profiles.update_one(
+            {"_id": entry["user_id"]}, {"$inc": _increments(entry, 1)}, upsert=True
+        )
+
+
+def forget_taste(db, entry):
+    """Undo ``record_taste`` for a deleted entry."""
+    if entry.get("features"):
+        db.taste_profiles.update_one(
+            {"_id": entry["user_id"]}, {"$inc": _increments(entry, -1)}
+        )
+
+
+def update_taste(update, db, entry):
+    """Like ``update_stats``: never fail the journal write, flag the profile instead."""
+    try:
+        update(db, entry)
+    except PyMongoError as e:
+        print(f"Taste profile update error: {e}")
+        try:
+            db.taste_profiles.update_one(
+                {"_id": entry["user_id"]},
+                {"$set": {"complete": False}, "$inc": {"gen": 1}},
+            )
+        except PyMongoError:
+            pass
+
+
+def mood_taste(profile, mood):
+    """``{"n", "mean", "var"}`` of a profile's mood; None without entries."""
+    totals = profile.get("moods", {}).get(taste_key(mood)) or {}
+    n = totals.get("n", 0)
+    if n <= 0:
+        return None
+    mean, var = {}, {}
+    for column, total in totals.get("sum", {}).items():
+        mean[column] = total / n
+        # population variance; clamped, as float error can dip just below 0
+        var[column] = max(totals["sumsq"][column] / n - mean[column] ** 2, 0.0)
+    return {"n": n, "mean": mean, "var": var}
+
+
+def rebuild_profile(db, user_id, features_of):
+    """
+    Recompute a user's profile from their entries. Entries saved without
+    features are given them first from ``features_of`` (track IDs -> audio
+    features by ID), where it knows the track. If the profile is written
+    meanwhile, the result is returned but the profile is left incomplete.
+    """
+    gen = (db.taste_profiles.find_one({"_id": user_id}, {"gen": 1}) or {}).get("gen")
+    missing = db.entries.distinct(
+        "track_id", {"user_id": user_id, "features": {"$exists": False}}
+    )
+    if missing:
+        found = features_of(missing)
+        for track_id in missing:
+            features = entry_features(found.get(track_id))
+            if features:
+                db.entries.update_many(
+                    {"user_id": user_id, "track_id": track_id, "features": {"$exists": False}},
+                    {"$set": {"features": features}},
+                )
+
+    moods = {}
+    entries = db.entries.find(
+        {"user_id": user_id, "features": {"$exists": True}}, {"mood": 1, "features": 1}
+    )
+    for entry in entries:
+        totals = moods.setdefault(taste_key(entry["mood"]), {"n": 0, "sum": {}, "sumsq": {}})
+        totals["n"] += 1
+        for column, value in entry["features"].items():
+            totals["sum"][column] = totals["sum"].get(column, 0.0) + value
+            totals["sumsq"][column] = totals["sumsq"].get(column, 0.0) + value * value
+    profile = {"moods": moods, "complete": True}
+    try:
+        db.taste_profiles.update_one({"_id": user_id, "gen": gen}, {"$set": profile}, upsert=True)
+    except DuplicateKeyError:
+        print(f"Taste profile for {user_id} changed during rebuild, leaving it incomplete")
+    return dict(profile, _id=user_id)
+
+
+def load_profile(db, user_id, features_of):
+    """The user's profile, rebuilt first if it is missing or incomplete."""
+    profile = db.taste_profiles.find_one({"_id": user_id})
+    # a profile first made by a save's upsert has never counted older entries
+    if not profile or not profile.get("complete"):
+        profile = rebuild_profile(db, user_id, features_of)
+    return profile
+
+
+def blend_targets(target_features, taste, prior=10, max_blend=0.5):
+    """
+    The mood's static targets pulled towards the user's own mean for it.
+    The pull grows with the number of entries (``n / (n + prior)``), shrinks
+    as their picks spread out, and never passes ``max_blend``, so the mood
+    still decides; thresholds are left as they are.
+    """
+    if not taste:
+        return target_features
+    blended = dict(target_features)
+    volume = taste["n"] / (taste["n"] + prior)
+    for column in BLENDED_FEATURES:
+        key = f"target_{column}"
+        if key not in target_features or column not in taste["mean"]:
+            continue
+        spread = math.sqrt(taste["var"][column]) / FEATURE_RANGE.get(column, 1.0)
+        # a spread of half the range or more says nothing about taste
+        weight = max_blend * volume * max(0.0, 1 - 2 * spread)
+        blended[key] = (1 - weight) * target_features[key] + weight * taste["mean"][column]
+    return blended
+
+
+class TasteBackfill:
+    """
+    Fetches the audio features of tracks saved without them off the request
+    path, then flags the user's profile so its next read counts them. One
+    thread per process; a pending track is not queued twice.
+    """
+
+    def __init__(self, db, features_of, on_ready=None):
+        self.db = db
+        self.features_of = features_of
+        self.on_ready = on_ready
+        self._pending = set()
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # per process, as a forked worker does not inherit pool threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="taste-backfill"
+                )
+                self._pending = set()
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, user_id, track_id):
+        executor = self._get_executor()
+        with self._lock:
+            if (user_id, track_id) in self._pending:
+                return
+            self._pending.add((user_id, track_id))
+        executor.submit(self._run, user_id, track_id)
+
+    def _run(self, user_id, track_id):
+        try:
+            found = self.features_of([track_id])
+            if entry_features(found.get(track_id)):
+                self.db.taste_profiles.update_one(
+                    {"_id": user_id}, {"$set": {"complete": False}, "$inc": {"gen": 1}}
+                )
+                if self.on_ready is not None:
+                    self.on_ready(user_id)
+        except Exception as e:
+            print(f"Taste backfill error: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard((user_id, track_id))
+
+
+def register_commands(app, db, features_of):
+    @app.cli.command("rebuild-taste-profiles")
+    @click.option("--user", "username", default=None, help="Only this user.")
+    def rebuild_taste_profiles_command(username):
+        """Recompute taste profiles from journal entries, backfilling features."""
+        query = {"username": username} if username else {}
+        count = 0
+        for user in db.users.find(query, {"_id": 1}):
+            rebuild_profile(db, str(user["_id"]), features_of)
+            count += 1
+        print(f" * rebuilt {count} taste profiles")
@@ -1,6 +1,25 @@
 import pytest
 from app import create_app
 import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@pytest.fixture
+def mongomock_app(monkeypatch):
+    """An app whose MongoDB is an in-memory mongomock client."""
+    import mongomock
+    import database
+
+    monkeypatch.setattr(database.pymongo, "MongoClient", mongomock.MongoClient)
+    # set here, not left to whatever an earlier test put in os.environ
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017/test_db")
+    monkeypatch.setenv("MONGO_DBNAME", "test_db")
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
 
 
 @pytest.fixture
@@ -14,3 +33,88 @@ def client():
     # Test client for simulating HTTP requests
     with app.test_client() as client:
         yield client
+
+
+class FakeSpotifyServer:
+    """
+    Local stand-in for accounts.spotify.com and api.spotify.com. Token
+    requests are counted; API responses are served from ``responses``
+    (a list of ``(status, body, headers)`` per path) or default to 200.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.expires_in = 3600
+        self.status = 200
+        self.delay = 0
+        self.api_delay = 0
+        self.responses = {}
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                with server._lock:
+                    server.hits += 1
+                    hit = server.hits
+                time.sleep(server.delay)
+                if server.status != 200:
+                    self._send(server.status, {"error": "invalid_client"})
+                    return
+                self._send(
+                    200,
+                    {
+                        "access_token": f"token-{hit}",
+                        "token_type": "Bearer",
+                        "expires_in": server.expires_in,
+                    },
+                )
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                with server._lock:
+                    server.connections.add(self.client_address)
+                    server.requests.append(
+                        (self.path, self.headers.get("Authorization"))
+                    )
+                    queued = server.responses.get(path)
+                    response = queued.pop(0) if queued else (200, {}, {})
+                time.sleep(server.api_delay)
+                self._send(*response)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        base = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.url = base + "/api/token"
+        self.api_url = base + "/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def spotify_server():
+    server = FakeSpotifyServer()
+    yield server
+    server.close()
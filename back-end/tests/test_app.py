@@ -1,6 +1,7 @@
 import pytest
 from app import create_app
 from unittest.mock import patch
+import time
 
 @pytest.fixture
 def client():
@@ -94,3 +95,353 @@ def test_playlist_page(client):
     """Test viewing the playlists page."""
     response = client.get("/playlists")
     assert response.status_code == 302
+
+
+def test_async_mode_serves_search_through_async_view(spotify_server, monkeypatch):
+    import mongomock
+    import database
+
+    monkeypatch.setattr(database.pymongo, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017/test_db")
+    monkeypatch.setenv("MONGO_DBNAME", "test_db")
+    monkeypatch.setenv("SPOTIFY_API_URL", spotify_server.api_url)
+    monkeypatch.setenv("SPOTIFY_TOKEN_URL", spotify_server.url)
+    monkeypatch.setenv("SPOTIFY_TOKEN_CACHE", "")
+    monkeypatch.setenv("CLIENT_ID", "client-id")
+    monkeypatch.setenv("CLIENT_SECRET", "client-secret")
+    spotify_server.responses["/v1/search"] = [
+        (200, {"tracks": {"items": [{
+            "id": "t1", "name": "Song", "uri": "spotify:track:t1",
+            "artists": [{"id": "a1", "name": "Artist"}],
+            "album": {"name": "Album", "images": []},
+            "external_urls": {"spotify": "https://open.spotify.com/track/t1"},
+        }]}}, {})
+    ]
+    app = create_app(async_mode=True)
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        response = client.get("/search-songs?songname=song")
+    assert response.status_code == 200
+    assert b"Song" in response.data
+    assert "spotify;dur=" in response.headers["Server-Timing"]
+    assert spotify_server.requests[0][0] == "/v1/search?q=song&type=track&limit=20"
+    app.extensions["async_spotify"].close()
+
+
+def test_user_loader_looks_users_up_once(mongomock_app, monkeypatch):
+    import mongomock
+
+    app = mongomock_app
+    users = app.extensions["mongo"].users
+    user_id = str(users.insert_one({"username": "u", "password": "x"}).inserted_id)
+
+    lookups = []
+    find_one = mongomock.collection.Collection.find_one
+    monkeypatch.setattr(
+        mongomock.collection.Collection,
+        "find_one",
+        lambda self, *args, **kwargs: lookups.append(self.name) or find_one(self, *args, **kwargs),
+    )
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        for _ in range(3):
+            assert client.get("/home").status_code == 200
+        assert lookups.count("users") == 1
+
+        assert client.get("/logout").status_code == 302
+        assert client.get("/home").status_code == 302
+
+
+def test_login_upgrades_hash_and_reports_busy_hashers(request, monkeypatch):
+    from passwords import PasswordHasher, hash_rounds
+
+    monkeypatch.setenv("BCRYPT_ROUNDS", "5")
+    monkeypatch.setenv("BCRYPT_WORKERS", "0")
+    app = request.getfixturevalue("mongomock_app")
+    users = app.extensions["mongo"].users
+    users.insert_one({"username": "u", "password": PasswordHasher(rounds=4).hash("pw")})
+
+    with app.test_client() as client:
+        response = client.post("/login", data={"username": "u", "password": "pw"})
+        assert response.status_code == 302
+        assert hash_rounds(users.find_one({"username": "u"})["password"]) == 5
+
+        # every hashing slot taken
+        app.extensions["passwords"]._slots.acquire = lambda blocking=True: False
+        response = client.post("/login", data={"username": "u", "password": "pw"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+def test_journal_import_and_export_endpoints(mongomock_app):
+    users = mongomock_app.extensions["mongo"].users
+    user_id = str(users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    body = "track_name,track_artist,track_id,mood\nSong,Artist,t1,happy\n,Artist,t2,sad\n"
+
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        response = client.post("/entries/import", data=body, content_type="text/csv")
+        assert response.get_json()["inserted"] == 1
+        assert response.get_json()["rejected"] == 1
+
+        response = client.get("/entries/export?format=ndjson")
+        assert response.mimetype == "application/x-ndjson"
+        assert response.get_data(as_text=True).count("\n") == 1
+
+
+def test_server_timing_and_metrics(mongomock_app):
+    with mongomock_app.test_client() as client:
+        response = client.get("/login")
+        assert "render;dur=" in response.headers["Server-Timing"]
+        assert "total;dur=" in response.headers["Server-Timing"]
+
+        text = client.get("/metrics").get_data(as_text=True)
+    assert 'moodify_request_duration_seconds_count{route="/login",method="GET",status="200"} 1' in text
+    assert 'moodify_cache_lookups_total{cache="search",result="hits"} 0' in text
+    assert 'moodify_mongo_pool_connections{state="open"}' in text
+
+
+def test_healthz_reports_ready_mongo(mongomock_app):
+    with mongomock_app.test_client() as client:
+        response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.get_json()["mongo"] == "ok"
+
+    builder = mongomock_app.extensions["indexes"]
+    for _ in range(100):
+        if builder.state == "ready":
+            break
+        time.sleep(0.05)
+    assert builder.state == "ready"
+
+
+def test_healthz_unavailable_without_mongo(monkeypatch):
+    # nothing listens on port 1; building the app must not wait for it
+    monkeypatch.setenv("MONGO_URI", "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100")
+    started = time.perf_counter()
+    app = create_app()
+    assert time.perf_counter() - started < 2
+    with app.test_client() as client:
+        response = client.get("/healthz")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "unavailable"
+
+
+def test_playlists_store_references_and_hydrate_from_track_store(mongomock_app):
+    db = mongomock_app.extensions["mongo"]
+    user_id = str(db.users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    db.tracks.insert_one(
+        {"_id": "t1", "name": "Song", "artist": "Artist", "album_cover": "cover.png",
+         "duration_ms": 1000}
+    )
+    posted = [
+        {"uri": "spotify:track:t1", "name": "Song", "artist": "Artist", "albumCover": "x" * 1000}
+    ]
+
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        response = client.post("/create-playlist", json={"name": "Mix", "tracks": posted})
+        assert response.status_code == 201
+        stored = db.playlists.find_one()
+        assert stored["tracks"] == [
+            {"id": "t1", "name": "Song", "artist": "Artist", "duration_ms": 1000}
+        ]
+
+        data = client.get("/user-playlists?limit=1").get_json()
+        assert data["next_cursor"] is None
+        assert data["playlists"][0]["track_count"] == 1
+        assert data["playlists"][0]["tracks"][0]["album_cover"] == "cover.png"
+
+        playlist_id = data["playlists"][0]["_id"]
+        tracks = client.get(f"/user-playlists/{playlist_id}/tracks?offset=0&limit=5").get_json()
+        assert [t["id"] for t in tracks["tracks"]] == ["t1"]
+        assert client.get("/user-playlists?cursor=bogus").status_code == 400
+
+
+def test_recommendations_fail_fast_while_spotify_circuit_is_open(mongomock_app):
+    users = mongomock_app.extensions["mongo"].users
+    user_id = str(users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    breaker = mongomock_app.extensions["spotify_breaker"]
+    for _ in range(breaker.failure_threshold):
+        breaker.record(False)
+
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        # "rainy" has no mood pool, so it needs a live search
+        response = client.get("/recommendations?mood=rainy")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+
+        text = client.get("/metrics").get_data(as_text=True)
+        health = client.get("/healthz").get_json()
+    assert 'moodify_spotify_circuit_state{state="open"} 1' in text
+    assert "moodify_spotify_circuit_rejections_total 1" in text
+    assert health["spotify_circuit"] == "open"
+
+
+def test_journal_entries_keep_the_taste_profile_current(mongomock_app):
+    db = mongomock_app.extensions["mongo"]
+    user_id = str(db.users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    db.audio_features.insert_many([
+        {"_id": track_id, "danceability": 0.5, "energy": energy, "valence": 0.5,
+         "tempo": 120.0, "mode": 1}
+        for track_id, energy in (("t1", 0.2), ("t2", 0.6))
+    ])
+
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        for track_id in ("t1", "t2", "t3"):
+            client.post("/save-entry", data={
+                "track_name": "Song", "track_artist": "Artist",
+                "track_id": track_id, "mood": "Happy",
+            })
+        profile = db.taste_profiles.find_one({"_id": user_id})
+        assert profile["moods"]["happy"]["n"] == 2
+        assert profile["moods"]["happy"]["sum"]["energy"] == pytest.approx(0.8)
+        # t3 has no known features, so it is saved without being counted
+        assert "features" not in db.entries.find_one({"track_id": "t3"})
+
+        entry = db.entries.find_one({"track_id": "t2"})
+        client.post(f"/delete-entry/{entry['_id']}")
+    profile = db.taste_profiles.find_one({"_id": user_id})
+    assert profile["moods"]["happy"]["n"] == 1
+    assert profile["moods"]["happy"]["sum"]["energy"] == pytest.approx(0.2)
+
+
+def test_cached_search_does_not_wait_for_a_token(spotify_server, monkeypatch):
+    import mongomock
+    import database
+
+    monkeypatch.setattr(database.pymongo, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setenv("SPOTIFY_API_URL", spotify_server.api_url)
+    monkeypatch.setenv("SPOTIFY_TOKEN_URL", spotify_server.url)
+    monkeypatch.setenv("SPOTIFY_TOKEN_CACHE", "")
+    monkeypatch.setenv("CLIENT_ID", "client-id")
+    monkeypatch.setenv("CLIENT_SECRET", "client-secret")
+    # inside the refresh margin, so every token lookup would ask accounts again
+    spotify_server.expires_in = 30
+    spotify_server.responses["/v1/search"] = [(200, {"tracks": {"items": []}}, {})]
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        assert client.get("/search-songs?songname=song").status_code == 200
+        assert spotify_server.hits == 1
+        spotify_server.status = 503
+        assert client.get("/search-songs?songname=song").status_code == 200
+    assert spotify_server.hits == 1
+
+
+def test_concurrent_signup_with_taken_name_is_reported(mongomock_app, monkeypatch):
+    import mongomock
+    from indexes import ensure_indexes
+
+    db = mongomock_app.extensions["mongo"]
+    ensure_indexes(db)
+    db.users.insert_one({"username": "taken", "password": "x"})
+    # the other signup inserts between this one's check and its insert
+    monkeypatch.setattr(mongomock.collection.Collection, "find_one", lambda self, *a, **k: None)
+    with mongomock_app.test_client() as client:
+        response = client.post(
+            "/signup", data={"username": "taken", "password": "pw"}, follow_redirects=True
+        )
+    assert response.status_code == 200
+    assert b"User already exists" in response.data
+
+
+def test_served_recommendations_are_remembered_for_playlists(mongomock_app):
+    from datetime import datetime
+
+    db = mongomock_app.extensions["mongo"]
+    user_id = str(db.users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    pool = [
+        {"track": {"id": f"t{i}", "name": f"Song {i}", "uri": f"spotify:track:t{i}",
+                   "artists": [{"id": f"a{i}", "name": "Artist"}],
+                   "album": {"name": "Album", "images": [{"url": "cover.png"}]}},
+         "score": 1 - i / 100}
+        for i in range(40)
+    ]
+    db.mood_pools.insert_one(
+        {"_id": "happy", "built_at": datetime.now(), "size": len(pool), "tracks": pool}
+    )
+
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        tracks = client.get("/recommendations?mood=happy").get_json()["tracks"]
+    assert tracks
+    stored = {doc["_id"]: doc for doc in db.tracks.find()}
+    assert set(stored) == {t["id"] for t in tracks}
+    assert stored[tracks[0]["id"]]["album_cover"] == "cover.png"
+
+
+def test_home_page_renders_without_mood_stats(mongomock_app, monkeypatch):
+    import sys
+    from pymongo.errors import PyMongoError
+
+    def unavailable(*args, **kwargs):
+        raise PyMongoError("rollup rebuild failed")
+
+    monkeypatch.setattr(sys.modules["app"], "dashboard_stats", unavailable)
+    db = mongomock_app.extensions["mongo"]
+    user_id = str(db.users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        response = client.get("/home")
+    assert response.status_code == 200
+    assert b'id="topMood">No data<' in response.data
+
+
+def test_feature_backfill_is_queued_after_the_entry_is_saved(mongomock_app, monkeypatch):
+    import taste
+
+    db = mongomock_app.extensions["mongo"]
+    user_id = str(db.users.insert_one({"username": "u", "password": "x"}).inserted_id)
+    queued = []
+
+    def submit(self, user, track_id):
+        # the profile rebuild it triggers has to find the entry
+        queued.append(db.entries.count_documents({"track_id": track_id}))
+
+    monkeypatch.setattr(taste.TasteBackfill, "submit", submit)
+    with mongomock_app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        client.post("/save-entry", data={
+            "track_name": "Song", "track_artist": "Artist", "track_id": "t1", "mood": "Happy",
+        })
+    assert queued == [1]
+
+
+def test_oversized_playlist_is_rejected_before_any_track_lookup(spotify_server, monkeypatch):
+    import mongomock
+    import database
+
+    monkeypatch.setattr(database.pymongo, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017/test_db")
+    monkeypatch.setenv("MONGO_DBNAME", "test_db")
+    monkeypatch.setenv("SPOTIFY_API_URL", spotify_server.api_url)
+    monkeypatch.setenv("SPOTIFY_TOKEN_URL", spotify_server.url)
+    monkeypatch.setenv("SPOTIFY_TOKEN_CACHE", "")
+    monkeypatch.setenv("CLIENT_ID", "client-id")
+    monkeypatch.setenv("CLIENT_SECRET", "client-secret")
+    monkeypatch.setenv("PLAYLIST_MAX_TRACKS", "2")
+    app = create_app()
+    app.config["TESTING"] = True
+    users = app.extensions["mongo"].users
+    user_id = str(users.insert_one({"username": "u", "password": "x"}).inserted_id)
+
+    posted = [{"uri": f"spotify:track:t{i}"} for i in range(3)]
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session["_user_id"] = user_id
+        response = client.post("/create-playlist", json={"tracks": posted})
+    assert response.status_code == 400
+    assert "at most 2 tracks" in response.get_json()["error"]
+    assert spotify_server.hits == 0
+    assert spotify_server.requests == []
@@ -0,0 +1,230 @@
+import asyncio
+import time
+import threading
+import mongomock
+from cache import (
+    AudioFeatureCache,
+    LRUCache,
+    QueryCache,
+    RedisBackend,
+    normalize_query,
+)
+
+
+def features(track_id, energy=0.5):
+    return {"id": track_id, "danceability": 0.5, "energy": energy, "valence": 0.5,
+            "tempo": 120.0, "mode": 1}
+
+
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, track_ids):
+        self.calls.append(list(track_ids))
+        return [features(t) for t in track_ids if not t.startswith("unknown")]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+
+
+def test_audio_features_only_fetch_misses():
+    collection = mongomock.MongoClient().db.audio_features
+    cache = AudioFeatureCache(collection)
+    fetch = FakeFetch()
+
+    first = cache.get_many(["t1", "t2"], fetch)
+    second = cache.get_many(["t1", "t2", "t3"], fetch)
+
+    assert set(first) == {"t1", "t2"}
+    assert set(second) == {"t1", "t2", "t3"}
+    assert fetch.calls == [["t1", "t2"], ["t3"]]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 3
+
+
+def test_audio_features_durable_tier_survives_restart():
+    collection = mongomock.MongoClient().db.audio_features
+    fetch = FakeFetch()
+    AudioFeatureCache(collection).get_many(["t1", "t2"], fetch)
+
+    restarted = AudioFeatureCache(collection)
+    found = restarted.get_many(["t1", "t2"], fetch)
+
+    assert found["t1"] == features("t1")
+    assert len(fetch.calls) == 1
+    assert restarted.stats()["db_hits"] == 2
+
+
+def test_audio_features_without_durable_tier():
+    cache = AudioFeatureCache()
+    fetch = FakeFetch()
+    found = cache.get_many(["t1", "unknown1"], fetch)
+    assert set(found) == {"t1"}
+    cache.get_many(["unknown1"], fetch)
+    assert fetch.calls[-1] == ["unknown1"]
+
+
+def test_audio_features_concurrent_insert_is_harmless():
+    collection = mongomock.MongoClient().db.audio_features
+    collection.insert_one({"_id": "t1", "energy": 0.5})
+    cache = AudioFeatureCache(collection)
+    cache._store([features("t1"), features("t2")])
+    assert collection.count_documents({}) == 2
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_lru_entries_expire_after_ttl():
+    cache = LRUCache(maxsize=4, ttl=0.05)
+    cache.set("q", [1])
+    assert cache.get("q") == [1]
+    time.sleep(0.06)
+    assert cache.get("q") is None
+
+
+def test_query_cache_hits_and_skips_failed_fetches():
+    cache = QueryCache(LRUCache(8), ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return None if len(calls) == 1 else ["track"]
+
+    assert cache.get_or_fetch("k", fetch) is None
+    assert cache.get_or_fetch("k", fetch) == ["track"]
+    assert cache.get_or_fetch("k", fetch) == ["track"]
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_query_cache_collapses_concurrent_misses():
+    cache = QueryCache(LRUCache(8), ttl=60)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return ["track"]
+
+    def worker(results):
+        barrier.wait()
+        results.append(cache.get_or_fetch("k", fetch))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [["track"]] * 8
+    assert len(calls) == 1
+
+
+def test_query_cache_on_redis_backend_is_shared():
+    redis_client = FakeRedis()
+    first = QueryCache(RedisBackend(redis_client), ttl=30)
+    second = QueryCache(RedisBackend(redis_client), ttl=30)
+    first.get_or_fetch("5:lofi", lambda: [{"id": "t1"}])
+    assert second.get_or_fetch("5:lofi", lambda: None) == [{"id": "t1"}]
+
+
+def test_query_cache_serves_stale_while_refreshing():
+    cache = QueryCache(LRUCache(8), ttl=0.05, stale_ttl=60)
+    refreshed = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            refreshed.wait(1)
+        return [len(calls)]
+
+    assert cache.get_or_fetch("k", fetch) == [1]
+    time.sleep(0.06)
+    # stale: answered at once from the cache, refreshed in the background
+    assert cache.get_or_fetch("k", fetch) == [1]
+    assert cache.get_or_fetch("k", fetch) == [1]
+    refreshed.set()
+    for _ in range(100):
+        if cache.get_or_fetch("k", fetch) == [2]:
+            break
+        time.sleep(0.01)
+    assert cache.get_or_fetch("k", fetch) == [2]
+    assert len(calls) == 2
+    assert cache.stats()["stale"] >= 2
+
+
+def test_query_cache_keeps_stale_value_when_refresh_fails():
+    cache = QueryCache(LRUCache(8), ttl=0.05, stale_ttl=60)
+    assert cache.get_or_fetch("k", lambda: ["good"]) == ["good"]
+    time.sleep(0.06)
+
+    def outage():
+        raise ConnectionError("upstream down")
+
+    for _ in range(5):
+        assert cache.get_or_fetch("k", outage) == ["good"]
+        time.sleep(0.02)
+
+
+def test_normalize_query():
+    assert normalize_query("  Lo-Fi   CHILL ") == "lo-fi chill"
+
+
+def test_async_fetches_collapse_with_sync_callers():
+    cache = QueryCache(LRUCache(8), ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return ["track"]
+
+    async def request():
+        return await cache.aget_or_fetch("k", fetch)
+
+    leader = threading.Thread(target=lambda: asyncio.run(request()))
+    leader.start()
+    time.sleep(0.05)
+    assert cache.get_or_fetch("k", lambda: ["other"]) == ["track"]
+    leader.join()
+    assert asyncio.run(request()) == ["track"]
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "collapsed": 1, "stale": 0}
+
+
+def test_audio_features_async_lookup_only_fetches_misses():
+    cache = AudioFeatureCache(mongomock.MongoClient().db.audio_features)
+    fetch = FakeFetch()
+
+    async def afetch(track_ids):
+        return fetch(track_ids)
+
+    cache.get_many(["t1"], fetch)
+    found = asyncio.run(cache.aget_many(["t1", "t2"], afetch))
+    assert set(found) == {"t1", "t2"}
+    assert fetch.calls == [["t1"], ["t2"]]
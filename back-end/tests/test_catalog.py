@@ -0,0 +1,139 @@
+import csv
+import time
+from datetime import datetime, timedelta
+import mongomock
+import numpy as np
+from catalog import TrackCatalog, VectorIndex, read_rows, slim_track, target_vector
+from moods import calculate_mood_match_score, get_mood_features
+
+
+def spotify_track(track_id, artist_id="artist1"):
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "uri": f"spotify:track:{track_id}",
+        "artists": [{"id": artist_id, "name": "Artist"}],
+        "album": {"name": "Album", "images": [{"url": "https://img/1"}], "available_markets": ["US"]},
+    }
+
+
+def features(danceability, energy, valence, tempo, mode):
+    return {
+        "danceability": danceability,
+        "energy": energy,
+        "valence": valence,
+        "tempo": tempo,
+        "mode": mode,
+    }
+
+
+def test_slim_track_keeps_what_the_recommendation_page_renders():
+    slim = slim_track(spotify_track("t1"))
+    assert slim == {
+        "id": "t1",
+        "name": "Song t1",
+        "uri": "spotify:track:t1",
+        "artists": [{"id": "artist1", "name": "Artist"}],
+        "album": {"name": "Album", "images": [{"url": "https://img/1"}]},
+    }
+
+
+def test_nearest_matches_brute_force_score_ranking():
+    rng = np.random.default_rng(7)
+    index = VectorIndex()
+    rows = {}
+    for i in range(500):
+        row = features(*rng.random(3), float(rng.uniform(60, 180)), int(rng.integers(0, 2)))
+        rows[f"t{i}"] = row
+        index.add(slim_track(spotify_track(f"t{i}")), row)
+
+    target = get_mood_features("calm")
+    tracks, matrix = index.nearest(target_vector(target), 10)
+    assert len(tracks) == 10
+    assert matrix.shape == (10, 5)
+    assert [rows[t["id"]]["tempo"] for t in tracks] == list(matrix[:, 3])
+
+    # the nearest neighbour is the track with the best unfiltered score
+    unfiltered = {k: v for k, v in target.items() if not k.startswith(("min_", "max_"))}
+    unfiltered["mood_type"] = ""
+    ranked = sorted(rows, key=lambda t: calculate_mood_match_score(rows[t], unfiltered), reverse=True)
+    assert [t["id"] for t in tracks] == ranked[:10]
+
+
+def test_index_grows_without_changing_earlier_results():
+    index = VectorIndex()
+    index.add(slim_track(spotify_track("t0")), features(0.5, 0.5, 0.5, 120, 1))
+    tracks, matrix = index.nearest(target_vector(get_mood_features("happy")), 5)
+    for i in range(1, 3000):
+        index.add(slim_track(spotify_track(f"t{i}")), features(0.1, 0.1, 0.1, 60, 0))
+    assert len(index.nearest(target_vector(get_mood_features("happy")), 5000)[0]) == 3000
+    assert [t["id"] for t in tracks] == ["t0"]
+    assert list(matrix[0]) == [0.5, 0.5, 0.5, 120, 1]
+
+
+def test_refresh_picks_up_rows_written_with_a_lagging_clock():
+    collection = mongomock.MongoClient().db.catalog
+    writer, reader = TrackCatalog(collection), TrackCatalog(collection, sync_window=600)
+    writer.add_tracks([spotify_track("t1")], {"t1": features(0.5, 0.5, 0.5, 120, 1)})
+    reader.refresh(force=True)
+    # another worker's clock is two minutes behind
+    lagging = datetime.now() - timedelta(minutes=2)
+    collection.insert_one({
+        "_id": "t2", "track": slim_track(spotify_track("t2")),
+        "features": features(0.1, 0.2, 0.3, 80, 0), "added_at": lagging,
+    })
+    reader.refresh(force=True)
+    assert "t2" in reader.index
+
+
+def test_add_tracks_persists_and_other_workers_pick_them_up():
+    collection = mongomock.MongoClient().db.catalog
+    catalog = TrackCatalog(collection)
+    added = catalog.add_tracks(
+        [spotify_track("t1"), spotify_track("t2"), spotify_track("no-features")],
+        {"t1": features(0.5, 0.5, 0.5, 120, 1), "t2": features(0.1, 0.2, 0.3, 80, 0)},
+    )
+    assert added == 2
+    assert catalog.add_tracks([spotify_track("t1")], {"t1": features(0.5, 0.5, 0.5, 120, 1)}) == 0
+    assert collection.count_documents({}) == 2
+
+    other = TrackCatalog(collection)
+    tracks, _ = other.nearest(get_mood_features("happy"), k=5)
+    assert {t["id"] for t in tracks} == {"t1", "t2"}
+
+    catalog.add_tracks([spotify_track("t3")], {"t3": features(0.7, 0.8, 0.9, 125, 1)})
+    other.refresh(force=True)
+    assert len(other.index) == 3
+
+
+def test_import_rows_from_csv(tmp_path):
+    path = tmp_path / "tracks.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "artist", "artist_id", "album", "album_cover", "uri",
+                         "danceability", "energy", "valence", "tempo", "mode"])
+        writer.writerow(["a", "A", "Band", "", "LP", "", "", "0.7", "0.8", "0.9", "120", "1"])
+        writer.writerow(["b", "B", "Band", "band1", "LP", "https://img/b", "spotify:track:b",
+                         "0.2", "0.3", "0.1", "70", "0"])
+
+    collection = mongomock.MongoClient().db.catalog
+    catalog = TrackCatalog(collection)
+    assert catalog.import_rows(read_rows(str(path)), batch_size=1) == 2
+    assert collection.count_documents({}) == 2
+
+    doc = collection.find_one({"_id": "a"})
+    assert doc["track"]["uri"] == "spotify:track:a"
+    assert doc["track"]["album"]["images"] == []
+    assert doc["features"]["tempo"] == 120.0
+
+
+def test_start_loads_the_catalog_off_the_request_path():
+    collection = mongomock.MongoClient().db.catalog
+    TrackCatalog(collection).add_tracks([spotify_track("t1")], {"t1": features(0.5, 0.5, 0.5, 120, 1)})
+    catalog = TrackCatalog(collection)
+    catalog.start()
+    for _ in range(100):
+        if "t1" in catalog.index:
+            break
+        time.sleep(0.01)
+    assert "t1" in catalog.index
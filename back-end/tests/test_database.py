@@ -0,0 +1,96 @@
+import mongomock
+from pymongo import compression_support, monitoring
+import database
+from database import CollectionProxy, MongoDatabase
+
+
+def make_db(monkeypatch):
+    clients = []
+
+    def client_factory(uri, **options):
+        clients.append(mongomock.MongoClient(uri, **options))
+        return clients[-1]
+
+    monkeypatch.setattr(database.pymongo, "MongoClient", client_factory)
+    return MongoDatabase("mongodb://localhost:27017", "test_db"), clients
+
+
+def test_collections_are_proxies_resolved_on_use(monkeypatch):
+    db, clients = make_db(monkeypatch)
+    entries = db.entries
+    assert isinstance(entries, CollectionProxy)
+    assert clients == []  # nothing connects until a collection is used
+
+    entries.insert_one({"_id": 1})
+    assert db["entries"].find_one({"_id": 1}) == {"_id": 1}
+    assert len(clients) == 1
+
+
+def test_forked_process_gets_its_own_client(monkeypatch):
+    db, clients = make_db(monkeypatch)
+    entries = db.entries
+    entries.count_documents({})
+    parent = db.client
+
+    monkeypatch.setattr(database.os, "getpid", lambda: -1)
+    entries.count_documents({})
+    assert len(clients) == 2
+    assert db.client is not parent
+    assert db.client is clients[1]
+
+
+def test_reset_and_close_connect_afresh(monkeypatch):
+    db, clients = make_db(monkeypatch)
+    first = db.client
+    db.reset()
+    assert db.client is not first
+    db.close()
+    db.entries.count_documents({})
+    assert len(clients) == 3
+
+
+def test_pool_settings_come_from_env(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "500")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd, no-such-codec, zlib")
+    monkeypatch.setattr(database, "COMPRESSOR_MODULES", {"zstd": ("zlib",), "zlib": ("zlib",)})
+    assert database.client_options_from_env() == {
+        "maxPoolSize": 20,
+        "waitQueueTimeoutMS": 500,
+        "compressors": "zstd,zlib",
+    }
+
+
+def test_compressors_match_what_pymongo_can_use():
+    names = ["zstd", "snappy", "zlib"]
+    usable = [name for name in names if getattr(compression_support, f"_have_{name}")()]
+    assert database.available_compressors(names) == usable
+
+
+def test_pool_metrics_track_checkouts_and_waits():
+    metrics = database.PoolMetrics()
+    address = ("localhost", 27017)
+    for i in range(3):
+        metrics.connection_created(monitoring.ConnectionCreatedEvent(address, i))
+        metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, i, 0.002))
+    metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 0))
+    metrics.connection_check_out_failed(
+        monitoring.ConnectionCheckOutFailedEvent(address, "timeout", 0.5)
+    )
+
+    stats = metrics.snapshot()
+    assert stats["open"] == 3
+    assert stats["checked_out"] == 2
+    assert stats["max_checked_out"] == 3
+    assert stats["checkouts"] == 3
+    assert stats["max_wait_ms"] == 500
+    assert stats["failures"] == {"timeout": 1}
+
+
+def test_each_client_gets_fresh_metrics(monkeypatch):
+    db, clients = make_db(monkeypatch)
+    db.client
+    db.pool_metrics.checkouts = 5
+    db.reset()
+    db.client
+    assert db.pool_stats()["checkouts"] == 0
@@ -0,0 +1,76 @@
+import mongomock
+from indexes import IndexBuilder, check_query_plans, ensure_indexes, uses_collscan
+
+
+def test_ensure_indexes_is_idempotent():
+    db = mongomock.MongoClient().db
+    ensure_indexes(db)
+    ensure_indexes(db)
+    entries = db.entries.index_information()
+    users = db.users.index_information()
+    assert entries["user_id_created_at_id"]["key"] == [
+        ("user_id", 1), ("created_at", -1), ("_id", -1)
+    ]
+    assert users["username_unique"]["unique"] is True
+    assert "user_id_created_at_id" in db.playlists.index_information()
+
+
+def test_unique_username_conflict_is_reported_not_raised():
+    db = mongomock.MongoClient().db
+    db.users.insert_many([{"username": "dup"}, {"username": "dup"}])
+    ensure_indexes(db)
+    assert "user_id_created_at_id" in db.entries.index_information()
+
+
+def test_index_builder_fails_on_any_error():
+    builder = IndexBuilder(db=None)
+    builder._run()
+    assert builder.state == "failed"
+
+
+def test_collscan_detected_in_nested_plans():
+    collscan = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+        }
+    }
+    ixscan = {
+        "queryPlanner": {
+            "winningPlan": {
+                "queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+            }
+        }
+    }
+    assert uses_collscan(collscan)
+    assert not uses_collscan(ixscan)
+
+
+class ExplainOnlyDb:
+    """Stands in for a database whose cursors only support explain()."""
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def __getitem__(self, collection):
+        db = self
+
+        class Cursor:
+            def sort(self, *args):
+                return self
+
+            def explain(self):
+                return {"queryPlanner": {"winningPlan": {"stage": db.stages[collection]}}}
+
+        class Collection:
+            def find(self, query):
+                return Cursor()
+
+        return Collection()
+
+
+def test_check_query_plans_reports_collscans():
+    db = ExplainOnlyDb(
+        {"entries": "IXSCAN", "playlists": "COLLSCAN", "users": "IXSCAN", "mood_daily": "IXSCAN",
+         "catalog": "IXSCAN"}
+    )
+    assert check_query_plans(db) == ["user playlists"]
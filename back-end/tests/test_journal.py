@@ -0,0 +1,59 @@
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+from journal import InvalidCursor, fetch_entries_page, format_entry
+
+
+@pytest.fixture
+def entries():
+    collection = mongomock.MongoClient().db.entries
+    start = datetime(2024, 1, 1, 12, 0)
+    docs = [
+        {"user_id": "u1", "track_id": f"t{i}", "track_name": f"Song {i}",
+         "track_artist": "Artist", "mood": "happy",
+         # pairs of entries share a timestamp to exercise the _id tie-break
+         "created_at": start + timedelta(minutes=i // 2)}
+        for i in range(25)
+    ]
+    docs.append({"user_id": "u2", "track_id": "other", "mood": "sad",
+                 "created_at": start})
+    collection.insert_many(docs)
+    return collection
+
+
+def test_pages_walk_whole_timeline_newest_first(entries):
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        page, cursor = fetch_entries_page(entries, "u1", cursor=cursor, limit=10)
+        seen.extend(entry["track_id"] for entry in page)
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3
+    assert seen == [f"t{i}" for i in reversed(range(25))]
+
+
+def test_page_is_projected(entries):
+    page, _ = fetch_entries_page(entries, "u1", limit=1)
+    assert set(page[0]) == {"_id", "track_id", "track_name", "mood", "created_at"}
+
+
+def test_last_page_has_no_cursor(entries):
+    page, cursor = fetch_entries_page(entries, "u2", limit=10)
+    assert len(page) == 1
+    assert cursor is None
+
+
+def test_invalid_cursor_rejected(entries):
+    with pytest.raises(InvalidCursor):
+        fetch_entries_page(entries, "u1", cursor="not-a-cursor")
+
+
+def test_format_entry():
+    entry = {"_id": "abc", "track_id": "t1", "track_name": "Song",
+             "mood": "sad", "created_at": datetime(2024, 1, 1, 15, 5)}
+    assert format_entry(entry) == {
+        "id": "abc", "track_id": "t1", "time": "03:05 PM", "song": "Song", "mood": "sad"
+    }
@@ -0,0 +1,79 @@
+import io
+import json
+import mongomock
+import pytest
+from journal_io import InvalidEntry, export_entries, import_entries, read_rows, validate_entry
+
+
+def entry_row(n, **overrides):
+    row = {
+        "track_name": f"Song {n}",
+        "track_artist": "Artist",
+        "track_id": f"t{n}",
+        "mood": "happy",
+        "created_at": f"2024-05-01T10:{n:02d}:00",
+    }
+    row.update(overrides)
+    return row
+
+
+def test_validate_entry_applies_save_entry_rules():
+    entry = validate_entry(dict(entry_row(1), extra="ignored"), "u1")
+    assert entry["user_id"] == "u1"
+    assert entry["created_at"].minute == 1
+    assert "extra" not in entry
+    with pytest.raises(InvalidEntry):
+        validate_entry(entry_row(1, mood=""), "u1")
+    with pytest.raises(InvalidEntry):
+        validate_entry(entry_row(1, created_at="yesterday"), "u1")
+
+
+def test_import_ndjson_in_batches_and_report_bad_rows():
+    db = mongomock.MongoClient().db
+    lines = [json.dumps(entry_row(n)) for n in range(5)]
+    lines[2] = "{not json"
+    lines.insert(4, json.dumps(entry_row(9, track_id=None)))
+    body = io.BytesIO(("\n".join(lines) + "\n\n").encode("utf-8"))
+
+    result = import_entries(db, read_rows(body, "ndjson"), "u1", batch_size=2)
+    assert result["inserted"] == 4
+    assert result["rejected"] == 2
+    assert [e["line"] for e in result["errors"]] == [3, 5]
+    assert db.entries.count_documents({"user_id": "u1"}) == 4
+    assert db.mood_rollups.find_one({"_id": "u1"})["complete"] is False
+
+
+def test_csv_export_round_trips_through_import():
+    db = mongomock.MongoClient().db
+    import_entries(db, read_rows(io.StringIO("\n".join(
+        json.dumps(entry_row(n)) for n in range(3)
+    )), "ndjson"), "u1")
+
+    exported = "".join(export_entries(db.entries, "u1", "csv", batch_size=2))
+    assert exported.splitlines()[0] == "track_name,track_artist,track_id,mood,created_at"
+    assert exported.splitlines()[1].startswith("Song 2,")
+
+    result = import_entries(db, read_rows(io.StringIO(exported, newline=""), "csv"), "u2")
+    assert result["inserted"] == 3
+    ndjson = "".join(export_entries(db.entries, "u2"))
+    assert [json.loads(line) for line in ndjson.splitlines()] == [entry_row(n) for n in (2, 1, 0)]
+
+
+class LineStream:
+    """Only iterable, like a spooled upload on Python 3.10 (no readable())."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+
+def test_read_rows_decodes_streams_without_readable():
+    rows = [entry_row(1, track_name="Café"), entry_row(2)]
+    body = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode("utf-8")
+    assert [row for _, row in read_rows(LineStream(body), "ndjson")] == rows
+
+    csv_body = 'track_name,track_artist,track_id,mood\r\n"Two\r\nLines",A,t1,happy\r\n'
+    parsed = list(read_rows(LineStream(csv_body.encode("utf-8")), "csv"))
+    assert parsed[0][1]["track_name"] == "Two\r\nLines"
@@ -0,0 +1,52 @@
+import threading
+from metrics import AppMetrics, Registry, current_timing, end_request, start_request, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry(prefix="t_")
+    latency = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+    text = registry.render()
+    assert 't_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 't_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 't_latency_seconds_count{route="/a"} 3' in text
+
+
+def test_collectors_are_read_at_scrape_time():
+    registry = Registry(prefix="t_")
+    hits = {"n": 1}
+    registry.collector(lambda: [("hits_total", "counter", "Hits.", {(("cache", "x"),): hits["n"]})])
+    hits["n"] = 7
+    assert 't_hits_total{cache="x"} 7' in registry.render()
+
+
+def test_only_the_outermost_phase_is_timed():
+    timing, token = start_request()
+    try:
+        with timed("search"):
+            with timed("spotify"):
+                pass
+            # fan-out threads don't inherit the request's context
+            thread = threading.Thread(target=lambda: timed("spotify").__enter__())
+            thread.start()
+            thread.join()
+        with timed("spotify"):
+            pass
+        assert current_timing() is timing
+    finally:
+        end_request(token)
+    assert set(timing.phases) == {"search", "spotify"}
+    assert current_timing() is None
+    assert timing.header().startswith("search;dur=")
+
+
+def test_spotify_calls_are_counted_by_endpoint():
+    metrics = AppMetrics()
+    metrics.observe_spotify("/search", 200, 0.1)
+    metrics.observe_spotify("/tracks/abc", 429, 0.2)
+    metrics.observe_spotify("/tracks/def", "error", 3)
+    assert metrics.spotify_requests.value(endpoint="/tracks", status=429) == 1
+    assert metrics.spotify_latency.count(endpoint="/tracks") == 2
@@ -0,0 +1,154 @@
+import mongomock
+from collections import Counter
+from datetime import datetime
+from bson import ObjectId
+import mood_stats
+from mood_stats import (
+    bucket_id,
+    dashboard_stats,
+    day_of,
+    forget_entry,
+    mood_counts_pipeline,
+    rebuild_rollup,
+    record_entry,
+    update_stats,
+)
+
+TODAY = datetime(2024, 3, 10, 18, 0)
+
+
+def save(db, mood, created_at, user_id="u1"):
+    entry = {"_id": ObjectId(), "user_id": user_id, "mood": mood, "created_at": created_at}
+    db.entries.insert_one(entry)
+    record_entry(db, entry)
+    return entry
+
+
+def complete_rollup(db, user_id="u1"):
+    # a user with no history yet gets an empty, complete rollup on first view
+    db.mood_rollups.insert_one(
+        {"_id": user_id, "moods": {}, "total": 0, "latest": None, "complete": True}
+    )
+
+
+def test_rollup_tracks_saves_incrementally():
+    db = mongomock.MongoClient().db
+    complete_rollup(db)
+    save(db, "happy", datetime(2024, 3, 9, 9))
+    save(db, "sad", datetime(2024, 3, 10, 9))
+    save(db, "happy", datetime(2024, 3, 10, 10))
+
+    stats = dashboard_stats(db, "u1", days=3, today=TODAY)
+    assert stats["top_mood"] == "happy"
+    assert stats["latest_mood"] == "happy"
+    assert stats["total"] == 3
+    assert stats["chart_labels"] == ["2024-03-08", "2024-03-09", "2024-03-10"]
+    assert stats["chart_series"] == {"happy": [0, 1, 1], "sad": [0, 0, 1]}
+
+
+def test_deleting_latest_entry_falls_back_to_previous():
+    db = mongomock.MongoClient().db
+    complete_rollup(db)
+    save(db, "sad", datetime(2024, 3, 9, 9))
+    latest = save(db, "happy", datetime(2024, 3, 10, 9))
+
+    db.entries.delete_one({"_id": latest["_id"]})
+    forget_entry(db, latest)
+
+    stats = dashboard_stats(db, "u1", days=2, today=TODAY)
+    assert stats["latest_mood"] == "sad"
+    assert stats["top_mood"] == "sad"
+    assert stats["chart_series"] == {"sad": [1, 0]}
+
+
+def test_deleting_last_entry_clears_stats():
+    db = mongomock.MongoClient().db
+    complete_rollup(db)
+    entry = save(db, "sad", datetime(2024, 3, 9, 9))
+    db.entries.delete_one({"_id": entry["_id"]})
+    forget_entry(db, entry)
+
+    stats = dashboard_stats(db, "u1", days=2, today=TODAY)
+    assert stats["top_mood"] == "No data"
+    assert stats["latest_mood"] == "No data"
+    assert stats["chart_series"] == {}
+
+
+def test_older_entry_does_not_replace_latest():
+    db = mongomock.MongoClient().db
+    complete_rollup(db)
+    save(db, "happy", datetime(2024, 3, 10, 9))
+    save(db, "sad", datetime(2024, 1, 1, 9))
+    assert dashboard_stats(db, "u1", today=TODAY)["latest_mood"] == "happy"
+
+
+def test_failed_update_marks_rollup_for_rebuild():
+    db = mongomock.MongoClient().db
+    complete_rollup(db)
+
+    def broken(db, entry):
+        from pymongo.errors import PyMongoError
+        raise PyMongoError("down")
+
+    update_stats(broken, db, {"user_id": "u1"})
+    assert db.mood_rollups.find_one({"_id": "u1"})["complete"] is False
+
+
+def daily_counts(db, during=None):
+    # mongomock has no $dateTrunc; this stands in for the daily pipeline
+    def mood_counts(db_, user_id, unit="day", since=None):
+        rows = Counter(
+            (day_of(e["created_at"]), e["mood"]) for e in db.entries.find({"user_id": user_id})
+        )
+        if during is not None:
+            during()
+        return [{"period": p, "mood": m, "count": n} for (p, m), n in sorted(rows.items())]
+
+    return mood_counts
+
+
+def test_rebuild_upserts_buckets_and_drops_stale_ones(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(mood_stats, "mood_counts", daily_counts(db))
+    save(db, "happy", datetime(2024, 3, 9, 9))
+    save(db, "sad", datetime(2024, 3, 10, 9))
+    db.mood_daily.insert_one(
+        {"_id": bucket_id("u1", datetime(2024, 3, 1)), "user_id": "u1",
+         "day": datetime(2024, 3, 1), "counts": {"sad": 1}}
+    )
+
+    rollup = rebuild_rollup(db, "u1")
+    assert rollup["moods"] == {"happy": 1, "sad": 1}
+    assert db.mood_rollups.find_one({"_id": "u1"})["complete"] is True
+    assert sorted(b["_id"] for b in db.mood_daily.find()) == ["u1:2024-03-09", "u1:2024-03-10"]
+    stats = dashboard_stats(db, "u1", days=2, today=TODAY)
+    assert stats["chart_series"] == {"happy": [1, 0], "sad": [0, 1]}
+
+
+def test_rebuild_racing_a_save_is_redone(monkeypatch):
+    db = mongomock.MongoClient().db
+    save(db, "happy", datetime(2024, 3, 9, 9))
+
+    def late():
+        # saved after the rebuild counted the moods, before it wrote them
+        save(db, "sad", datetime(2024, 3, 10, 9))
+
+    monkeypatch.setattr(mood_stats, "mood_counts", daily_counts(db, during=late))
+
+    rebuild_rollup(db, "u1")
+    assert not db.mood_rollups.find_one({"_id": "u1"}).get("complete")
+
+    monkeypatch.setattr(mood_stats, "mood_counts", daily_counts(db))
+    stats = dashboard_stats(db, "u1", days=2, today=TODAY)
+    assert stats["total"] == 2
+    assert stats["chart_series"] == {"happy": [1, 0], "sad": [0, 1]}
+    assert db.mood_rollups.find_one({"_id": "u1"})["complete"] is True
+
+
+def test_counts_pipeline_groups_by_truncated_period():
+    since = datetime(2024, 1, 1)
+    pipeline = mood_counts_pipeline("u1", unit="week", since=since)
+    assert pipeline[0] == {"$match": {"user_id": "u1", "created_at": {"$gte": since}}}
+    assert pipeline[1]["$group"]["_id"]["period"] == {
+        "$dateTrunc": {"date": "$created_at", "unit": "week"}
+    }
@@ -0,0 +1,51 @@
+import pytest
+from passwords import HasherBusy, PasswordHasher, default_workers, hash_rounds
+
+
+def test_hash_and_check_in_worker_processes():
+    hasher = PasswordHasher(rounds=4, workers=1)
+    try:
+        hashed = hasher.hash("hunter2")
+        assert hash_rounds(hashed) == 4
+        assert hasher.check(hashed, "hunter2")
+        assert not hasher.check(hashed, "hunter3")
+    finally:
+        hasher.close()
+
+
+def test_rejects_empty_and_malformed_input():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    assert not hasher.check(hasher.hash("pw"), "")
+    assert not hasher.check(None, "pw")
+    assert not hasher.check("not-a-hash", "pw")
+
+
+def test_long_passwords_compare_on_their_first_72_bytes():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    hashed = hasher.hash("x" * 100)
+    assert hasher.check(hashed, "x" * 72)
+
+
+def test_needs_rehash_when_the_cost_changes():
+    hashed = PasswordHasher(rounds=4, workers=0).hash("pw")
+    assert not PasswordHasher(rounds=4).needs_rehash(hashed)
+    assert PasswordHasher(rounds=5).needs_rehash(hashed)
+
+
+def test_saturated_hasher_refuses_work():
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1)
+    hasher._slots.acquire()
+    with pytest.raises(HasherBusy):
+        hasher.hash("pw")
+    hasher._slots.release()
+    assert hasher.hash("pw")
+
+
+def test_default_workers_share_the_cpus_between_web_workers(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert default_workers() == 1
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert default_workers() == 2
+    monkeypatch.setenv("WEB_CONCURRENCY", "17")
+    assert default_workers() == 1
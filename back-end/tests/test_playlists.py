@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from playlists import (
+    InvalidPlaylist,
+    build_playlist,
+    compact_playlists,
+    fetch_playlist_tracks,
+    fetch_playlists_page,
+    format_playlist,
+    track_ref,
+)
+
+
+def spotify_track(track_id):
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "uri": f"spotify:track:{track_id}",
+        "artists": [{"id": "a1", "name": "Artist"}],
+        "album": {"name": "Album", "images": [{"url": "https://img/" + track_id}]},
+        "available_markets": ["US"] * 180,
+        "duration_ms": 1000,
+    }
+
+
+def test_track_ref_from_page_post_and_spotify_object():
+    posted = {"uri": "spotify:track:t1", "name": "Song", "artist": "Artist", "albumCover": "x" * 500}
+    assert track_ref(posted) == {"id": "t1", "name": "Song", "artist": "Artist", "duration_ms": None}
+    assert track_ref(spotify_track("t2")) == {
+        "id": "t2", "name": "Song t2", "artist": "Artist", "duration_ms": 1000
+    }
+    assert track_ref({"name": "no id"}) is None
+
+
+def test_build_playlist_prefers_store_records_and_caps_length():
+    records = {"t1": {"name": "Stored", "artist": "Stored Artist", "duration_ms": 5}}
+    playlist = build_playlist("u", {"tracks": [{"id": "t1", "name": "Posted"}, "junk"]}, records)
+    assert playlist["tracks"] == [
+        {"id": "t1", "name": "Stored", "artist": "Stored Artist", "duration_ms": 5}
+    ]
+    assert playlist["track_count"] == 1
+
+    with pytest.raises(InvalidPlaylist):
+        build_playlist("u", {"tracks": [{"id": "t1"}] * 3}, {}, max_tracks=2)
+    with pytest.raises(InvalidPlaylist):
+        build_playlist("u", {"tracks": "t1"}, {})
+
+
+def test_playlists_page_is_keyset_paginated_with_track_preview():
+    collection = mongomock.MongoClient().db.playlists
+    start = datetime(2024, 1, 1)
+    for n in range(5):
+        tracks = [{"id": f"t{i}", "name": "", "artist": "", "duration_ms": None} for i in range(30)]
+        collection.insert_one(
+            {"user_id": "u", "name": f"p{n}", "tracks": tracks, "track_count": 30,
+             "created_at": start + timedelta(days=n)}
+        )
+    collection.insert_one({"user_id": "other", "name": "x", "tracks": [], "created_at": start})
+
+    page, cursor = fetch_playlists_page(collection, "u", limit=2, preview=3)
+    assert [p["name"] for p in page] == ["p4", "p3"]
+    assert len(page[0]["tracks"]) == 3 and page[0]["track_count"] == 30
+    assert "user_id" not in page[0]
+
+    names = [p["name"] for p in page]
+    while cursor:
+        page, cursor = fetch_playlists_page(collection, "u", cursor=cursor, limit=2, preview=3)
+        names += [p["name"] for p in page]
+    assert names == ["p4", "p3", "p2", "p1", "p0"]
+
+    playlist_id = collection.find_one({"name": "p0"})["_id"]
+    tracks = fetch_playlist_tracks(collection, "u", str(playlist_id), offset=28, limit=10)
+    assert [t["id"] for t in tracks["tracks"]] == ["t28", "t29"]
+    assert fetch_playlist_tracks(collection, "other", str(playlist_id)) is None
+    assert fetch_playlist_tracks(collection, "u", "not-an-id") is None
+
+
+def test_legacy_playlists_are_counted_in_full_not_by_preview():
+    collection = mongomock.MongoClient().db.playlists
+    legacy = [spotify_track(f"t{i}") for i in range(12)]
+    playlist_id = collection.insert_one(
+        {"user_id": "u", "name": "old", "tracks": legacy, "created_at": datetime(2024, 1, 1)}
+    ).inserted_id
+
+    page, _ = fetch_playlists_page(collection, "u", preview=3)
+    assert len(page[0]["tracks"]) == 3
+    assert page[0]["track_count"] == 12
+    assert fetch_playlist_tracks(collection, "u", str(playlist_id), limit=5)["track_count"] == 12
+
+
+def test_format_playlist_hydrates_from_records_and_legacy_fields():
+    playlist = {
+        "_id": "p",
+        "name": "Mix",
+        "tracks": [
+            {"id": "t1", "name": "Song", "artist": "Artist", "duration_ms": None},
+            {"uri": "spotify:track:t2", "name": "Old", "artist": "A", "albumCover": "legacy.png"},
+        ],
+    }
+    records = {"t1": {"album_cover": "cover.png", "duration_ms": 2000, "uri": "spotify:track:t1"}}
+    formatted = format_playlist(playlist, records)
+    assert formatted["track_count"] == 2
+    assert formatted["tracks"][0]["album_cover"] == "cover.png"
+    assert formatted["tracks"][0]["duration_ms"] == 2000
+    assert formatted["tracks"][1]["album_cover"] == "legacy.png"
+
+
+def test_compact_playlists_rewrites_legacy_documents():
+    collection = mongomock.MongoClient().db.playlists
+    collection.insert_one({"user_id": "u", "tracks": [spotify_track("t1"), {"name": "no uri"}]})
+    collection.insert_one({"user_id": "u", "tracks": [], "track_count": 0})
+    asked = []
+
+    def get_records(ids):
+        asked.append(ids)
+        return {}
+
+    assert compact_playlists(collection, get_records) == 1
+    assert asked == [["t1"]]
+    playlist = collection.find_one({"tracks.id": "t1"})
+    assert playlist["tracks"] == [
+        {"id": "t1", "name": "Song t1", "artist": "Artist", "duration_ms": 1000}
+    ]
+    assert playlist["track_count"] == 1
+    assert compact_playlists(collection) == 0
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+import mongomock
+from moods import MOODS
+from pools import MoodPools
+
+
+def track(track_id):
+    return {"id": track_id, "name": track_id, "artists": [{"id": "a", "name": "A"}]}
+
+
+def make_pools(build, **kwargs):
+    return MoodPools(mongomock.MongoClient().db.mood_pools, build, **kwargs)
+
+
+def test_refresh_stores_ranked_pool_truncated_to_size():
+    pools = make_pools(lambda mood: [(track("low"), 0.2), (track("high"), 0.9), (track("mid"), 0.5)], size=2)
+    assert pools.refresh("happy")
+
+    track_scores, age = pools.get("happy")
+    assert [(t["id"], s) for t, s in track_scores] == [("high", 0.9), ("mid", 0.5)]
+    assert 0 <= age < 5
+    doc = pools.collection.find_one({"_id": "happy"})
+    assert doc["size"] == 2
+    assert "lease_until" not in doc
+
+
+def test_refresh_skips_pools_that_are_not_due():
+    builds = []
+    pools = make_pools(lambda mood: builds.append(mood) or [(track("t"), 0.5)], refresh_interval=900)
+    assert pools.refresh_all() == list(MOODS)
+    assert pools.refresh_all() == []
+    assert pools.refresh("sad", force=True)
+    assert builds == list(MOODS) + ["sad"]
+
+
+def test_only_one_worker_holds_the_lease():
+    pools = make_pools(lambda mood: [(track("t"), 0.5)])
+    now = datetime.now()
+    assert pools._acquire("happy", now)
+    other = MoodPools(pools.collection, pools.build)
+    assert not other.refresh("happy", force=True)
+    # an abandoned lease expires
+    assert other._acquire("happy", now + timedelta(seconds=pools.lease + 1))
+
+
+def test_failed_build_keeps_previous_pool():
+    results = [[(track("t"), 0.5)], None]
+    pools = make_pools(lambda mood: results.pop(0), check_interval=0)
+    assert pools.refresh("calm")
+    assert not pools.refresh("calm", force=True)
+    track_scores, _ = pools.get("calm")
+    assert [t["id"] for t, _ in track_scores] == ["t"]
+
+
+def test_old_or_missing_pools_are_not_served():
+    pools = make_pools(lambda mood: [(track("t"), 0.5)], max_age=60, check_interval=0)
+    assert pools.get("happy") == (None, None)
+    pools.refresh("happy")
+    assert pools.get("happy", now=datetime.now() + timedelta(seconds=61)) == (None, None)
@@ -0,0 +1,50 @@
+import random
+import numpy as np
+from moods import calculate_mood_match_score, get_mood_features
+from scoring import feature_matrix, score_tracks
+
+MOODS = ["happy", "sad", "angry", "relaxed", "energetic"]
+
+
+def random_features(rng, n):
+    return [
+        {
+            "id": f"t{i}",
+            "danceability": rng.random(),
+            "energy": rng.random(),
+            "valence": rng.random(),
+            "tempo": rng.choice([rng.uniform(40, 220), rng.randint(60, 180)]),
+            "mode": rng.randint(0, 1),
+        }
+        for i in range(n)
+    ]
+
+
+def test_batched_scores_match_scalar_scorer_exactly():
+    features = random_features(random.Random(7), 5000)
+    matrix = feature_matrix(features)
+    for mood in MOODS:
+        target = get_mood_features(mood)
+        scores, survivors = score_tracks(matrix, target)
+        expected = [calculate_mood_match_score(f, target) for f in features]
+        assert scores.tolist() == expected
+        assert survivors.tolist() == [i for i, s in enumerate(expected) if s > 0]
+
+
+def test_threshold_edges_match_scalar_scorer():
+    target = get_mood_features("happy")
+    edges = [
+        {"danceability": 0.7, "energy": 0.5, "valence": 0.6, "tempo": 70, "mode": 1},
+        {"danceability": 0.7, "energy": 0.5, "valence": 0.6, "tempo": 69.99, "mode": 1},
+        {"danceability": 0.7, "energy": 0.49, "valence": 0.9, "tempo": 120, "mode": 0},
+        {"danceability": 0.7, "energy": 0.9, "valence": 0.59, "tempo": 120, "mode": 0},
+    ]
+    scores, _ = score_tracks(feature_matrix(edges), target)
+    assert scores.tolist() == [calculate_mood_match_score(f, target) for f in edges]
+
+
+def test_empty_candidate_set():
+    scores, survivors = score_tracks(feature_matrix([]), get_mood_features("sad"))
+    assert scores.shape == (0,)
+    assert survivors.shape == (0,)
+    assert survivors.dtype == np.intp
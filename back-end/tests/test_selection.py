@@ -0,0 +1,49 @@
+import random
+import time
+from selection import cap_per_artist, select_diverse_tracks, unique_tracks
+
+
+def track(track_id, artist_id):
+    return {"id": track_id, "artists": [{"id": artist_id}]}
+
+
+def test_cap_per_artist_keeps_first_tracks_per_artist():
+    tracks = [track("a1", "a"), track("b1", "b"), track("a2", "a"), track("a3", "a")]
+    assert [t["id"] for t in cap_per_artist(tracks, 2)] == ["a1", "b1", "a2"]
+    assert [t["id"] for t in cap_per_artist(tracks, 1)] == ["a1", "b1"]
+
+
+def test_unique_tracks_keeps_first_occurrence():
+    tracks = [track("x", "a"), track("y", "b"), track("x", "a")]
+    assert [t["id"] for t in unique_tracks(tracks)] == ["x", "y"]
+
+
+def test_select_takes_tier_quotas_without_repeats():
+    scores = [(track(f"t{i}", f"a{i}"), 1 - i / 100) for i in range(100)]
+    chosen = select_diverse_tracks(scores, output_size=16, rng=random.Random(1))
+    ids = [t["id"] for t in chosen]
+    assert len(ids) == 16
+    assert len(set(ids)) == 16
+    ranks = sorted(int(i[1:]) for i in ids)
+    assert sum(r < 50 for r in ranks) == 9
+    assert sum(50 <= r < 80 for r in ranks) == 5
+    assert sum(r >= 80 for r in ranks) == 2
+
+
+def test_select_tops_up_thin_tiers():
+    scores = [(track(f"t{i}", f"a{i}"), 1 - i / 20) for i in range(15)]
+    chosen = select_diverse_tracks(scores, output_size=16, rng=random.Random(2))
+    assert len(chosen) == 14
+    assert len({t["id"] for t in chosen}) == 14
+
+
+def test_select_scales_to_large_candidate_pools():
+    rng = random.Random(3)
+    tracks = [track(f"t{i}", f"a{rng.randrange(5000)}") for i in range(200_000)]
+    start = time.perf_counter()
+    capped = cap_per_artist(tracks, 2)
+    chosen = select_diverse_tracks(
+        [(t, rng.random()) for t in capped], output_size=50, rng=rng
+    )
+    assert time.perf_counter() - start < 5
+    assert len(chosen) == 50
@@ -0,0 +1,316 @@
+import time
+import asyncio
+import threading
+import pytest
+from requests import RequestException
+from spotify import (
+    AsyncSpotifyClient,
+    CircuitBreaker,
+    CircuitOpen,
+    SpotifyClient,
+    TokenManager,
+    build_session,
+)
+
+
+def make_manager(spotify_server, cache_path=None, refresh_margin=60):
+    return TokenManager(
+        "client-id",
+        "client-secret",
+        token_url=spotify_server.url,
+        refresh_margin=refresh_margin,
+        cache_path=cache_path,
+    )
+
+
+def test_token_is_reused_until_expiry(spotify_server):
+    manager = make_manager(spotify_server)
+    assert manager.get_token() == "token-1"
+    assert manager.get_token() == "token-1"
+    assert spotify_server.hits == 1
+
+
+def test_token_refreshed_inside_margin(spotify_server):
+    spotify_server.expires_in = 30
+    manager = make_manager(spotify_server, refresh_margin=60)
+    assert manager.get_token() == "token-1"
+    assert manager.get_token() == "token-2"
+    assert spotify_server.hits == 2
+
+
+def test_concurrent_refresh_is_single_flight(spotify_server):
+    spotify_server.delay = 0.2
+    manager = make_manager(spotify_server)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(manager.get_token()))
+        for _ in range(10)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["token-1"] * 10
+    assert spotify_server.hits == 1
+
+
+def test_token_shared_through_cache_file(spotify_server, tmp_path):
+    cache_path = str(tmp_path / "token.json")
+    first_worker = make_manager(spotify_server, cache_path=cache_path)
+    second_worker = make_manager(spotify_server, cache_path=cache_path)
+    assert first_worker.get_token() == "token-1"
+    assert second_worker.get_token() == "token-1"
+    assert spotify_server.hits == 1
+
+
+def test_invalidated_token_not_readopted(spotify_server, tmp_path):
+    cache_path = str(tmp_path / "token.json")
+    manager = make_manager(spotify_server, cache_path=cache_path)
+    assert manager.get_token() == "token-1"
+    manager.invalidate()
+    assert manager.get_token() == "token-2"
+
+
+def test_token_error_returns_none(spotify_server):
+    spotify_server.status = 400
+    manager = make_manager(spotify_server)
+    assert manager.get_token() is None
+
+
+def test_missing_credentials_returns_none(spotify_server):
+    manager = TokenManager(None, None, token_url=spotify_server.url)
+    assert manager.get_token() is None
+    assert spotify_server.hits == 0
+
+
+def make_client(spotify_server, **kwargs):
+    kwargs.setdefault("session", build_session(backoff_factor=0))
+    return SpotifyClient(
+        "client-id",
+        "client-secret",
+        api_url=spotify_server.api_url,
+        token_url=spotify_server.url,
+        **kwargs,
+    )
+
+
+def test_client_reuses_pooled_connection(spotify_server):
+    client = make_client(spotify_server)
+    for _ in range(5):
+        assert client.get("/search", params={"q": "a b&c"}).status_code == 200
+    assert len(spotify_server.connections) == 1
+    assert spotify_server.requests[0][0] == "/v1/search?q=a+b%26c"
+    assert spotify_server.requests[0][1] == "Bearer token-1"
+
+
+def test_client_honours_retry_after(spotify_server):
+    spotify_server.responses["/v1/search"] = [
+        (429, {}, {"Retry-After": "0"}),
+        (200, {"tracks": {"items": []}}, {}),
+    ]
+    client = make_client(spotify_server)
+    res = client.get("/search")
+    assert res.status_code == 200
+    assert len(spotify_server.requests) == 2
+
+
+def test_client_gives_up_on_long_retry_after(spotify_server):
+    spotify_server.responses["/v1/search"] = [(429, {}, {"Retry-After": "3600"})]
+    client = make_client(spotify_server)
+    assert client.get("/search").status_code == 429
+    assert len(spotify_server.requests) == 1
+
+
+def test_client_retries_server_errors(spotify_server):
+    spotify_server.responses["/v1/tracks"] = [(503, {}, {}), (502, {}, {})]
+    client = make_client(spotify_server)
+    assert client.get("/tracks").status_code == 200
+    assert len(spotify_server.requests) == 3
+
+
+def test_client_refreshes_revoked_token(spotify_server):
+    spotify_server.responses["/v1/tracks"] = [(401, {}, {})]
+    client = make_client(spotify_server)
+    assert client.get("/tracks").status_code == 200
+    assert spotify_server.requests[-1][1] == "Bearer token-2"
+
+
+def test_client_read_timeout(spotify_server):
+    spotify_server.api_delay = 0.5
+    client = make_client(
+        spotify_server,
+        session=build_session(max_retries=0),
+        timeout=(1, 0.1),
+    )
+    with pytest.raises(RequestException):
+        client.get("/search")
+
+
+def test_get_many_preserves_call_order(spotify_server):
+    spotify_server.responses["/v1/search"] = [(200, {"n": 1}, {})]
+    spotify_server.responses["/v1/tracks"] = [(200, {"n": 2}, {})]
+    client = make_client(spotify_server)
+    responses = client.get_many([("/tracks", None), ("/search", None)])
+    assert [r.json()["n"] for r in responses] == [2, 1]
+
+
+def test_get_many_drops_calls_past_deadline(spotify_server):
+    spotify_server.api_delay = 0.5
+    client = make_client(spotify_server)
+    client.get_token()
+    responses = client.get_many([("/search", None)] * 3, deadline=0.1)
+    assert responses == [None, None, None]
+
+
+def test_calls_past_deadline_free_their_threads(spotify_server):
+    spotify_server.api_delay = 1
+    client = make_client(spotify_server, fanout_workers=2)
+    client.get_token()
+    assert client.get_many([("/search", None)] * 2, deadline=0.2) == [None, None]
+
+    # the two pool threads are not held for the slow calls' full second
+    spotify_server.api_delay = 0
+    started = time.monotonic()
+    assert client.get_many([("/tracks", None)], deadline=5)[0].status_code == 200
+    assert time.monotonic() - started < 0.7
+
+
+def make_async_client(spotify_server, **kwargs):
+    kwargs.setdefault("backoff_factor", 0)
+    return AsyncSpotifyClient(
+        "client-id",
+        "client-secret",
+        api_url=spotify_server.api_url,
+        token_url=spotify_server.url,
+        **kwargs,
+    )
+
+
+def test_async_client_shares_connections_across_request_loops(spotify_server):
+    client = make_async_client(spotify_server)
+    # Flask runs every async view on a fresh event loop
+    for _ in range(3):
+        res = asyncio.run(client.get("/search", params={"q": "a b&c"}))
+        assert res.status_code == 200
+    assert len(spotify_server.connections) == 1
+    assert spotify_server.requests[0] == ("/v1/search?q=a+b%26c", "Bearer token-1")
+    client.close()
+
+
+def test_async_client_retry_policy(spotify_server):
+    spotify_server.responses["/v1/search"] = [(429, {}, {"Retry-After": "3600"})]
+    spotify_server.responses["/v1/tracks"] = [(503, {}, {}), (401, {}, {})]
+    client = make_async_client(spotify_server)
+    assert asyncio.run(client.get("/search")).status_code == 429
+    res = asyncio.run(client.get("/tracks"))
+    assert res.status_code == 200
+    assert spotify_server.requests[-1][1] == "Bearer token-2"
+    client.close()
+
+
+def test_async_get_many_order_and_deadline(spotify_server):
+    spotify_server.responses["/v1/search"] = [(200, {"n": 1}, {})]
+    spotify_server.responses["/v1/tracks"] = [(200, {"n": 2}, {})]
+    client = make_async_client(spotify_server)
+    responses = asyncio.run(client.get_many([("/tracks", None), ("/search", None)]))
+    assert [r.json()["n"] for r in responses] == [2, 1]
+
+    spotify_server.api_delay = 0.5
+    responses = asyncio.run(client.get_many([("/search", None)] * 3, deadline=0.1))
+    assert responses == [None, None, None]
+    client.close()
+
+
+def test_async_client_raises_requests_errors(spotify_server):
+    spotify_server.api_delay = 0.5
+    client = make_async_client(spotify_server, max_retries=0, timeout=(1, 0.1))
+    with pytest.raises(RequestException):
+        asyncio.run(client.get("/search"))
+    client.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_probes_once_when_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record(False)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == 30
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+    clock.now = 30
+    breaker.check()
+    breaker.before_call()  # the probe
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == "open" and breaker.opens == 2
+
+    clock.now = 60
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.snapshot() == {"state": "closed", "failures": 0, "opens": 2, "rejected": 3}
+
+
+def test_client_fails_fast_while_circuit_is_open(spotify_server):
+    spotify_server.responses["/v1/search"] = [(500, {}, {})] * 10
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = make_client(
+        spotify_server, session=build_session(max_retries=0), breaker=breaker
+    )
+    assert client.get("/search").status_code == 500
+    assert client.get("/search").status_code == 500
+    sent = len(spotify_server.requests)
+    with pytest.raises(CircuitOpen):
+        client.get("/search")
+    assert client.get_many([("/search", None)] * 3) == [None, None, None]
+    assert len(spotify_server.requests) == sent
+
+
+def test_async_client_shares_the_breaker(spotify_server):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record(False)
+    client = make_async_client(spotify_server, breaker=breaker)
+    with pytest.raises(CircuitOpen):
+        asyncio.run(client.get("/search"))
+    assert spotify_server.requests == []
+    client.close()
+
+
+def test_async_half_open_probe_carries_a_token(spotify_server):
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record(False)
+    client = make_async_client(spotify_server, breaker=breaker)
+    clock.now = 30
+    res = asyncio.run(client.get("/search"))
+    assert res.status_code == 200
+    assert spotify_server.requests == [("/v1/search", "Bearer token-1")]
+    assert breaker.state == "closed"
+    client.close()
+
+
+def test_token_refresh_goes_through_the_breaker(spotify_server):
+    spotify_server.status = 503
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client = make_client(spotify_server, breaker=breaker)
+    # no retries on the token POST: one failed attempt opens the circuit
+    assert client.get_token() is None
+    assert spotify_server.hits == 1
+    assert breaker.state == "open"
+    assert client.get_token() is None
+    assert spotify_server.hits == 1
@@ -0,0 +1,143 @@
+import mongomock
+import numpy as np
+import pytest
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from taste import (
+    TasteBackfill,
+    blend_targets,
+    forget_taste,
+    load_profile,
+    mood_taste,
+    rebuild_profile,
+    record_taste,
+    update_taste,
+)
+
+TARGETS = {"target_danceability": 0.7, "target_energy": 0.7, "target_valence": 0.8,
+           "target_tempo": 120, "target_mode": 1}
+
+
+def features(energy, tempo=120.0):
+    return {"danceability": 0.5, "energy": energy, "valence": 0.5, "tempo": tempo, "mode": 1.0}
+
+
+def save(db, mood, entry_features, track_id="t1", user_id="u1"):
+    entry = {"_id": ObjectId(), "user_id": user_id, "mood": mood, "track_id": track_id}
+    if entry_features:
+        entry["features"] = entry_features
+    db.entries.insert_one(entry)
+    record_taste(db, entry)
+    return entry
+
+
+def test_profile_keeps_running_mean_and_variance():
+    db = mongomock.MongoClient().db
+    energies = [0.2, 0.4, 0.9, 0.6]
+    entries = [save(db, "Happy", features(e, tempo=100 + 10 * i)) for i, e in enumerate(energies)]
+    save(db, "Sad", features(0.1))
+    forget_taste(db, entries[2])
+
+    profile = db.taste_profiles.find_one({"_id": "u1"})
+    taste = mood_taste(profile, "happy")
+    kept = [0.2, 0.4, 0.6]
+    assert taste["n"] == 3
+    assert taste["mean"]["energy"] == pytest.approx(np.mean(kept))
+    assert taste["var"]["energy"] == pytest.approx(np.var(kept))
+    assert taste["mean"]["tempo"] == pytest.approx(np.mean([100, 110, 130]))
+    assert mood_taste(profile, "sad")["n"] == 1
+    assert mood_taste(profile, "angry") is None
+
+
+def test_rebuild_backfills_features_and_matches_incremental():
+    db = mongomock.MongoClient().db
+    save(db, "Happy", features(0.3))
+    save(db, "Happy", None, track_id="t2")
+    save(db, "Happy", None, track_id="unknown")
+    looked_up = []
+
+    def features_of(track_ids):
+        looked_up.extend(track_ids)
+        return {"t2": dict(features(0.5), id="t2")}
+
+    # a profile only ever upserted by saves has not counted older entries
+    profile = load_profile(db, "u1", features_of)
+    assert profile["complete"] is True
+    assert sorted(looked_up) == ["t2", "unknown"]
+    assert db.entries.find_one({"track_id": "t2"})["features"]["energy"] == 0.5
+    assert mood_taste(profile, "Happy")["n"] == 2
+    assert mood_taste(profile, "Happy")["mean"]["energy"] == pytest.approx(0.4)
+
+    # complete profiles are read as they are
+    assert load_profile(db, "u1", None)["moods"] == profile["moods"]
+    assert rebuild_profile(db, "u1", features_of)["moods"] == profile["moods"]
+
+
+def test_blend_pulls_targets_by_volume_and_consistency():
+    assert blend_targets(TARGETS, None) is TARGETS
+
+    def taste(n, energy, spread=0.0):
+        return {"n": n, "mean": {"energy": energy, "tempo": 90.0},
+                "var": {"energy": spread ** 2, "tempo": 0.0}}
+
+    few = blend_targets(TARGETS, taste(2, 0.2))
+    many = blend_targets(TARGETS, taste(1000, 0.2))
+    scattered = blend_targets(TARGETS, taste(1000, 0.2, spread=0.5))
+    assert TARGETS["target_energy"] > few["target_energy"] > many["target_energy"]
+    # never more than max_blend of the way to the user's mean
+    assert many["target_energy"] >= 0.7 - 0.5 * (0.7 - 0.2)
+    assert many["target_tempo"] < 120
+    assert scattered["target_energy"] == pytest.approx(0.7)
+    assert many["target_mode"] == 1
+    assert many["target_valence"] == 0.8
+
+
+def test_failed_update_flags_profile_for_rebuild():
+    db = mongomock.MongoClient().db
+    entry = save(db, "Happy", features(0.3))
+    db.taste_profiles.update_one({"_id": "u1"}, {"$set": {"complete": True}})
+
+    def failing(db, entry):
+        raise PyMongoError("write failed")
+
+    update_taste(failing, db, entry)
+    assert db.taste_profiles.find_one({"_id": "u1"})["complete"] is False
+
+
+def test_backfill_fetches_features_off_the_save_and_flags_the_profile():
+    db = mongomock.MongoClient().db
+    save(db, "Happy", features(0.3))
+    save(db, "Happy", None, track_id="t2")
+    db.taste_profiles.update_one({"_id": "u1"}, {"$set": {"complete": True}})
+    stored = {}
+    ready = []
+
+    def features_of(track_ids):
+        stored["t2"] = dict(features(0.5), id="t2")
+        return stored
+
+    backfill = TasteBackfill(db, features_of, on_ready=ready.append)
+    backfill.submit("u1", "t2")
+    backfill._get_executor().shutdown(wait=True)
+    assert ready == ["u1"]
+    assert db.taste_profiles.find_one({"_id": "u1"})["complete"] is False
+
+    profile = load_profile(db, "u1", lambda ids: stored)
+    assert mood_taste(profile, "happy")["n"] == 2
+
+
+def test_rebuild_racing_a_save_is_redone():
+    db = mongomock.MongoClient().db
+    save(db, "Happy", None, track_id="t2")
+
+    def features_of(track_ids):
+        # a save lands while the rebuild is looking features up
+        save(db, "Happy", features(0.3))
+        return {}
+
+    rebuild_profile(db, "u1", features_of)
+    assert not db.taste_profiles.find_one({"_id": "u1"}).get("complete")
+
+    profile = load_profile(db, "u1", lambda ids: {})
+    assert profile["complete"] is True
+    assert mood_taste(profile, "happy")["n"] == 1
@@ -0,0 +1,66 @@
+import mongomock
+from tracks import TrackStore, track_record
+
+
+def spotify_track(track_id):
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "uri": f"spotify:track:{track_id}",
+        "duration_ms": 180000,
+        "artists": [{"id": "artist1", "name": "Artist"}],
+        "album": {"name": "Album", "images": [{"url": "https://img/1"}], "available_markets": ["US"] * 100},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+    }
+
+
+def test_track_record_keeps_only_used_fields():
+    record = track_record(spotify_track("t1"))
+    assert record == {
+        "spotify_id": "t1",
+        "name": "Song t1",
+        "artist": "Artist",
+        "artist_id": "artist1",
+        "spotify_url": "https://open.spotify.com/track/t1",
+        "uri": "spotify:track:t1",
+        "album": "Album",
+        "album_cover": "https://img/1",
+        "duration_ms": 180000,
+    }
+
+
+def test_track_record_without_album_art():
+    track = spotify_track("t1")
+    track["album"]["images"] = []
+    assert track_record(track)["album_cover"] is None
+
+
+def test_searched_tracks_are_served_from_store():
+    collection = mongomock.MongoClient().db.tracks
+    records = [track_record(spotify_track(t)) for t in ("t1", "t2")]
+    TrackStore(collection).put_many(records)
+
+    def fetch(missing):
+        raise AssertionError(f"unexpected network lookup for {missing}")
+
+    restarted = TrackStore(collection)
+    found = restarted.get_many(["t2", "t1"], fetch)
+    assert found["t1"] == records[0]
+    assert found["t2"] == records[1]
+
+
+def test_put_many_skips_tracks_already_known():
+    collection = mongomock.MongoClient().db.tracks
+    store = TrackStore(collection)
+    store.put_many([track_record(spotify_track("t1"))])
+    collection.delete_many({})
+    store.put_many([track_record(spotify_track("t1"))])
+    assert collection.count_documents({}) == 0
+
+
+def test_track_record_from_a_slim_recommendation_track():
+    from catalog import slim_track
+
+    record = track_record(slim_track(spotify_track("t1")))
+    assert record["spotify_url"] == "https://open.spotify.com/track/t1"
+    assert record["album_cover"] == "https://img/1"
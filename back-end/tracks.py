@@ -0,0 +1,32 @@
+"""
+Compact track metadata built from Spotify track objects, and the shared
+store that keeps it so known track IDs never need another API call.
+"""
+
+from cache import DocumentCache
+
+
+def track_record(track):
+    """The fields the app uses from a full Spotify track object."""
+    artist = track["artists"][0]
+    images = (track.get("album") or {}).get("images") or []
+    return {
+        "spotify_id": track["id"],
+        "name": track["name"],
+        "artist": artist["name"],
+        "artist_id": artist.get("id"),
+        # slim tracks served as recommendations carry no external_urls
+        "spotify_url": (track.get("external_urls") or {}).get("spotify")
+        or f"https://open.spotify.com/track/{track['id']}",
+        "uri": track.get("uri"),
+        "album": (track.get("album") or {}).get("name"),
+        "album_cover": images[0]["url"] if images else None,
+        "duration_ms": track.get("duration_ms"),
+    }
+
+
+class TrackStore(DocumentCache):
+    """Track records keyed by Spotify ID, in memory and the ``tracks`` collection."""
+
+    key = "spotify_id"
+    name = "Track"